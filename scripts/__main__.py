@@ -0,0 +1,337 @@
+# __main__.py
+"""
+Единая командная строка для импорта в Pragmatica:
+
+    python -m scripts functions parse|xml|all [параметры parse_functions.py]
+    python -m scripts structure parse|xml|all [параметры parse_structure.py]
+    python -m scripts combined документ.pdf --fi ТЕСТ [параметры функций]
+    python -m scripts batch задания.txt
+    python -m scripts catalog --code Ф21.20.01 | слова для поиска
+    python -m scripts archive list | restore имя | prune | pack
+    python -m scripts excel-bench книга.xlsx [--sheet лист]
+
+Все шаги выполняются в одном процессе: скрипты разделов импортируются
+только когда нужны (вместе с pandas, PyMuPDF, python-docx) и вызываются
+напрямую, без повторного запуска интерпретатора на каждый шаг.
+
+Параметры после "parse" / "all" передаются парсеру раздела как есть, например
+
+    python -m scripts functions all doc.pdf --fi ТЕСТ --max-depth 3
+
+кроме --full и --force: их получает XML-конвертер (--full — только полный XML,
+без файла изменений *.delta.xml, --force — пересоздать XML, даже если Excel
+не менялся), так же как в "xml --full" и "combined ... --force".
+
+Без --out Excel пишется в <база>/Результаты_EXCEL, XML — в <база>/Результаты_XML;
+база по умолчанию та же, что у скриптов (папка scripts), меняется ключом --base.
+
+Каталог всех импортов (<база>/Каталог.sqlite) пополняется при каждом
+разборе; поиск — python -m scripts catalog -h (см. catalog.py).
+
+Файл для batch: одна команда в строке (без "python -m scripts"),
+пустые строки и строки с # пропускаются:
+
+    functions all Функции_ФИ.pdf --fi ТЕСТ
+    structure all Структура.xlsx
+"""
+import argparse
+import importlib
+import os
+import shlex
+import sys
+import time
+import traceback
+
+PACKAGE_DIR = os.path.abspath(os.path.dirname(__file__))
+
+# Скрипты разделов импортируют соседей плоско (import progress, from core import ...)
+for _folder in ("structure", "functions", ""):
+    _path = os.path.join(PACKAGE_DIR, _folder) if _folder else PACKAGE_DIR
+    if _path not in sys.path:
+        sys.path.insert(0, _path)
+
+SECTIONS = {
+    "functions": {
+        "parse": "parse_functions",
+        "xml": "excel_to_xml_functions",
+        "excel": "Functions.xlsx",
+        "xml_file": "functions_output.xml",
+    },
+    "structure": {
+        "parse": "parse_structure",
+        "xml": "excel_to_xml_structure",
+        "excel": "Structure.xlsx",
+        "xml_file": "structure_output.xml",
+    },
+}
+
+STAGES = ("parse", "xml", "all")
+
+# Ключи XML-конвертеров, которые можно указать вместе с параметрами парсера
+XML_FLAGS = ("--full", "--force")
+
+
+def _exit_code(e: SystemExit) -> int:
+    if e.code is None:
+        return 0
+    if isinstance(e.code, int):
+        return e.code
+    print(e.code)
+    return 1
+
+
+def run_stage(module_name: str, argv, prog: str) -> int:
+    """
+    Вызывает main() скрипта раздела с заданными аргументами командной строки.
+    Возвращает код завершения (sys.exit внутри скрипта перехватывается).
+    """
+    module = importlib.import_module(module_name)
+
+    # прогресс включается ключом --progress конкретного шага
+    progress = sys.modules.get("progress")
+    if progress is not None:
+        progress.enabled = False
+
+    saved_argv = sys.argv
+    sys.argv = [prog] + list(argv)
+    try:
+        module.main()
+    except SystemExit as e:
+        return _exit_code(e)
+    finally:
+        sys.argv = saved_argv
+    return 0
+
+
+def _option_value(argv, name: str):
+    """Значение ключа name из списка аргументов (--out X или --out=X) или None."""
+    for i, arg in enumerate(argv):
+        if arg == name and i + 1 < len(argv):
+            return argv[i + 1]
+        if arg.startswith(name + "="):
+            return arg[len(name) + 1:]
+    return None
+
+
+def _split_xml_flags(argv):
+    """(аргументы без ключей XML_FLAGS, ключи XML_FLAGS)."""
+    rest = [arg for arg in argv if arg not in XML_FLAGS]
+    flags = [arg for arg in XML_FLAGS if arg in argv]
+    return rest, flags
+
+
+def run_section(section: str, stage: str, argv, base_dir: str) -> int:
+    """Шаги parse / xml / all одного раздела."""
+    from core import result_dirs
+
+    spec = SECTIONS[section]
+    excel_dir, xml_dir = result_dirs(base_dir)
+    prog = f"python -m scripts {section} {stage}"
+
+    argv, xml_flags = _split_xml_flags(argv)
+    if stage == "xml" and argv:
+        print(f"Ошибка: шаг xml принимает только {', '.join(XML_FLAGS)}: {' '.join(argv)}")
+        return 2
+
+    excel_path = os.path.join(excel_dir, spec["excel"])
+
+    if stage in ("parse", "all"):
+        out = _option_value(argv, "--out")
+        if out is None:
+            os.makedirs(excel_dir, exist_ok=True)
+            argv = list(argv) + ["--out", excel_path]
+        else:
+            excel_path = os.path.abspath(out)
+
+        code = run_stage(spec["parse"], argv, prog)
+        if code != 0 or stage == "parse":
+            return code
+
+    # XML-конвертер читает пути из констант модуля — подставляем свои
+    converter = importlib.import_module(spec["xml"])
+    converter.INPUT_FILE = excel_path
+    converter.XML_DIR = xml_dir
+    converter.OUTPUT_FILE = os.path.join(xml_dir, spec["xml_file"])
+    return run_stage(spec["xml"], xml_flags, prog)
+
+
+def run_combined(argv, base_dir: str) -> int:
+    """Структура и функции из одного прохода по документу, затем оба XML."""
+    import combined
+
+    argv, xml_flags = _split_xml_flags(argv)
+    try:
+        code, sections = combined.main(argv, base_dir)
+    except SystemExit as e:
+        return _exit_code(e)
+    for section in sections:
+        xml_code = run_section(section, "xml", xml_flags, base_dir)
+        code = code or xml_code
+    return code
+
+
+def run_batch(path: str, base_dir: str, keep_going: bool) -> int:
+    """Выполняет команды из файла по очереди и печатает сводку."""
+    try:
+        with open(path, "r", encoding="utf-8-sig") as f:
+            lines = f.read().splitlines()
+    except OSError as e:
+        print(f"Ошибка: не удалось прочитать файл заданий '{path}': {e}")
+        return 1
+
+    jobs = []
+    for line_no, line in enumerate(lines, 1):
+        line = line.strip()
+        if line and not line.startswith("#"):
+            jobs.append((line_no, line))
+
+    results = []
+    for line_no, line in jobs:
+        print()
+        print(f"=== Задание {len(results) + 1}/{len(jobs)} (строка {line_no}): {line}")
+
+        t0 = time.perf_counter()
+        try:
+            tokens = shlex.split(line, posix=True)
+            if tokens and tokens[0] == "batch":
+                print("Ошибка: batch внутри batch не поддерживается.")
+                code = 2
+            else:
+                code = main(["--base", base_dir] + tokens)
+        except SystemExit as e:
+            # ошибка разбора параметров в строке задания
+            code = _exit_code(e)
+        except Exception:
+            traceback.print_exc(file=sys.stdout)
+            code = 1
+        results.append((line, code, time.perf_counter() - t0))
+
+        if code != 0 and not keep_going:
+            print("Задание завершилось с ошибкой, остальные пропущены (см. --keep-going).")
+            break
+
+    print()
+    print("================================")
+    print(" Итог пакетного запуска")
+    for line, code, seconds in results:
+        status = "OK    " if code == 0 else f"код {code}"
+        print(f" [{status}] {seconds:7.1f} с  {line}")
+    skipped = len(jobs) - len(results)
+    if skipped:
+        print(f" Пропущено: {skipped}")
+    print("================================")
+
+    failed = [code for _, code, _ in results if code != 0]
+    return failed[0] if failed else (1 if skipped else 0)
+
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(
+        prog="python -m scripts",
+        description="Импорт функций и структуры изделия в Pragmatica (все шаги в одном процессе).",
+    )
+    parser.add_argument(
+        "--base",
+        default=PACKAGE_DIR,
+        help="Папка, в которой лежат Результаты_EXCEL и Результаты_XML "
+             "(по умолчанию папка scripts, как у отдельных скриптов).",
+    )
+    sections = parser.add_subparsers(dest="section", required=True)
+
+    for section, title in (("functions", "функции"), ("structure", "структура изделия")):
+        section_parser = sections.add_parser(section, help=f"Импорт: {title}.")
+        stages = section_parser.add_subparsers(dest="stage", required=True)
+        stages.add_parser(
+            "parse",
+            help=f"Документ -> {SECTIONS[section]['excel']} "
+                 f"(параметры — как у {SECTIONS[section]['parse']}.py).",
+            add_help=False,
+        )
+        xml = stages.add_parser(
+            "xml",
+            help=f"{SECTIONS[section]['excel']} -> XML (изменения относительно прошлой выгрузки).",
+        )
+        xml.add_argument("--full", action="store_true", help="Полный XML.")
+        xml.add_argument(
+            "--force",
+            action="store_true",
+            help=f"Пересоздать XML, даже если {SECTIONS[section]['excel']} не менялся.",
+        )
+        stages.add_parser("all", help="parse и xml подряд.", add_help=False)
+
+    sections.add_parser(
+        "combined",
+        help="Структура и функции из одного документа за один проход "
+             "(параметры — python -m scripts combined -h).",
+        add_help=False,
+    )
+
+    sections.add_parser(
+        "archive",
+        help="Архив прежних версий Excel и XML: list, restore, prune, pack "
+             "(параметры — python -m scripts archive -h).",
+        add_help=False,
+    )
+
+    sections.add_parser(
+        "catalog",
+        help="Поиск по каталогу прошлых импортов "
+             "(параметры — python -m scripts catalog -h).",
+        add_help=False,
+    )
+
+    sections.add_parser(
+        "excel-bench",
+        help="Скорость способов чтения Excel (openpyxl, calamine, sidecar) на своей книге "
+             "(параметры — python -m scripts excel-bench -h).",
+        add_help=False,
+    )
+
+    batch = sections.add_parser("batch", help="Выполнить команды из файла по очереди.")
+    batch.add_argument("jobs_file", help="Файл с командами, по одной в строке.")
+    batch.add_argument(
+        "--keep-going",
+        action="store_true",
+        help="Не останавливаться на первом задании с ошибкой.",
+    )
+    return parser
+
+
+def main(argv=None) -> int:
+    parser = build_parser()
+    args, rest = parser.parse_known_args(argv)
+    base_dir = os.path.abspath(args.base)
+
+    import catalog
+    catalog.CATALOG_PATH = catalog.catalog_path(base_dir)
+
+    if args.section == "batch":
+        if rest:
+            parser.error(f"unrecognized arguments: {' '.join(rest)}")
+        return run_batch(args.jobs_file, base_dir, args.keep_going)
+
+    if args.section == "combined":
+        return run_combined(rest, base_dir)
+
+    if args.section == "catalog":
+        return catalog.main(rest)
+
+    if args.section == "excel-bench":
+        import excel_reader
+
+        return excel_reader.main(rest)
+
+    if args.section == "archive":
+        import archive
+        from core import result_dirs
+
+        return archive.main(rest, list(result_dirs(base_dir)))
+
+    for flag in XML_FLAGS:
+        if getattr(args, flag[2:], False):
+            rest = rest + [flag]
+    return run_section(args.section, args.stage, rest, base_dir)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,456 @@
+# archive.py
+"""
+Архив прежних версий результатов (Functions.xlsx, functions_output.xml, ...).
+
+Раньше archive_old переносил каждый старый файл в «Архив» как есть, с
+датой в имени, и хранил вечно: одинаковые выгрузки подряд копились
+десятками, папка разрасталась до гигабайт. Теперь «Архив» — хранилище:
+
+    Архив/objects/ab/<sha256>.gz – содержимое версии, сжатое gzip;
+                                   одинаковое содержимое хранится один раз;
+    Архив/index.tsv              – журнал версий: штамп времени, имя файла,
+                                   хеш, размер, хеш содержимого.
+
+Версия, совпадающая с последней версией того же файла, в журнал не
+добавляется. Для .xlsx сравнивается содержимое книги без дат в
+docProps/core.xml (workbook_digest): иначе каждая перезапись
+Functions.xlsx с теми же данными давала бы новую версию. После каждого сохранения применяется политика хранения
+(по умолчанию ARCHIVE_KEEP_LAST последних версий каждого файла плюс
+последняя версия каждого дня за ARCHIVE_KEEP_DAYS дней), неиспользуемые
+объекты удаляются. Политику, заданную в prune --keep-last / --keep-days,
+хранилище запоминает (Архив/policy.json) и применяет при следующих записях.
+
+Команды:
+
+    python -m scripts archive list [имя]
+    python -m scripts archive restore functions_output.xml [--version 2] [--out путь]
+    python -m scripts archive prune --keep-last 5 --keep-days 14
+    python -m scripts archive pack      # старые файлы Имя_ГГГГММДД_ЧЧММСС.ext -> хранилище
+"""
+import argparse
+import gzip
+import hashlib
+import json
+import os
+import re
+import shutil
+import sys
+import zipfile
+from datetime import datetime, timedelta
+from typing import Dict, List, NamedTuple, Optional, Tuple
+
+ARCHIVE_DIR_NAME = "Архив"
+OBJECTS_DIR_NAME = "objects"
+INDEX_NAME = "index.tsv"
+POLICY_NAME = "policy.json"
+
+# Политика хранения по умолчанию (для каждого имени файла отдельно)
+ARCHIVE_KEEP_LAST = 10
+ARCHIVE_KEEP_DAYS = 30
+
+STAMP_FORMAT = "%Y%m%d_%H%M%S"
+
+COMPRESS_LEVEL = 6
+COPY_BLOCK = 1024 * 1024
+
+# Файлы старого архива: Functions_20250101_120000.xlsx
+LEGACY_NAME_RE = re.compile(r"^(?P<stem>.+)_(?P<stamp>\d{8}_\d{6})(?P<ext>\.[^.]*)?$")
+
+# Часть .xlsx с датами создания/изменения: меняется при каждой записи книги
+_WORKBOOK_VOLATILE = "docProps/core.xml"
+
+
+class Version(NamedTuple):
+    stamp: str
+    name: str
+    digest: str      # SHA-256 файла — имя объекта в objects/
+    size: int
+    content: str     # хеш содержимого для сравнения версий (workbook_digest)
+
+
+def archive_dir(folder: str) -> str:
+    return os.path.join(folder, ARCHIVE_DIR_NAME)
+
+
+def _object_path(root: str, digest: str) -> str:
+    return os.path.join(root, OBJECTS_DIR_NAME, digest[:2], digest + ".gz")
+
+
+def file_digest(path: str) -> str:
+    """SHA-256 содержимого файла."""
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(COPY_BLOCK), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def workbook_digest(path: str) -> str:
+    """
+    Отпечаток содержимого книги: SHA-256 всех частей .xlsx, кроме дат в
+    docProps/core.xml. Пересохранённая с теми же данными книга даёт тот же
+    отпечаток. Для файлов, которые не являются zip, — хеш самого файла.
+    """
+    if not zipfile.is_zipfile(path):
+        return file_digest(path)
+    digest = hashlib.sha256()
+    with zipfile.ZipFile(path) as z:
+        for name in sorted(z.namelist()):
+            if name == _WORKBOOK_VOLATILE:
+                continue
+            digest.update(name.encode("utf-8") + b"\0")
+            with z.open(name) as f:
+                for block in iter(lambda: f.read(COPY_BLOCK), b""):
+                    digest.update(block)
+    return digest.hexdigest()
+
+
+# ---------------- Журнал ----------------
+
+def read_index(root: str) -> List[Version]:
+    """Версии из журнала в порядке добавления (старые первыми)."""
+    versions = []
+    try:
+        with open(os.path.join(root, INDEX_NAME), "r", encoding="utf-8") as f:
+            for line in f:
+                parts = line.rstrip("\n").split("\t")
+                if len(parts) in (4, 5) and parts[3].isdigit():
+                    # в журналах до хеша содержимого его роль играл хеш файла
+                    content = parts[4] if len(parts) == 5 else parts[2]
+                    versions.append(Version(parts[0], parts[1], parts[2], int(parts[3]), content))
+    except FileNotFoundError:
+        pass
+    return versions
+
+
+def _format_version(v: Version) -> str:
+    return f"{v.stamp}\t{v.name}\t{v.digest}\t{v.size}\t{v.content}\n"
+
+
+def _append_index(root: str, version: Version) -> None:
+    with open(os.path.join(root, INDEX_NAME), "a", encoding="utf-8", newline="\n") as f:
+        f.write(_format_version(version))
+
+
+def _write_index(root: str, versions: List[Version]) -> None:
+    path = os.path.join(root, INDEX_NAME)
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "w", encoding="utf-8", newline="\n") as f:
+        f.writelines(_format_version(v) for v in versions)
+    os.replace(tmp_path, path)
+
+
+# ---------------- Сохранение ----------------
+
+def _store_object(root: str, src: str, digest: str) -> None:
+    """Сжимает src в объект digest, если такого содержимого ещё нет."""
+    obj = _object_path(root, digest)
+    if os.path.isfile(obj):
+        return
+    os.makedirs(os.path.dirname(obj), exist_ok=True)
+    tmp_path = obj + ".tmp"
+    with open(src, "rb") as fin, gzip.open(tmp_path, "wb", compresslevel=COMPRESS_LEVEL) as fout:
+        shutil.copyfileobj(fin, fout, COPY_BLOCK)
+    os.replace(tmp_path, obj)
+
+
+def store(path: str, stamp: Optional[str] = None) -> Optional[Version]:
+    """
+    Кладёт файл path в хранилище «Архив» рядом с ним и удаляет оригинал.
+    Возвращает новую версию или None, если содержимое совпало с последней
+    версией этого файла (тогда ничего не сохраняется).
+    """
+    root = archive_dir(os.path.dirname(path))
+    name = os.path.basename(path)
+    stamp = stamp or datetime.now().strftime(STAMP_FORMAT)
+
+    content = workbook_digest(path)
+    same_name = [v for v in read_index(root) if v.name == name]
+    version = None
+    if not same_name or same_name[-1].content != content:
+        digest = file_digest(path)
+        _store_object(root, path, digest)
+        version = Version(stamp, name, digest, os.path.getsize(path), content)
+        _append_index(root, version)
+
+    os.remove(path)
+    return version
+
+
+# ---------------- Политика хранения ----------------
+
+def select_kept(versions: List[Version], keep_last: int, keep_days: int,
+                today: Optional[datetime] = None) -> List[Version]:
+    """
+    Версии одного файла, которые остаются: keep_last последних и
+    последняя версия каждого из keep_days последних дней.
+    """
+    ordered = sorted(versions, key=lambda v: v.stamp)
+    kept = set(ordered[-keep_last:]) if keep_last > 0 else set()
+
+    if keep_days > 0:
+        today = today or datetime.now()
+        first_day = (today - timedelta(days=keep_days - 1)).strftime("%Y%m%d")
+        latest_of_day: Dict[str, Version] = {}
+        for v in ordered:
+            day = v.stamp[:8]
+            if day >= first_day:
+                latest_of_day[day] = v
+        kept.update(latest_of_day.values())
+
+    return [v for v in versions if v in kept]
+
+
+def read_policy(root: str) -> Tuple[int, int]:
+    """
+    Политика хранения хранилища root: (keep_last, keep_days) из policy.json,
+    а чего там нет — ARCHIVE_KEEP_LAST / ARCHIVE_KEEP_DAYS.
+    """
+    try:
+        with open(os.path.join(root, POLICY_NAME), "r", encoding="utf-8") as f:
+            policy = json.load(f)
+    except (OSError, ValueError):
+        policy = {}
+    if not isinstance(policy, dict):
+        policy = {}
+
+    def value(key: str, default: int) -> int:
+        v = policy.get(key)
+        return v if isinstance(v, int) and not isinstance(v, bool) else default
+
+    return value("keep_last", ARCHIVE_KEEP_LAST), value("keep_days", ARCHIVE_KEEP_DAYS)
+
+
+def write_policy(root: str, keep_last: int, keep_days: int) -> None:
+    """Запоминает политику хранения для хранилища root (через временный файл)."""
+    os.makedirs(root, exist_ok=True)
+    path = os.path.join(root, POLICY_NAME)
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump({"keep_last": keep_last, "keep_days": keep_days}, f)
+    os.replace(tmp_path, path)
+
+
+def prune(root: str, keep_last: Optional[int] = None,
+          keep_days: Optional[int] = None) -> int:
+    """
+    Применяет политику хранения к хранилищу root; возвращает число удалённых
+    версий. Не заданные keep_last / keep_days берутся из read_policy.
+    """
+    saved_last, saved_days = read_policy(root)
+    keep_last = saved_last if keep_last is None else keep_last
+    keep_days = saved_days if keep_days is None else keep_days
+
+    versions = read_index(root)
+    by_name: Dict[str, List[Version]] = {}
+    for v in versions:
+        by_name.setdefault(v.name, []).append(v)
+
+    kept = set()
+    for group in by_name.values():
+        kept.update(select_kept(group, keep_last, keep_days))
+
+    dropped = len(versions) - len(kept)
+    if dropped:
+        _write_index(root, [v for v in versions if v in kept])
+
+    # объекты, на которые больше не ссылается ни одна версия
+    used = {v.digest for v in kept}
+    objects_dir = os.path.join(root, OBJECTS_DIR_NAME)
+    for folder, _, files in os.walk(objects_dir):
+        for file_name in files:
+            if file_name.endswith(".gz") and file_name[:-3] not in used:
+                os.remove(os.path.join(folder, file_name))
+    return dropped
+
+
+def archive_file(path: str) -> None:
+    """Сохраняет прежнюю версию path в хранилище и применяет его политику хранения."""
+    store(path)
+    prune(archive_dir(os.path.dirname(path)))
+
+
+# ---------------- Восстановление и перенос старого архива ----------------
+
+def restore(root: str, version: Version, out_path: str) -> None:
+    """Распаковывает версию в out_path (через временный файл рядом)."""
+    out_dir = os.path.dirname(out_path)
+    if out_dir:
+        os.makedirs(out_dir, exist_ok=True)
+    tmp_path = out_path + ".tmp"
+    with gzip.open(_object_path(root, version.digest), "rb") as fin, open(tmp_path, "wb") as fout:
+        shutil.copyfileobj(fin, fout, COPY_BLOCK)
+    os.replace(tmp_path, out_path)
+
+
+def pack_legacy(root: str) -> int:
+    """
+    Переносит файлы старого архива (Имя_ГГГГММДД_ЧЧММСС.ext) в хранилище
+    с их исходным штампом времени. Возвращает число перенесённых файлов.
+    """
+    legacy = []
+    for file_name in os.listdir(root):
+        m = LEGACY_NAME_RE.match(file_name)
+        if m and os.path.isfile(os.path.join(root, file_name)):
+            legacy.append((m.group("stamp"), m.group("stem") + (m.group("ext") or ""), file_name))
+
+    versions = read_index(root)
+    for stamp, name, file_name in sorted(legacy):
+        path = os.path.join(root, file_name)
+        digest = file_digest(path)
+        _store_object(root, path, digest)
+        versions.append(Version(stamp, name, digest, os.path.getsize(path), workbook_digest(path)))
+        os.remove(path)
+
+    if legacy:
+        versions.sort(key=lambda v: v.stamp)
+        # подряд идущие одинаковые версии одного файла оставляем один раз
+        last_content: Dict[str, str] = {}
+        unique = []
+        for v in versions:
+            if last_content.get(v.name) != v.content:
+                unique.append(v)
+            last_content[v.name] = v.content
+        _write_index(root, unique)
+    return len(legacy)
+
+
+# ---------------- Командная строка ----------------
+
+def _roots(folders: List[str]) -> List[str]:
+    return [archive_dir(f) for f in folders if os.path.isdir(archive_dir(f))]
+
+
+def _dir_size(root: str) -> int:
+    total = 0
+    for folder, _, files in os.walk(root):
+        for file_name in files:
+            total += os.path.getsize(os.path.join(folder, file_name))
+    return total
+
+
+def _cmd_list(roots: List[str], name: Optional[str]) -> int:
+    found = 0
+    for root in roots:
+        versions = [v for v in read_index(root) if name is None or v.name == name]
+        if not versions:
+            continue
+        print(f"{root}  (на диске {_dir_size(root) / 1e6:.1f} МБ)")
+        by_name: Dict[str, List[Version]] = {}
+        for v in versions:
+            by_name.setdefault(v.name, []).append(v)
+        for file_name, group in sorted(by_name.items()):
+            print(f"  {file_name}")
+            for number, v in enumerate(reversed(group), 1):
+                print(f"    {number:>3}  {v.stamp}  {v.size / 1e6:8.2f} МБ  {v.digest[:12]}")
+            found += len(group)
+    if not found:
+        print("Архив пуст." if name is None else f"В архиве нет версий '{name}'.")
+        return 1
+    return 0
+
+
+def _cmd_restore(roots: List[str], name: str, number: int, out: Optional[str]) -> int:
+    for root in roots:
+        group = [v for v in read_index(root) if v.name == name]
+        if not group:
+            continue
+        if not 1 <= number <= len(group):
+            print(f"Ошибка: у '{name}' версии с 1 по {len(group)} (1 — последняя).")
+            return 1
+        version = group[-number]
+        out_path = os.path.abspath(out) if out else os.path.join(os.path.dirname(root), name)
+
+        # текущий файл тоже сохраняем, чтобы восстановление можно было отменить
+        if os.path.isfile(out_path) and os.path.dirname(out_path) == os.path.dirname(root):
+            store(out_path)
+        restore(root, version, out_path)
+        print(f"Восстановлена версия {version.stamp}: {out_path}")
+        return 0
+
+    print(f"В архиве нет версий '{name}'.")
+    return 1
+
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(
+        prog="python -m scripts archive",
+        description="Архив прежних версий Excel и XML: список, восстановление, очистка.",
+    )
+    parser.add_argument(
+        "--dir",
+        action="append",
+        help="Папка с результатами, в которой лежит «Архив» "
+             "(по умолчанию Результаты_EXCEL и Результаты_XML папки --base).",
+    )
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    list_parser = commands.add_parser("list", help="Версии в архиве (1 — последняя).")
+    list_parser.add_argument("name", nargs="?", help="Только версии этого файла.")
+
+    restore_parser = commands.add_parser("restore", help="Вернуть версию файла из архива.")
+    restore_parser.add_argument("name", help="Имя файла, например functions_output.xml.")
+    restore_parser.add_argument("--version", type=int, default=1, help="Номер версии из list (1 — последняя).")
+    restore_parser.add_argument("--out", help="Куда записать (по умолчанию на место файла).")
+
+    prune_parser = commands.add_parser(
+        "prune",
+        help="Применить политику хранения; заданные --keep-* запоминаются для следующих записей.",
+    )
+    prune_parser.add_argument("--keep-last", type=int,
+                              help="Сколько последних версий каждого файла хранить "
+                                   f"(по умолчанию {ARCHIVE_KEEP_LAST}).")
+    prune_parser.add_argument("--keep-days", type=int,
+                              help="За сколько дней хранить последнюю версию каждого дня "
+                                   f"(по умолчанию {ARCHIVE_KEEP_DAYS}).")
+
+    commands.add_parser("pack", help="Перенести файлы старого архива (Имя_ГГГГММДД_ЧЧММСС) в хранилище.")
+    return parser
+
+
+def main(argv, folders: List[str]) -> int:
+    args = build_parser().parse_args(argv)
+    folders = [os.path.abspath(f) for f in (args.dir or folders)]
+
+    try:
+        if args.command == "pack":
+            total = 0
+            for folder in folders:
+                root = archive_dir(folder)
+                if os.path.isdir(root):
+                    moved = pack_legacy(root)
+                    dropped = prune(root)
+                    total += moved
+                    print(f"{root}: перенесено {moved}, удалено по политике хранения {dropped}, "
+                          f"на диске {_dir_size(root) / 1e6:.1f} МБ")
+            return 0 if total else 1
+
+        roots = _roots(folders)
+        if args.command == "list":
+            return _cmd_list(roots, args.name)
+        if args.command == "restore":
+            return _cmd_restore(roots, args.name, args.version, args.out)
+
+        remember = args.keep_last is not None or args.keep_days is not None
+        if remember:
+            # политику можно задать и до первой версии в архиве
+            roots = [archive_dir(f) for f in folders]
+        for root in roots:
+            keep_last, keep_days = read_policy(root)
+            if remember:
+                keep_last = keep_last if args.keep_last is None else args.keep_last
+                keep_days = keep_days if args.keep_days is None else args.keep_days
+                write_policy(root, keep_last, keep_days)
+            dropped = prune(root, keep_last, keep_days)
+            print(f"{root}: политика — {keep_last} последних и по одной в день за {keep_days} дн.; "
+                  f"удалено версий {dropped}, на диске {_dir_size(root) / 1e6:.1f} МБ")
+        return 0
+    except OSError as e:
+        print(f"Ошибка архива: {e}")
+        return 1
+
+
+if __name__ == "__main__":
+    from core import result_dirs
+
+    sys.exit(main(sys.argv[1:], list(result_dirs(os.path.abspath(os.path.dirname(__file__))))))
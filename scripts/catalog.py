@@ -0,0 +1,358 @@
+# catalog.py
+"""
+Каталог всех импортов: функции и структура изделия из каждого запуска
+в одной базе SQLite (Каталог.sqlite рядом со скриптами или в папке --base).
+
+Раньше история была только в папках «Архив» (Functions_ГГГГММДД_ЧЧММСС.xlsx
+и т.п.), и чтобы узнать, в каком документе и под каким ФИ был Ф21.20.01,
+приходилось открывать десятки книг. Теперь парсеры после записи Excel
+добавляют результат в каталог:
+
+    items   – раздел, ФИ, код, хеш источника, родитель, название, описание;
+              одна строка на (раздел, ФИ, код, источник), повторный импорт
+              того же документа под тем же ФИ заменяет его строки (коды,
+              которых в новом разборе нет, удаляются);
+    sources – хеш источника (SHA-256 содержимого) и пути файлов;
+    items_fts – полнотекстовый индекс FTS5 по названиям и описаниям.
+
+Поиск:
+
+    python -m scripts catalog --code Ф21.20.01
+    python -m scripts catalog --code "Ф21.20.*" --fi ТЕСТ
+    python -m scripts catalog насос подачи
+"""
+import argparse
+import hashlib
+import os
+import sqlite3
+import sys
+import time
+from datetime import datetime
+from typing import Iterable, Iterator, List, Optional, Tuple
+
+CATALOG_NAME = "Каталог.sqlite"
+
+SECTIONS = ("functions", "structure")
+
+# Строк за один executemany при записи
+BATCH_ROWS = 10000
+
+HASH_BLOCK = 1024 * 1024
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS sources (
+    source_hash TEXT PRIMARY KEY,
+    paths       TEXT NOT NULL,
+    first_seen  TEXT NOT NULL,
+    last_seen   TEXT NOT NULL
+);
+
+CREATE TABLE IF NOT EXISTS items (
+    id          INTEGER PRIMARY KEY,
+    section     TEXT NOT NULL,
+    fi          TEXT NOT NULL,
+    code        TEXT NOT NULL,
+    source_hash TEXT NOT NULL REFERENCES sources(source_hash),
+    parent      TEXT NOT NULL DEFAULT '',
+    name        TEXT NOT NULL DEFAULT '',
+    description TEXT NOT NULL DEFAULT '',
+    imported_at TEXT NOT NULL,
+    UNIQUE (section, fi, code, source_hash)
+);
+
+CREATE INDEX IF NOT EXISTS items_code ON items(code);
+
+CREATE VIRTUAL TABLE IF NOT EXISTS items_fts USING fts5(
+    name, description,
+    content='items', content_rowid='id',
+    tokenize='unicode61 remove_diacritics 2'
+);
+
+CREATE TRIGGER IF NOT EXISTS items_ai AFTER INSERT ON items BEGIN
+    INSERT INTO items_fts(rowid, name, description)
+    VALUES (new.id, new.name, new.description);
+END;
+
+CREATE TRIGGER IF NOT EXISTS items_ad AFTER DELETE ON items BEGIN
+    INSERT INTO items_fts(items_fts, rowid, name, description)
+    VALUES ('delete', old.id, old.name, old.description);
+END;
+
+CREATE TRIGGER IF NOT EXISTS items_au AFTER UPDATE ON items BEGIN
+    INSERT INTO items_fts(items_fts, rowid, name, description)
+    VALUES ('delete', old.id, old.name, old.description);
+    INSERT INTO items_fts(rowid, name, description)
+    VALUES (new.id, new.name, new.description);
+END;
+"""
+
+UPSERT_ITEM = """
+INSERT INTO items (section, fi, code, source_hash, parent, name, description, imported_at)
+VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+ON CONFLICT (section, fi, code, source_hash) DO UPDATE SET
+    parent = excluded.parent,
+    name = excluded.name,
+    description = excluded.description,
+    imported_at = excluded.imported_at
+"""
+
+# Коды текущего импорта: по ним в конце удаляются строки прошлого импорта
+# того же документа, которых в новом разборе уже нет
+SEEN_SCHEMA = "CREATE TEMP TABLE IF NOT EXISTS seen (code TEXT PRIMARY KEY)"
+
+DELETE_UNSEEN = """
+DELETE FROM items
+WHERE section = ? AND fi = ? AND source_hash = ?
+  AND code NOT IN (SELECT code FROM temp.seen)
+"""
+
+
+def catalog_path(base_dir: str) -> str:
+    return os.path.join(base_dir, CATALOG_NAME)
+
+
+# Каталог по умолчанию — в папке scripts (как Результаты_EXCEL у скриптов);
+# python -m scripts --base меняет его вместе с папками результатов
+CATALOG_PATH = catalog_path(os.path.abspath(os.path.dirname(__file__)))
+
+
+def connect(path: Optional[str] = None) -> sqlite3.Connection:
+    """Открывает (и при необходимости создаёт) базу каталога."""
+    path = path or CATALOG_PATH
+    folder = os.path.dirname(path)
+    if folder:
+        os.makedirs(folder, exist_ok=True)
+    conn = sqlite3.connect(path, timeout=30)
+    conn.execute("PRAGMA synchronous = NORMAL")
+    conn.executescript(SCHEMA)
+    return conn
+
+
+def file_hash(path: str) -> str:
+    """SHA-256 содержимого файла."""
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(HASH_BLOCK), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def source_hash(paths: List[str]) -> str:
+    """Хеш источника: хеш файла, для нескольких файлов — хеш их хешей (порядок не важен)."""
+    hashes = sorted(file_hash(p) for p in paths)
+    if len(hashes) == 1:
+        return hashes[0]
+    return hashlib.sha256("\n".join(hashes).encode("ascii")).hexdigest()
+
+
+def _open_import(section: str, sources: List[str], path: Optional[str]):
+    """Соединение и хеш источника для записи импорта; (None, None) при ошибке."""
+    try:
+        sources = [os.path.abspath(p) for p in sources]
+        src_hash = source_hash(sources)
+        now = datetime.now().isoformat(timespec="seconds")
+        conn = connect(path)
+        conn.execute(
+            "INSERT INTO sources (source_hash, paths, first_seen, last_seen) VALUES (?, ?, ?, ?) "
+            "ON CONFLICT (source_hash) DO UPDATE SET paths = excluded.paths, "
+            "last_seen = excluded.last_seen",
+            (src_hash, "\n".join(sources), now, now),
+        )
+        conn.execute(SEEN_SCHEMA)
+        return conn, (src_hash, now)
+    except (OSError, sqlite3.Error) as e:
+        print(f"Каталог не обновлён: {e}")
+        return None, None
+
+
+def recording(
+    rows: Iterable[Tuple[str, str, str, str]],
+    section: str,
+    fi: str,
+    sources: List[str],
+    path: Optional[str] = None,
+) -> Iterator[Tuple[str, str, str, str]]:
+    """
+    Пропускает строки (код, родитель, название, описание) дальше без
+    изменений и по пути пишет их в каталог. Так поток из consolidate_external
+    идёт и в Excel, и в каталог без второго прохода и без сбора в память.
+
+    Запись фиксируется одной транзакцией, только когда поток дочитан до
+    конца: если запись Excel оборвалась, каталог не меняется. Тогда же
+    удаляются строки прошлого импорта того же источника (раздел, ФИ, хеш),
+    кодов которых в этом потоке не было. Ошибка каталога печатается и
+    импорт не прерывает — строки идут дальше.
+    """
+    conn, meta = _open_import(section, sources, path)
+    count = 0
+    batch = []
+
+    def flush():
+        nonlocal conn
+        try:
+            conn.executemany(UPSERT_ITEM, batch)
+            conn.executemany("INSERT OR IGNORE INTO temp.seen (code) VALUES (?)",
+                             ((row[2],) for row in batch))
+        except sqlite3.Error as e:
+            print(f"Каталог не обновлён: {e}")
+            conn.close()
+            conn = None
+        batch.clear()
+
+    try:
+        for row in rows:
+            if conn is not None:
+                code, parent, name, description = row
+                batch.append((section, fi or "", code, meta[0], parent or "", name or "",
+                              description or "", meta[1]))
+                count += 1
+                if len(batch) >= BATCH_ROWS:
+                    flush()
+            yield row
+
+        if conn is not None and batch:
+            flush()
+        if conn is not None:
+            try:
+                removed = conn.execute(DELETE_UNSEEN, (section, fi or "", meta[0])).rowcount
+                conn.commit()
+            except sqlite3.Error as e:
+                print(f"Каталог не обновлён: {e}")
+            else:
+                note = f", удалено прежних: {removed}" if removed else ""
+                print(f"Каталог: {count} записей{note} ({path or CATALOG_PATH})")
+    finally:
+        if conn is not None:
+            conn.close()
+
+
+def record_import(
+    rows: Iterable[Tuple[str, str, str, str]],
+    section: str,
+    fi: str,
+    sources: List[str],
+    path: Optional[str] = None,
+) -> None:
+    """Записывает результат запуска в каталог (см. recording)."""
+    for _ in recording(rows, section, fi, sources, path):
+        pass
+
+
+# ---------------- Поиск ----------------
+
+SELECT_ITEMS = """
+SELECT i.section, i.fi, i.code, i.parent, i.name, i.description, i.imported_at, s.paths
+FROM items AS i JOIN sources AS s ON s.source_hash = i.source_hash
+"""
+
+
+def _filters(fi: Optional[str], section: Optional[str]):
+    where, params = [], []
+    if fi:
+        where.append("i.fi = ?")
+        params.append(fi)
+    if section:
+        where.append("i.section = ?")
+        params.append(section)
+    return where, params
+
+
+def lookup_code(conn, code: str, fi: Optional[str] = None,
+                section: Optional[str] = None, limit: int = 100):
+    """Записи с кодом code; '*' в конце — все коды с этим началом (Ф21.20.*)."""
+    where, params = _filters(fi, section)
+    if code.endswith("*"):
+        where.insert(0, "i.code LIKE ? ESCAPE '\\'")
+        prefix = code[:-1].replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+        params.insert(0, prefix + "%")
+    else:
+        where.insert(0, "i.code = ?")
+        params.insert(0, code)
+
+    sql = SELECT_ITEMS + " WHERE " + " AND ".join(where)
+    sql += " ORDER BY i.code, i.fi, i.imported_at DESC LIMIT ?"
+    return conn.execute(sql, params + [limit]).fetchall()
+
+
+def _fts_query(text: str) -> str:
+    """Слова запроса -> запрос FTS5: все слова, каждое как начало слова."""
+    words = [w.replace('"', '""') for w in text.split()]
+    return " ".join(f'"{w}"*' for w in words if w)
+
+
+def search_text(conn, text: str, fi: Optional[str] = None,
+                section: Optional[str] = None, limit: int = 100):
+    """Полнотекстовый поиск по названиям и описаниям (лучшие совпадения первыми)."""
+    query = _fts_query(text)
+    if not query:
+        return []
+    where, params = _filters(fi, section)
+    sql = SELECT_ITEMS + " JOIN items_fts AS f ON f.rowid = i.id WHERE items_fts MATCH ?"
+    if where:
+        sql += " AND " + " AND ".join(where)
+    sql += " ORDER BY f.rank LIMIT ?"
+    return conn.execute(sql, [query] + params + [limit]).fetchall()
+
+
+def print_results(rows) -> None:
+    for section, fi, code, parent, name, description, imported_at, paths in rows:
+        title = "функция" if section == "functions" else "структура"
+        where = f"ФИ {fi}" if fi else title
+        print(f"{code:<16} {name}")
+        details = f"    {where} · {imported_at}"
+        if parent:
+            details += f" · родитель {parent}"
+        print(details)
+        for p in paths.split("\n"):
+            print(f"    {p}")
+        if description:
+            first_line = description.split("\n", 1)[0]
+            print(f"    описание: {first_line}")
+
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(
+        prog="python -m scripts catalog",
+        description="Поиск по каталогу всех прошлых импортов функций и структуры.",
+    )
+    parser.add_argument("text", nargs="*", help="Слова из названия или описания.")
+    parser.add_argument("--code", help="Код (Ф21.20.01); '*' в конце — все коды с этим началом.")
+    parser.add_argument("--fi", help="Только записи этого ФИ.")
+    parser.add_argument("--section", choices=SECTIONS, help="Только функции или только структура.")
+    parser.add_argument("--limit", type=int, default=50, help="Сколько записей показать.")
+    parser.add_argument("--db", help=f"Файл каталога (по умолчанию {CATALOG_NAME} в папке --base).")
+    return parser
+
+
+def main(argv=None) -> int:
+    parser = build_parser()
+    args = parser.parse_args(argv)
+    if not args.code and not args.text:
+        parser.error("укажите --code или слова для поиска")
+
+    path = args.db or CATALOG_PATH
+    if not os.path.isfile(path):
+        print(f"Каталог ещё не создан: {path}")
+        return 1
+
+    conn = sqlite3.connect(path)
+    try:
+        t0 = time.perf_counter()
+        if args.code:
+            rows = lookup_code(conn, args.code, args.fi, args.section, args.limit)
+        else:
+            rows = search_text(conn, " ".join(args.text), args.fi, args.section, args.limit)
+        elapsed = (time.perf_counter() - t0) * 1000
+    except sqlite3.Error as e:
+        print(f"Ошибка каталога: {e}")
+        return 1
+    finally:
+        conn.close()
+
+    print_results(rows)
+    print(f"Найдено: {len(rows)} ({elapsed:.1f} мс)")
+    return 0 if rows else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
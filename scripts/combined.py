@@ -0,0 +1,184 @@
+# combined.py
+"""
+Один проход по документу для обоих разделов (python -m scripts combined).
+
+В руководствах по изделию в одном файле есть и таблица
+"Система / Подсистема / Наименование", и перечень функций. Вместо двух
+запусков (parse_structure.py и parse_functions.py), каждый из которых
+открывает и разбирает документ заново, файл читается один раз:
+
+  - PDF: для каждой страницы один раз строится текстовый слой
+    (page.get_textpage()), из него берутся и слова с координатами для
+    таблицы структуры, и обычный текст для поиска функций;
+  - Excel: все листы читаются один раз, таблица структуры ищется в тех же
+    DataFrame, из которых берутся функции.
+
+Дальше работают обычные функции разделов: build_items_from_rows,
+extract_candidates / candidates_from_sheets, filter_candidates,
+infer_hierarchy, consolidate_functions.
+
+Модуль импортирует скрипты разделов плоско, поэтому запускается только
+через python -m scripts (он добавляет папки разделов в sys.path).
+"""
+import argparse
+import os
+import time
+from typing import List, Tuple
+
+import pandas as pd
+
+import catalog
+import parse_functions as pf
+import parse_structure as ps
+import progress
+from core import result_dirs
+from excel_reader import read_sheets
+
+
+def read_pdf_once(path: str, engine: str = "words") -> Tuple[List[Tuple[str, str, str]], str]:
+    """
+    Возвращает (строки таблицы структуры, текст документа для функций).
+    Слова страниц отдаются разбору структуры по мере чтения и не копятся.
+    """
+    doc = ps._open_pdf(path)
+    texts: List[str] = []
+
+    def page_words():
+        for page_no, page in enumerate(doc):
+            progress.emit("read", page_no, len(doc), "стр")
+            textpage = page.get_textpage()
+            texts.append(page.get_text("text", textpage=textpage))
+            if engine == "words":
+                yield page.get_text("words", textpage=textpage)
+
+    rows = ps.rows_from_page_words(page_words())
+    if not rows:
+        if engine == "words":
+            print("Разбор по координатам ничего не нашёл, пробуем построчный.")
+        rows = ps.rows_from_page_texts(texts)
+
+    return rows, "\n".join(texts)
+
+
+def read_excel_once(path: str) -> Tuple[List[Tuple[str, str, str]], pd.DataFrame]:
+    """
+    То же для Excel: листы читаются один раз и идут в оба разбора.
+    Вместо текста возвращаются кандидаты функций (разбор по столбцам).
+    """
+    all_sheets = read_sheets(path)
+    return ps.rows_from_sheets(all_sheets), pf.candidates_from_sheets(all_sheets)
+
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(
+        prog="python -m scripts combined",
+        description="Структура изделия и функции из одного документа за один проход.",
+    )
+    parser.add_argument("input_file", help="Источник (.pdf, .xlsx, .xls)")
+    parser.add_argument("--fi", required=True, help="Обозначение ФИ для функций")
+    parser.add_argument(
+        "--max-depth",
+        type=int,
+        default=0,
+        help="Максимальное число уровней кода функции. 0 = без ограничений.",
+    )
+    parser.add_argument("--mode", choices=["fi", "fs"], default="fi", help="Режим функций.")
+    parser.add_argument("--code-letter", default="", help="Буква кода функции (F или Ф).")
+    parser.add_argument("--code-prefix", default="", help="Порог по первой числовой группе.")
+    parser.add_argument(
+        "--pdf-engine",
+        choices=["words", "text"],
+        default="words",
+        help="Разбор таблицы структуры в PDF: по координатам слов или построчно.",
+    )
+    parser.add_argument(
+        "--no-xml",
+        action="store_true",
+        help="Создать только Structure.xlsx и Functions.xlsx, без XML.",
+    )
+    parser.add_argument(
+        "--no-catalog",
+        action="store_true",
+        help="Не записывать результат в каталог импортов (Каталог.sqlite).",
+    )
+    return parser
+
+
+def main(argv, base_dir: str):
+    """
+    Возвращает (код завершения, разделы, для которых создан Excel и нужен XML).
+    """
+    args = build_parser().parse_args(argv)
+    src = os.path.abspath(args.input_file)
+    excel_dir, _ = result_dirs(base_dir)
+
+    print("================================")
+    print(" Структура и функции за один проход")
+    print(f" Входной файл : {src}")
+    print(f" Папка Excel  : {excel_dir}")
+    print("================================")
+
+    if not os.path.isfile(src):
+        print(f"Ошибка: файл '{src}' не найден.")
+        return 1, []
+
+    ext = os.path.splitext(src)[1].lower()
+    t0 = time.perf_counter()
+    if ext == ".pdf":
+        rows, text = read_pdf_once(src, args.pdf_engine)
+        candidates = pf.extract_candidates(text)
+    elif ext in (".xlsx", ".xls"):
+        rows, candidates = read_excel_once(src)
+    else:
+        print("Ошибка: совместный разбор поддерживает только PDF и Excel.")
+        return 1, []
+    print(f"Документ прочитан за {time.perf_counter() - t0:.2f} с")
+
+    code = 0
+    written = []
+    os.makedirs(excel_dir, exist_ok=True)
+
+    # ---- структура изделия ----
+    if rows:
+        df = ps.build_items_from_rows(rows)
+        out = os.path.join(excel_dir, "Structure.xlsx")
+        ps.export_structure_excel(df, out)
+        print(f"Структура       : {len(df)} элементов -> {out}")
+        if not args.no_catalog:
+            catalog.record_import(
+                df[["Item_ID", "Parent_ID", "Name", "Description"]].itertuples(index=False),
+                "structure", "", [src],
+            )
+        written.append("structure")
+    else:
+        print("Структура       : таблица 'Система / Подсистема / Наименование' не найдена.")
+        code = 1
+
+    # ---- функции ----
+    functions = pf.filter_candidates(
+        candidates,
+        max_depth=args.max_depth,
+        mode=args.mode,
+        code_letter=args.code_letter or None,
+        code_prefix=args.code_prefix or None,
+    )
+    if functions.empty:
+        print("Функции         : не найдено ни одной строки с функцией.")
+        code = 1
+    else:
+        functions = pf.consolidate_functions(pf.infer_hierarchy(functions, mode=args.mode))
+        try:
+            pf.export_to_excel(functions, args.fi, os.path.join(excel_dir, "Functions.xlsx"))
+        except ValueError as e:
+            print(f"Функции         : {e}")
+            code = 1
+        else:
+            if not args.no_catalog:
+                catalog.record_import(
+                    functions[["Func_LCN", "Parent_LCN", "Name", "Description"]].itertuples(index=False),
+                    "functions", args.fi, [src],
+                )
+            written.append("functions")
+
+    print(f"Разбор занял    : {time.perf_counter() - t0:.2f} с")
+    return code, ([] if args.no_xml else written)
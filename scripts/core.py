@@ -0,0 +1,182 @@
+# core.py
+"""
+Общие помощники для скриптов функций и структуры изделия.
+
+Скрипты разделов импортируют модуль плоско ("from core import archive_old"):
+при запуске из папки раздела он берётся уровнем выше (scripts/core.py),
+в единой командной строке (python -m scripts) — из sys.path.
+"""
+import hashlib
+import json
+import os
+import xml.etree.ElementTree as ET
+
+from archive import archive_file, file_digest, workbook_digest
+
+EXCEL_DIR_NAME = "Результаты_EXCEL"
+XML_DIR_NAME = "Результаты_XML"
+
+
+def archive_old(path: str) -> None:
+    """
+    Если файл path существует, сохраняет его в хранилище 'Архив' рядом
+    (сжато, одинаковое содержимое — один раз, см. archive.py) и убирает
+    с места; затем применяется политика хранения версий.
+    """
+    if not os.path.isfile(path):
+        return
+
+    try:
+        archive_file(path)
+    except OSError as e:
+        # В GUI это уйдёт в лог консоли, не убьёт процесс
+        print(f"Не удалось переместить старый файл '{path}': {e}")
+
+
+def normalize_cell(value) -> str:
+    """Значение ячейки Excel -> строка без пробелов по краям ('' для пустых)."""
+    # pandas не грузим при импорте core: GUI и CLI стартуют без него
+    import pandas as pd
+
+    if pd.isna(value):
+        return ""
+    return str(value).strip()
+
+
+def result_dirs(base_dir: str):
+    """Папки результатов раздела: (Результаты_EXCEL, Результаты_XML)."""
+    return (
+        os.path.join(base_dir, EXCEL_DIR_NAME),
+        os.path.join(base_dir, XML_DIR_NAME),
+    )
+
+
+# ---------------- Снимок последней выгрузки (дельта XML) ----------------
+
+SNAPSHOT_SUFFIX = ".snapshot.tsv"
+DELTA_SUFFIX = ".delta.xml"
+
+# Разделитель полей при подсчёте отпечатка: в ячейках Excel не встречается
+_FIELD_SEP = "\x1f"
+
+
+def snapshot_path(output_file: str) -> str:
+    """Файл снимка рядом с XML: functions_output.xml -> functions_output.snapshot.tsv."""
+    return os.path.splitext(output_file)[0] + SNAPSHOT_SUFFIX
+
+
+def delta_path(output_file: str) -> str:
+    """
+    XML с изменениями рядом с полным: functions_output.xml -> functions_output.delta.xml.
+    Полный XML всегда лежит под своим именем, изменения его не подменяют.
+    """
+    return os.path.splitext(output_file)[0] + DELTA_SUFFIX
+
+
+def write_xml(dataset, path: str) -> None:
+    """Записывает <Dataset> в path с отступами (utf-8, с XML-декларацией)."""
+    tree = ET.ElementTree(dataset)
+    try:
+        ET.indent(tree, space="    ", level=0)
+    except Exception:
+        # старые версии Python без ET.indent
+        pass
+    tree.write(path, encoding="utf-8", xml_declaration=True)
+
+
+def fingerprint(values) -> str:
+    """Отпечаток строки: хеш значений всех полей, которые попадают в XML."""
+    data = _FIELD_SEP.join(values).encode("utf-8")
+    return hashlib.blake2b(data, digest_size=16).hexdigest()
+
+
+def load_snapshot(path: str):
+    """
+    Снимок прошлой выгрузки: (область, {ключ: отпечаток}) или None,
+    если снимка нет или он не читается (тогда нужна полная выгрузка).
+    """
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            header = f.readline().rstrip("\n")
+            if not header.startswith("#"):
+                return None
+            scope = header[1:].strip()
+            prints = {}
+            for line in f:
+                key, _, value = line.rstrip("\n").rpartition("\t")
+                if key:
+                    prints[key] = value
+    except (OSError, UnicodeDecodeError):
+        return None
+    return scope, prints
+
+
+def save_snapshot(path: str, scope: str, prints: dict) -> None:
+    """Записывает снимок целиком через временный файл (без полусохранённых снимков)."""
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "w", encoding="utf-8", newline="\n") as f:
+        f.write(f"# {scope}\n")
+        for key, value in prints.items():
+            f.write(f"{key}\t{value}\n")
+    os.replace(tmp_path, path)
+
+
+def diff_snapshot(old: dict, new: dict):
+    """(новые ключи, изменённые ключи, удалённые ключи); порядок — как в new / old."""
+    added = [key for key in new if key not in old]
+    changed = [key for key, value in new.items() if key in old and old[key] != value]
+    removed = [key for key in old if key not in new]
+    return added, changed, removed
+
+
+def preorder(roots, children):
+    """Ключи дерева в порядке обхода XML: родитель раньше детей."""
+    order = []
+    stack = list(reversed(roots))
+    while stack:
+        key = stack.pop()
+        order.append(key)
+        stack.extend(reversed(children[key]))
+    return order
+
+
+# ---------------- Манифест выгрузки (пропуск без изменений) ----------------
+
+MANIFEST_SUFFIX = ".manifest.json"
+
+
+def manifest_path(output_file: str) -> str:
+    """Манифест рядом с XML: functions_output.xml -> functions_output.manifest.json."""
+    return os.path.splitext(output_file)[0] + MANIFEST_SUFFIX
+
+
+def read_manifest(path: str):
+    """Манифест из файла path или None, если его нет или он повреждён."""
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            manifest = json.load(f)
+    except (OSError, ValueError):
+        return None
+    return manifest if isinstance(manifest, dict) else None
+
+
+def write_manifest(path: str, manifest: dict) -> None:
+    """Записывает манифест через временный файл, чтобы не оставить его недописанным."""
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(manifest, f, ensure_ascii=False, indent=2)
+    os.replace(tmp_path, path)
+
+
+def output_is_current(output_file: str, expected: dict) -> bool:
+    """
+    True, если прошлая выгрузка была сделана с теми же полями expected
+    (хеш входа, версия конвертера, ...) и файл выгрузки с тех пор не менялся.
+    """
+    manifest = read_manifest(manifest_path(output_file))
+    if manifest is None or any(manifest.get(k) != v for k, v in expected.items()):
+        return False
+    try:
+        return file_digest(output_file) == manifest.get("output_hash")
+    except OSError:
+        return False
@@ -0,0 +1,392 @@
+# excel_reader.py
+"""
+Чтение листов Excel с выбором самого быстрого доступного способа.
+
+Раньше конвертеры и парсеры читали книги через pd.read_excel(engine="openpyxl"):
+это самый медленный путь (openpyxl строит ячейки, pandas потом угадывает
+типы столбцов). Угадывание портит коды: если все значения столбца похожи на
+числа, столбец становится float, и текстовая ячейка "21.10" приходит как 21.1
+(в столбце, где есть и обычный текст, она остаётся строкой). Здесь ячейки
+отдаются как есть: текст — текстом, а пустые ячейки и строки — так же, как у
+pd.read_excel (NaN). Ячейка, записанная в книге числом, при любом способе
+чтения остаётся числом — 21.1, а не "21.10".
+
+Способы чтения:
+
+    sidecar  – копия листа в CSV/Parquet рядом с книгой (Functions.sidecar.csv),
+               её пишут сами экспортёры для больших книг; берётся, только пока
+               отпечаток книги совпадает с записанным (книгу не правили руками);
+    calamine – быстрый разбор на Rust (pip install python-calamine), читает и .xls;
+    openpyxl – потоковое чтение openpyxl (read_only, только значения);
+    pandas   – прежний pd.read_excel (для .xls без calamine и для сравнения).
+
+Способ выбирается сам (choose_backend): sidecar, если он действителен;
+calamine, если установлен и книга не крошечная (или это .xls); иначе openpyxl.
+
+Сравнение скорости на своей книге:
+
+    python -m scripts excel-bench Результаты_EXCEL/Functions.xlsx --sheet Функции
+"""
+import argparse
+import csv
+import importlib.util
+import os
+import shutil
+import sys
+import tempfile
+import time
+from typing import Dict, List, Optional
+
+import pandas as pd
+
+from core import read_manifest, workbook_digest, write_manifest
+
+try:
+    import openpyxl
+except Exception:
+    openpyxl = None
+
+# На книгах меньше этого размера выигрыш calamine не окупает его загрузку
+CALAMINE_MIN_BYTES = 64 * 1024
+
+# Sidecar пишется только для книг от этого размера
+SIDECAR_MIN_BYTES = 1024 * 1024
+
+SIDECAR_SUFFIX = ".sidecar"
+
+
+def has_calamine() -> bool:
+    return importlib.util.find_spec("python_calamine") is not None
+
+
+def has_parquet() -> bool:
+    return any(importlib.util.find_spec(m) is not None for m in ("pyarrow", "fastparquet"))
+
+
+def available_backends() -> List[str]:
+    backends = ["sidecar"]
+    if has_calamine():
+        backends.append("calamine")
+    if openpyxl is not None:
+        backends.append("openpyxl")
+    backends.append("pandas")
+    return backends
+
+
+# ---------------- Приведение строк листа ----------------
+
+NAN = float("nan")
+
+
+def _empty(value) -> bool:
+    return value is None or value == "" or (isinstance(value, float) and value != value)
+
+
+def _frame(rows, header: bool) -> pd.DataFrame:
+    """
+    Строки листа (кортежи значений) -> DataFrame, как у pd.read_excel:
+    пустые ячейки — NaN, пустые строки в конце листа и пустые ячейки в
+    конце строк отрезаются (пустые строки внутри остаются — по ним
+    считаются номера строк в сообщениях об ошибках).
+    header=True — первая строка становится заголовком.
+    """
+    data = []
+    width = 0
+    filled = 0
+    for row in rows:
+        row = [NAN if _empty(v) else v for v in row]
+        while row and row[-1] is NAN:
+            row.pop()
+        data.append(row)
+        if row:
+            width = max(width, len(row))
+            filled = len(data)
+    del data[filled:]
+    for row in data:
+        row.extend([NAN] * (width - len(row)))
+
+    if not header:
+        return pd.DataFrame(data, columns=range(width), dtype=object)
+    if not data:
+        return pd.DataFrame()
+
+    columns = [
+        f"Unnamed: {i}" if name is NAN else str(name)
+        for i, name in enumerate(data[0])
+    ]
+    return pd.DataFrame(data[1:], columns=columns, dtype=object)
+
+
+# ---------------- Способы чтения ----------------
+
+def _read_openpyxl(path: str, sheet_names, header: bool) -> Dict[str, pd.DataFrame]:
+    wb = openpyxl.load_workbook(path, read_only=True, data_only=True)
+    try:
+        names = wb.sheetnames if sheet_names is None else sheet_names
+        return {
+            name: _frame(wb[name].iter_rows(values_only=True), header)
+            for name in names
+        }
+    finally:
+        wb.close()
+
+
+def _read_pandas(path: str, sheet_names, header: bool, engine: Optional[str]) -> Dict[str, pd.DataFrame]:
+    sheets = pd.read_excel(path, sheet_name=sheet_names, header=None, dtype=object, engine=engine)
+    return {
+        name: _frame(df.itertuples(index=False, name=None), header)
+        for name, df in sheets.items()
+    }
+
+
+def _sidecar_meta_path(path: str) -> str:
+    return os.path.splitext(path)[0] + SIDECAR_SUFFIX + ".json"
+
+
+def valid_sidecar(path: str, sheet_name: str) -> Optional[dict]:
+    """
+    Описание sidecar листа sheet_name, если он есть и книга с тех пор не менялась.
+    Отпечаток книги (распаковка и хеш всех частей) считается, только когда
+    sidecar для этого листа вообще есть, — это самая дорогая проверка.
+    """
+    meta = read_manifest(_sidecar_meta_path(path))
+    if meta is None or meta.get("sheet") != sheet_name:
+        return None
+    data = os.path.join(os.path.dirname(path), meta.get("data", ""))
+    if not os.path.isfile(data):
+        return None
+    try:
+        if workbook_digest(path) != meta.get("workbook"):
+            return None
+    except Exception:
+        return None
+    return dict(meta, data=data)
+
+
+def _read_sidecar(meta: dict, header: bool) -> pd.DataFrame:
+    if meta["format"] == "parquet":
+        df = pd.read_parquet(meta["data"])
+    else:
+        df = pd.read_csv(meta["data"], dtype=str, keep_default_na=False,
+                         skip_blank_lines=False, encoding="utf-8")
+    df = df.astype(object)
+    df = df.where(df != "", NAN)
+    if header:
+        return df
+    # как у остальных способов: заголовок — первая строка данных
+    head = pd.DataFrame([list(df.columns)], columns=df.columns, dtype=object)
+    df = pd.concat([head, df], ignore_index=True)
+    df.columns = range(df.shape[1])
+    return df
+
+
+def choose_backend(path: str, sheet_name: Optional[str] = None) -> str:
+    """Самый быстрый доступный способ для книги path (см. описание модуля)."""
+    if sheet_name is not None and valid_sidecar(path, sheet_name) is not None:
+        return "sidecar"
+    is_xls = os.path.splitext(path)[1].lower() == ".xls"
+    if has_calamine() and (is_xls or os.path.getsize(path) >= CALAMINE_MIN_BYTES):
+        return "calamine"
+    if openpyxl is not None and not is_xls:
+        return "openpyxl"
+    return "pandas"
+
+
+def read_sheets(path: str, sheet_names=None, header: bool = False,
+                backend: str = "auto") -> Dict[str, pd.DataFrame]:
+    """
+    Листы книги {имя: DataFrame}. sheet_names=None — все листы.
+    header=False — столбцы 0..N-1 (как header=None у pandas).
+    """
+    meta = None
+    if backend == "auto":
+        # то же, что choose_backend, но отпечаток книги считается один раз:
+        # найденный sidecar сразу и читается
+        if sheet_names is not None and len(sheet_names) == 1:
+            meta = valid_sidecar(path, sheet_names[0])
+        backend = "sidecar" if meta is not None else choose_backend(path)
+
+    if backend == "sidecar":
+        (name,) = sheet_names
+        if meta is None:
+            meta = valid_sidecar(path, name)
+        if meta is None:
+            raise ValueError(f"нет действительного sidecar для листа '{name}'")
+        return {name: _read_sidecar(meta, header)}
+    if backend == "calamine":
+        return _read_pandas(path, sheet_names, header, "calamine")
+    if backend == "openpyxl":
+        return _read_openpyxl(path, sheet_names, header)
+    if backend == "pandas":
+        return _read_pandas(path, sheet_names, header, None)
+    raise ValueError(f"неизвестный способ чтения Excel: {backend}")
+
+
+def read_sheet(path: str, sheet_name: str, header: bool = True,
+               backend: str = "auto") -> pd.DataFrame:
+    """Один лист; по умолчанию первая строка — заголовок (как pd.read_excel)."""
+    return read_sheets(path, [sheet_name], header, backend)[sheet_name]
+
+
+# ---------------- Sidecar ----------------
+
+def _cell_text(value) -> str:
+    if _empty(value):
+        return ""
+    if isinstance(value, float) and value.is_integer():
+        return str(int(value))
+    return str(value)
+
+
+def sidecar_frame(df: pd.DataFrame) -> pd.DataFrame:
+    """Таблица в том виде, в каком её вернёт чтение книги: всё — текст, пустое — ''."""
+    out = {}
+    for col in df.columns:
+        values = df[col]
+        if isinstance(values.dtype, pd.CategoricalDtype):
+            values = values.astype(object)
+        if pd.api.types.infer_dtype(values, skipna=True) in ("string", "empty"):
+            out[col] = values.fillna("")
+        else:
+            out[col] = values.map(_cell_text)
+    return pd.DataFrame(out, dtype=object)
+
+
+def sidecar_data_path(path: str, fmt: str) -> str:
+    return os.path.splitext(path)[0] + SIDECAR_SUFFIX + "." + fmt
+
+
+def remove_sidecar(path: str) -> None:
+    for name in (_sidecar_meta_path(path), sidecar_data_path(path, "csv"),
+                 sidecar_data_path(path, "parquet")):
+        try:
+            os.remove(name)
+        except OSError:
+            pass
+
+
+def commit_sidecar(path: str, sheet_name: str, data_path: str) -> None:
+    """
+    Привязывает записанные данные sidecar к только что сохранённой книге
+    (отпечаток книги в .sidecar.json). Маленьким книгам sidecar не нужен.
+    """
+    meta_path = _sidecar_meta_path(path)
+    try:
+        if os.path.getsize(path) < SIDECAR_MIN_BYTES:
+            remove_sidecar(path)
+            return
+        meta = {
+            "workbook": workbook_digest(path),
+            "sheet": sheet_name,
+            "data": os.path.basename(data_path),
+            "format": os.path.splitext(data_path)[1][1:],
+        }
+        write_manifest(meta_path, meta)
+    except OSError as e:
+        print(f"Не удалось сохранить sidecar для '{path}': {e}")
+        remove_sidecar(path)
+
+
+def _write_sidecar_data(path: str, df: pd.DataFrame) -> str:
+    """Пишет данные sidecar (Parquet, если есть pyarrow/fastparquet, иначе CSV)."""
+    fmt = "parquet" if has_parquet() else "csv"
+    data_path = sidecar_data_path(path, fmt)
+    frame = sidecar_frame(df)
+    if fmt == "parquet":
+        frame.to_parquet(data_path, index=False)
+    else:
+        frame.to_csv(data_path, index=False, encoding="utf-8")
+    return data_path
+
+
+def write_sidecar(path: str, sheet_name: str, df: pd.DataFrame) -> None:
+    """Пишет sidecar для только что сохранённой книги path (лист sheet_name = df)."""
+    remove_sidecar(path)
+    if os.path.getsize(path) < SIDECAR_MIN_BYTES:
+        return
+    try:
+        data_path = _write_sidecar_data(path, df)
+    except (OSError, ImportError, ValueError) as e:
+        print(f"Не удалось сохранить sidecar для '{path}': {e}")
+        remove_sidecar(path)
+        return
+    commit_sidecar(path, sheet_name, data_path)
+
+
+def open_sidecar_csv(path: str, columns: List[str]):
+    """
+    Sidecar для книги, которая пишется построчно: (файл, csv.writer) с
+    заголовком columns. После сохранения книги — commit_sidecar.
+    """
+    remove_sidecar(path)
+    data_path = sidecar_data_path(path, "csv")
+    f = open(data_path, "w", encoding="utf-8", newline="")
+    writer = csv.writer(f)
+    writer.writerow(columns)
+    return f, writer
+
+
+# ---------------- Сравнение скорости ----------------
+
+def benchmark(path: str, sheet_name: Optional[str] = None, repeat: int = 1) -> None:
+    """Читает лист каждым доступным способом и печатает время и скорость."""
+    if sheet_name is None:
+        with pd.ExcelFile(path) as book:
+            sheet_name = book.sheet_names[0]
+    size_mb = os.path.getsize(path) / 1e6
+    print(f"Книга: {path} ({size_mb:.1f} МБ), лист: {sheet_name}")
+    print(f"Выбор по умолчанию: {choose_backend(path, sheet_name)}")
+
+    def run(target: str, backend: str) -> pd.DataFrame:
+        best = None
+        for _ in range(repeat):
+            t0 = time.perf_counter()
+            df = read_sheet(target, sheet_name, backend=backend)
+            elapsed = time.perf_counter() - t0
+            best = elapsed if best is None else min(best, elapsed)
+        print(f"  {backend:<9} {best:8.3f} с  {len(df) / best:12,.0f} строк/с  "
+              f"{size_mb / best:7.1f} МБ/с", end="")
+        return df
+
+    reference = None
+    with tempfile.TemporaryDirectory() as tmp:
+        for backend in available_backends()[1:] + ["sidecar"]:
+            target = path
+            if backend == "sidecar" and valid_sidecar(path, sheet_name) is None:
+                # своего sidecar у книги нет — временный из уже прочитанного листа
+                target = os.path.join(tmp, os.path.basename(path))
+                shutil.copyfile(path, target)
+                commit_sidecar(target, sheet_name, _write_sidecar_data(target, reference))
+                if valid_sidecar(target, sheet_name) is None:
+                    print(f"  sidecar   книга меньше {SIDECAR_MIN_BYTES // 1024} КБ — не создаётся")
+                    continue
+
+            df = run(target, backend)
+            if reference is None:
+                reference = df
+            same = sidecar_frame(df).equals(sidecar_frame(reference))
+            print("" if same else "  (данные отличаются!)")
+
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(
+        prog="python -m scripts excel-bench",
+        description="Сравнение скорости способов чтения листа Excel.",
+    )
+    parser.add_argument("path", help="Книга .xlsx или .xls")
+    parser.add_argument("--sheet", help="Лист (по умолчанию первый)")
+    parser.add_argument("--repeat", type=int, default=1, help="Повторов на способ (берётся лучшее время).")
+    return parser
+
+
+def main(argv=None) -> int:
+    args = build_parser().parse_args(argv)
+    if not os.path.isfile(args.path):
+        print(f"Ошибка: файл '{args.path}' не найден.")
+        return 1
+    benchmark(args.path, args.sheet, max(1, args.repeat))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,17 +1,25 @@
+import time
+
+_STARTUP_T0 = time.perf_counter()  # замер времени запуска окна
+
 import os
 import socket
-import subprocess
+import sys
+import threading
 import tkinter as tk
 import tkinter.filedialog as filedialog
 import tkinter.messagebox as messagebox
 
 import customtkinter as ctk
 
-# Попробуем подключить Pillow для логотипа
 try:
-    from PIL import Image
+    import gui_runner
 except ImportError:
-    Image = None
+    # запуск из папки раздела: общие модули лежат уровнем выше (scripts/)
+    sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+    import gui_runner
+
+from tree_preview import open_hierarchy_preview
 
 # ===== Пути =====
 SCRIPT_DIR = os.path.abspath(os.path.dirname(__file__))           # ...\Функции\Служебные файлы
@@ -29,6 +37,16 @@ RESULT_XML_DIR = os.path.join(BASE_DIR, "Результаты_XML")
 os.makedirs(RESULT_EXCEL_DIR, exist_ok=True)
 os.makedirs(RESULT_XML_DIR, exist_ok=True)
 
+# Подписи стадий прогресса
+STAGE_TITLES = {
+    "read": "Чтение файла",
+    "extract": "Поиск функций",
+    "hierarchy": "Построение иерархии",
+    "export": "Запись Excel",
+}
+
+gui_runner.configure(SCRIPT_DIR, STAGE_TITLES)
+
 FIELD_WIDTH = 260  # ширина всех полей слева (кроме "Файл")
 
 _single_instance_socket = None
@@ -48,20 +66,244 @@ def ensure_single_instance():
         raise SystemExit
 
 
-def log_box_insert(text: str, bold: bool = False):
-    log_box.configure(state="normal")
-    if bold:
-        log_box.insert("end", text, ("bold",))
-    else:
-        log_box.insert("end", text)
-    log_box.see("end")
-    log_box.configure(state="disabled")
+# ===== Фоновый запуск шагов импорта =====
 
+# Лог, очередь сообщений, запуск шагов в worker.py и прогресс — в gui_runner.py
+# (общий для разделов, лежит уровнем выше — в scripts/).
 
-def run_import():
+def _import_worker(step1, out_excel, xml_args):
+    """
+    step1() создаёт Functions.xlsx и возвращает код завершения (None — отменено):
+    это запуск parse_functions.py или выгрузка из кэша кандидатов.
+    xml_args — ключи excel_to_xml_functions.py (например, --full).
+    """
+    try:
+        try:
+            returncode = step1()
+        except Exception as e:
+            gui_runner.log(f"\nОшибка: {e!r}\n")
+            gui_runner.ui_queue.put(("error", "Ошибка", f"Не удалось создать Functions.xlsx:\n{e!r}"))
+            return
+
+        if returncode is None:
+            gui_runner.log("\nИмпорт отменён пользователем.\n", bold=True)
+            return
+
+        # если парсер отвалился или не нашёл функций – не продолжаем
+        if returncode != 0:
+            gui_runner.ui_queue.put((
+                "error",
+                "Ошибка",
+                "Functions.xlsx не создан: разбор завершился с ошибкой или не нашёл ни одной функции.\nСм. лог.",
+            ))
+            return
+
+        if not os.path.isfile(out_excel):
+            gui_runner.ui_queue.put(("error", "Ошибка", "Файл Functions.xlsx не создан. См. лог выше."))
+            return
+
+        # ---------- Шаг 2 ----------
+        xml_script = os.path.join(SCRIPT_DIR, "excel_to_xml_functions.py")
+        if not os.path.isfile(xml_script):
+            gui_runner.ui_queue.put((
+                "warning",
+                "Предупреждение",
+                "Не найден excel_to_xml_functions.py.\nСоздан только Functions.xlsx.",
+            ))
+            return
+
+        cmd_xml = ["python", xml_script] + xml_args
+
+        gui_runner.log("\nШаг 2. Конвертация Functions.xlsx в XML\n", bold=True)
+        gui_runner.log("> " + " ".join(cmd_xml) + "\n\n")
+
+        try:
+            returncode = gui_runner.run_stage(cmd_xml)
+        except Exception as e:
+            gui_runner.ui_queue.put(("error", "Ошибка", f"Не удалось запустить Python:\n{e}"))
+            return
+
+        if returncode is None:
+            gui_runner.log("\nИмпорт отменён пользователем.\n", bold=True)
+            return
+
+        # XML ищем в папке Результаты_XML
+        xml_path = os.path.join(RESULT_XML_DIR, "functions_output.xml")
+        delta_file = os.path.join(RESULT_XML_DIR, "functions_output.delta.xml")
+        if returncode == 0 and os.path.isfile(xml_path):
+            message = f"Создан файл:\n{xml_path}"
+            if os.path.isfile(delta_file):
+                message += f"\n\nИзменения относительно прошлой выгрузки:\n{delta_file}"
+            gui_runner.ui_queue.put(("info", "Готово", message))
+        else:
+            gui_runner.ui_queue.put(("warning", "Предупреждение", "XML не найден. Проверьте лог."))
+    finally:
+        gui_runner.ui_queue.put(("finished",))
+
+
+# ===== Подбор фильтров по кэшу кандидатов =====
+
+# После выбора файла документ один раз читается в фоне, и все строки с кодами
+# (до фильтров) остаются в памяти worker.py вместе с индексом признаков
+# (tuning.py) — окно тяжёлые модули не загружает. Смена глубины, типа, буквы
+# или числовой части только пересчитывает маску по индексу, а "Запустить
+# импорт" выгружает Functions.xlsx из кэша без повторного чтения. Отмена
+# импорта перезапускает worker.py, и документ читается заново.
+TUNING_SAMPLE_ROWS = 8
+
+_tuning = {"key": None}  # документ, который лежит в кэше worker.py
+_tuning_loading = None
+
+# Сводка считается в одном фоновом потоке; пока он занят, копятся только
+# последние фильтры — промежуточные значения ползунка не пересчитываются
+_summary_lock = threading.Lock()
+_summary_request = None
+_summary_running = False
+
+
+def _file_key(path: str):
+    """Ключ файла, как у tuning.file_key: [путь, время изменения, размер]."""
+    try:
+        st = os.stat(path)
+    except OSError:
+        return None
+    return [os.path.abspath(path), st.st_mtime, st.st_size]
+
+
+def load_candidates(path: str):
+    """Запускает фоновое чтение документа в worker.py, если он ещё не в кэше."""
+    global _tuning_loading
+
+    key = _file_key(path)
+    if key is None or key == _tuning["key"] or key == _tuning_loading:
+        return
+    _tuning_loading = key
+    _tuning["key"] = None
+    tuning_frame.grid_remove()
+    tuning_label.configure(text="Подбор фильтров: чтение документа...")
+    threading.Thread(target=_load_candidates_worker, args=(path, key), daemon=True).start()
+
+
+def _load_candidates_worker(path, key):
+    result = gui_runner.call_worker("tuning.load", path=path)
+    gui_runner.ui_queue.put(("candidates", key, result))
+
+
+def on_candidates_loaded(key, result):
+    global _tuning_loading
+
+    if key != _tuning_loading:
+        return  # пока читали, выбрали другой файл
+    _tuning_loading = None
+
+    if result is None or "error" in result:
+        reason = result["error"] if result else "worker.py не запущен или упал"
+        tuning_label.configure(text=f"Подбор фильтров недоступен: {reason}")
+        return
+
+    _tuning["key"] = result["key"]
+    tuning_frame.grid()
+    update_tuning()
+    gui_runner.log_box_insert(
+        f"Документ прочитан для подбора фильтров: {result['rows']} строк с кодами "
+        f"за {result['seconds']:.1f} с\n"
+    )
+
+
+def _is_cached(path: str) -> bool:
+    """Документ path в кэше worker.py и не менялся после чтения."""
+    key = _file_key(path)
+    return key is not None and key == _tuning["key"]
+
+
+def _current_filters():
+    code_letter = code_letter_var.get().strip()
+    if code_letter == "Любая":
+        code_letter = ""
+    try:
+        max_depth = int(depth_var.get().strip() or "0")
+    except ValueError:
+        max_depth = 0
+    return max_depth, mode_var.get().strip() or "fi", code_letter, code_prefix_var.get().strip()
+
+
+def update_tuning(*_):
+    """Запрашивает у worker.py сводку и образец строк под текущие фильтры."""
+    global _summary_request, _summary_running
+
+    path = file_var.get().strip()
+    if not _is_cached(path):
+        return
+    with _summary_lock:
+        _summary_request = (path, _current_filters())
+        if _summary_running:
+            return
+        _summary_running = True
+    threading.Thread(target=_summary_worker, daemon=True).start()
+
+
+def _summary_worker():
+    global _summary_request, _summary_running
+
+    while True:
+        with _summary_lock:
+            request = _summary_request
+            _summary_request = None
+            if request is None:
+                _summary_running = False
+                return
+        path, (max_depth, mode, code_letter, code_prefix) = request
+        result = gui_runner.call_worker(
+            "tuning.summary", path=path, max_depth=max_depth, mode=mode,
+            code_letter=code_letter, code_prefix=code_prefix, sample_rows=TUNING_SAMPLE_ROWS,
+        )
+        gui_runner.ui_queue.put(("tuning", path, result))
+
+
+def on_tuning_summary(path, result):
+    if result is None or path != file_var.get().strip():
+        return
+    if result.get("stale"):
+        # worker.py перезапущен или файл изменён — читаем документ заново
+        _tuning["key"] = None
+        load_candidates(path)
+        return
+
+    text = (
+        f"Подбор фильтров: строк с кодами {result['rows']} · "
+        f"пройдёт {result['passed']} · функций {result['functions']}"
+    )
+    if result["levels"]:
+        text += " · по уровням " + ", ".join(f"{d}: {n}" for d, n in result["levels"])
+    tuning_label.configure(text=text)
+
+    tuning_box.configure(state="normal")
+    tuning_box.delete("1.0", "end")
+    tuning_box.insert(
+        "end",
+        "\n".join(f"{code:<14} {name}" for code, name in result["sample"])
+        or "Ни одна строка не проходит фильтры.",
+    )
+    tuning_box.configure(state="disabled")
+
+
+def on_close():
+    gui_runner.cancel()
+    gui_runner.stop_worker()
+    app.destroy()
+
+
+PREVIEW_PAGES = 10
+
+
+def _collect_parse_options(require_fi: bool = True):
+    """
+    Проверяет поля формы. Возвращает (путь к parse_functions.py, аргументы
+    фильтров) или None, если что-то не заполнено (сообщение уже показано).
+    """
     file_path = file_var.get().strip()
     fi = fi_var.get().strip()
-    max_depth = depth_var.get().strip()
+    max_depth = depth_var.get().strip() or "0"
     mode = mode_var.get().strip() or "fi"
 
     # буква кода из переключателя
@@ -73,132 +315,130 @@ def run_import():
 
     code_prefix = code_prefix_var.get().strip()
 
-    # очистка лога
-    log_box.configure(state="normal")
-    log_box.delete("1.0", "end")
-    log_box.configure(state="disabled")
-
     if not file_path:
         messagebox.showerror("Ошибка", "Не указан файл.")
-        return
+        return None
     if not os.path.isfile(file_path):
         messagebox.showerror("Ошибка", f"Файл не найден:\n{file_path}")
-        return
-    if not fi:
+        return None
+    if require_fi and not fi:
         messagebox.showerror("Ошибка", "Не указано обозначение ФИ.")
-        return
-    if not max_depth:
-        max_depth = "0"
+        return None
 
     parse_script = os.path.join(SCRIPT_DIR, "parse_functions.py")
     if not os.path.isfile(parse_script):
         messagebox.showerror("Ошибка", f"Не найден parse_functions.py в {SCRIPT_DIR}")
-        return
-
-    # Excel складываем в папку Результаты_EXCEL
-    out_excel = os.path.join(RESULT_EXCEL_DIR, "Functions.xlsx")
-
-    cmd_parse = [
-        "python",
-        parse_script,
-        file_path,
-        "--fi",
-        fi,
-        "--out",
-        out_excel,
-        "--max-depth",
-        max_depth,
-        "--mode",
-        mode,
-    ]
+        return None
 
+    args = [file_path, "--max-depth", max_depth, "--mode", mode, "--progress"]
+    if fi:
+        args += ["--fi", fi]
     if code_letter:
-        cmd_parse += ["--code-letter", code_letter]
+        args += ["--code-letter", code_letter]
     if code_prefix:
-        cmd_parse += ["--code-prefix", code_prefix]
+        args += ["--code-prefix", code_prefix]
 
-    log_box_insert("Шаг 1. Анализ файла и создание Functions.xlsx\n", bold=True)
-    log_box_insert(f"Файл: {file_path}\n")
-    log_box_insert(f"ФИ: {fi}\n")
-    log_box_insert(f"Требуемый уровень вложенности: {max_depth}\n")
-    log_box_insert(
+    gui_runner.log_box_insert(f"Файл: {file_path}\n")
+    if fi:
+        gui_runner.log_box_insert(f"ФИ: {fi}\n")
+    gui_runner.log_box_insert(f"Требуемый уровень вложенности: {max_depth}\n")
+    gui_runner.log_box_insert(
         f"Тип функций: {'ФИ изделия' if mode == 'fi' else 'Функции систем (ФС)'}\n"
     )
     if code_letter:
-        log_box_insert(f"Буква кода: {code_letter}\n")
+        gui_runner.log_box_insert(f"Буква кода: {code_letter}\n")
     if code_prefix:
-        log_box_insert(f"Начало числовой части: {code_prefix}\n")
-    log_box_insert("\n> " + " ".join(cmd_parse) + "\n\n")
+        gui_runner.log_box_insert(f"Начало числовой части: {code_prefix}\n")
 
+    return parse_script, args
+
+
+def _start_background(target, *args):
     btn_run.configure(state="disabled")
-    try:
-        result = subprocess.run(
-            cmd_parse,
-            capture_output=True,
-            text=True,
-            cwd=SCRIPT_DIR,
-        )
-    except Exception as e:
-        messagebox.showerror("Ошибка", f"Не удалось запустить Python:\n{e}")
-        btn_run.configure(state="normal")
-        return
-    finally:
-        btn_run.configure(state="normal")
+    btn_quick.configure(state="disabled")
+    btn_cancel.configure(state="normal")
+    gui_runner.start_background(target, *args)
 
-    if result.stdout:
-        log_box_insert(result.stdout + "\n")
-    if result.stderr:
-        log_box_insert("STDERR:\n" + result.stderr + "\n")
 
-    # если парсер отвалился или не нашёл функций – не продолжаем
-    if result.returncode != 0:
-        messagebox.showerror(
-            "Ошибка",
-            "parse_functions.py завершился с ошибкой или не нашёл ни одной функции.\nСм. лог.",
-        )
-        return
+def on_finished():
+    btn_run.configure(state="normal")
+    btn_quick.configure(state="normal")
+    btn_cancel.configure(state="disabled")
 
-    if not os.path.isfile(out_excel):
-        messagebox.showerror(
-            "Ошибка",
-            "Файл Functions.xlsx не создан. См. лог выше.",
-        )
+
+def run_import():
+    # очистка лога
+    gui_runner.clear_log()
+    gui_runner.log_box_insert("Шаг 1. Анализ файла и создание Functions.xlsx\n", bold=True)
+
+    options = _collect_parse_options()
+    if options is None:
         return
+    parse_script, args = options
 
-    # ---------- Шаг 2 ----------
-    xml_script = os.path.join(SCRIPT_DIR, "excel_to_xml_functions.py")
-    if not os.path.isfile(xml_script):
-        messagebox.showwarning(
-            "Предупреждение",
-            "Не найден excel_to_xml_functions.py.\nСоздан только Functions.xlsx.",
+    # Excel складываем в папку Результаты_EXCEL
+    out_excel = os.path.join(RESULT_EXCEL_DIR, "Functions.xlsx")
+
+    src = file_var.get().strip()
+    xml_args = ["--full"] if full_xml_var.get() else []
+    if _is_cached(src):
+        # документ уже прочитан для подбора фильтров — выгружаем из памяти worker.py
+        gui_runner.log_box_insert("\nДокумент не менялся: Functions.xlsx создаётся из загруженных строк.\n\n")
+        max_depth, mode, code_letter, code_prefix = _current_filters()  # Tk-переменные читаем здесь
+        fi = fi_var.get().strip()
+        _start_background(
+            _import_worker,
+            lambda: gui_runner.run_call_stage(
+                "tuning.export", path=src, fi=fi, out=out_excel, max_depth=max_depth,
+                mode=mode, code_letter=code_letter, code_prefix=code_prefix,
+            ),
+            out_excel,
+            xml_args,
         )
         return
 
-    cmd_xml = ["python", xml_script]
+    cmd_parse = ["python", parse_script] + args + ["--out", out_excel]
 
-    log_box_insert("\nШаг 2. Конвертация Functions.xlsx в XML\n", bold=True)
-    log_box_insert("> " + " ".join(cmd_xml) + "\n\n")
+    gui_runner.log_box_insert("\n> " + " ".join(cmd_parse) + "\n\n")
+
+    _start_background(_import_worker, lambda: gui_runner.run_stage(cmd_parse), out_excel, xml_args)
 
-    result2 = subprocess.run(
-        cmd_xml,
-        capture_output=True,
-        text=True,
-        cwd=SCRIPT_DIR,
-    )
-    if result2.stdout:
-        log_box_insert(result2.stdout + "\n")
-    if result2.stderr:
-        log_box_insert("STDERR:\n" + result2.stderr + "\n")
-
-    # XML ищем в папке Результаты_XML
-    xml_path = os.path.join(RESULT_XML_DIR, "functions_output.xml")
-    if os.path.isfile(xml_path):
-        messagebox.showinfo("Готово", f"Создан файл:\n{xml_path}")
-    else:
-        messagebox.showwarning(
-            "Предупреждение",
-            "XML не найден. Проверьте лог.",
-        )
+
+def _quick_preview_worker(cmd):
+    try:
+        try:
+            returncode = gui_runner.run_stage(cmd)
+        except Exception as e:
+            gui_runner.ui_queue.put(("error", "Ошибка", f"Не удалось запустить Python:\n{e}"))
+            return
+
+        if returncode is None:
+            gui_runner.log("\nПробный разбор отменён пользователем.\n", bold=True)
+        elif returncode != 0:
+            gui_runner.log("\nПробный разбор не нашёл строк с кодами функций или завершился с ошибкой.\n", bold=True)
+    finally:
+        gui_runner.ui_queue.put(("finished",))
+
+
+def run_quick_preview():
+    """
+    Разбор случайных PREVIEW_PAGES страниц с текущими фильтрами: за секунды
+    показывает, что будет найдено, и оценку для всего документа.
+    """
+    gui_runner.clear_log()
+    gui_runner.log_box_insert("Пробный разбор (выборка страниц)\n", bold=True)
+
+    options = _collect_parse_options(require_fi=False)
+    if options is None:
+        return
+    parse_script, args = options
+
+    cmd = ["python", parse_script] + args + [
+        "--preview", str(PREVIEW_PAGES), "--sample", "random",
+    ]
+    gui_runner.log_box_insert("\n> " + " ".join(cmd) + "\n\n")
+
+    _start_background(_quick_preview_worker, cmd)
 
 
 def choose_file():
@@ -215,6 +455,214 @@ def choose_file():
     )
     if path:
         file_var.set(path)
+        load_candidates(path)
+
+
+def on_file_entered(_event=None):
+    path = file_var.get().strip()
+    if path:
+        load_candidates(path)
+
+
+# ===== Просмотр иерархии =====
+
+def open_preview():
+    """Читает Functions.xlsx в фоне и открывает дерево без запуска Excel."""
+    out_excel = os.path.join(RESULT_EXCEL_DIR, "Functions.xlsx")
+    if not os.path.isfile(out_excel):
+        messagebox.showwarning(
+            "Предупреждение",
+            "Файл Functions.xlsx ещё не создан. Сначала запустите импорт.",
+        )
+        return
+
+    btn_preview.configure(state="disabled")
+    progress_label.configure(text="Загрузка иерархии...")
+    threading.Thread(target=_load_preview_data, args=(out_excel,), daemon=True).start()
+
+
+def _load_preview_data(out_excel):
+    try:
+        # тяжёлые модули нужны только здесь — грузим по требованию
+        import excel_to_xml_functions as conv
+        from excel_reader import read_sheet
+
+        df = read_sheet(out_excel, conv.SHEET_NAME)
+        items, order = conv.validate_and_build_functions(df)
+        roots, children = conv.build_children_map(items, order)
+        labels = {lcn: f"{lcn}  {f['name']}" for lcn, f in items.items()}
+    except Exception as e:
+        gui_runner.ui_queue.put(("error", "Ошибка", f"Не удалось загрузить иерархию:\n{e}"))
+        gui_runner.ui_queue.put(("preview", None))
+        return
+
+    gui_runner.ui_queue.put(("preview", (roots, children, labels)))
+
+
+def show_preview(data):
+    btn_preview.configure(state="normal")
+    progress_label.configure(text="")
+    if data is not None:
+        roots, children, labels = data
+        open_hierarchy_preview(app, "Иерархия функций", roots, children, labels)
+
+
+# ===== Отложенная загрузка =====
+
+# Сначала показываем окно с формой, а лог, иконку и логотип (вместе с Pillow)
+# создаём уже после первой отрисовки. Время запуска пишется в STARTUP_LOG
+# (последние gui_runner.STARTUP_LOG_MAX_LINES запусков).
+STARTUP_LOG = os.path.join(SCRIPT_DIR, "startup.log")
+
+
+def build_log_panel():
+    global log_frame, log_header, label_log, btn_save_log, btn_preview
+    global progress_label, progress_bar, log_box
+
+    log_frame = ctk.CTkFrame(app, corner_radius=10, fg_color=PANEL_BG)
+    log_frame.grid(row=2, column=0, padx=10, pady=(0, 10), sticky="nsew")
+
+    log_header = ctk.CTkFrame(log_frame, fg_color="transparent")
+    log_header.pack(fill="x", padx=10, pady=(10, 0))
+
+    label_log = ctk.CTkLabel(
+        log_header,
+        text="Результат импорта",
+        font=("Segoe UI", 13, "bold"),
+        text_color="white",
+    )
+    label_log.pack(side="left")
+
+    btn_save_log = ctk.CTkButton(
+        log_header,
+        text="Сохранить лог...",
+        width=140,
+        command=gui_runner.save_log,
+        fg_color=BUTTON_MAIN,
+        hover_color=BUTTON_MAIN_HOVER,
+        font=SMALL_FONT,
+    )
+    btn_save_log.pack(side="right")
+
+    btn_preview = ctk.CTkButton(
+        log_header,
+        text="Просмотр иерархии...",
+        width=170,
+        command=open_preview,
+        fg_color=BUTTON_MAIN,
+        hover_color=BUTTON_MAIN_HOVER,
+        font=SMALL_FONT,
+    )
+    btn_preview.pack(side="right", padx=(0, 10))
+
+    progress_label = ctk.CTkLabel(
+        log_frame,
+        text="",
+        font=SMALL_FONT,
+        text_color="white",
+    )
+    progress_label.pack(anchor="w", padx=10, pady=(2, 0))
+
+    progress_bar = ctk.CTkProgressBar(log_frame, progress_color=BUTTON_MAIN)
+    progress_bar.pack(fill="x", padx=10, pady=(2, 0))
+    progress_bar.set(0)
+
+    log_box = ctk.CTkTextbox(
+        log_frame,
+        wrap="word",
+        fg_color=LOG_BG,
+        text_color="black",
+        font=("Consolas", 12),
+    )
+    log_box.pack(fill="both", expand=True, padx=10, pady=(5, 10))
+    log_box.tag_config("bold")
+    log_box.configure(state="disabled")
+
+
+def build_tuning_panel():
+    """Панель подбора фильтров; показывается после чтения документа."""
+    global tuning_frame, tuning_label, tuning_box
+
+    tuning_frame = ctk.CTkFrame(app, corner_radius=10, fg_color=PANEL_BG)
+    tuning_frame.grid(row=1, column=0, padx=10, pady=(0, 10), sticky="nsew")
+
+    tuning_label = ctk.CTkLabel(
+        tuning_frame,
+        text="",
+        font=SMALL_FONT,
+        text_color="white",
+        anchor="w",
+        justify="left",
+    )
+    tuning_label.pack(fill="x", padx=10, pady=(8, 0))
+
+    tuning_box = ctk.CTkTextbox(
+        tuning_frame,
+        height=130,
+        wrap="none",
+        fg_color=LOG_BG,
+        text_color="black",
+        font=("Consolas", 11),
+    )
+    tuning_box.pack(fill="x", padx=10, pady=(5, 10))
+    tuning_box.configure(state="disabled")
+
+    tuning_frame.grid_remove()
+
+
+def load_assets():
+    """Иконка окна и логотип; Pillow импортируется только здесь."""
+    global _app_icon, logo_image, logo_label
+
+    try:
+        if os.path.isfile(LOGO_ICO):
+            app.iconbitmap(LOGO_ICO)
+        elif os.path.isfile(LOGO_PNG):
+            _app_icon = tk.PhotoImage(file=LOGO_PNG)
+            app.iconphoto(False, _app_icon)
+    except Exception as e:
+        print("Не удалось установить иконку окна:", e)
+
+    if os.path.isfile(LOGO_PNG):
+        try:
+            from PIL import Image
+
+            logo_image = ctk.CTkImage(Image.open(LOGO_PNG), size=(90, 90))
+            logo_label = ctk.CTkLabel(
+                top_frame,
+                image=logo_image,
+                text="",
+                fg_color="transparent",
+            )
+            logo_label.grid(
+                row=1,
+                column=2,
+                rowspan=3,
+                padx=(10, 20),
+                pady=(10, 0),
+                sticky="ne",
+            )
+        except Exception as e:
+            print("Не удалось загрузить логотип (справа):", e)
+
+
+def finish_startup():
+    window_ms = (time.perf_counter() - _STARTUP_T0) * 1000
+
+    build_log_panel()
+    build_tuning_panel()
+    load_assets()
+
+    gui_runner.attach(app, log_box, progress_bar, progress_label, {
+        "preview": show_preview,
+        "candidates": on_candidates_loaded,
+        "tuning": on_tuning_summary,
+        "finished": on_finished,
+    })
+    app.after(100, gui_runner.start_worker)
+
+    ready_ms = (time.perf_counter() - _STARTUP_T0) * 1000
+    gui_runner.record_startup_time(STARTUP_LOG, window_ms, ready_ms)
 
 
 # ================ GUI =====================
@@ -251,16 +699,6 @@ app.geometry("950x700")
 app.minsize(850, 550)
 app.configure(fg_color=APP_BG)
 
-# иконка окна
-try:
-    if os.path.isfile(LOGO_ICO):
-        app.iconbitmap(LOGO_ICO)
-    elif os.path.isfile(LOGO_PNG):
-        _app_icon = tk.PhotoImage(file=LOGO_PNG)
-        app.iconphoto(False, _app_icon)
-except Exception as e:
-    print("Не удалось установить иконку окна:", e)
-
 app.grid_rowconfigure(2, weight=2)
 app.grid_columnconfigure(0, weight=1)
 
@@ -270,6 +708,7 @@ depth_var = ctk.StringVar(value="0")
 mode_var = ctk.StringVar(value="fi")
 code_prefix_var = ctk.StringVar()
 code_letter_var = ctk.StringVar(value="Любая")
+full_xml_var = ctk.BooleanVar(value=False)
 
 top_frame = ctk.CTkFrame(app, corner_radius=10, fg_color=PANEL_BG)
 top_frame.grid(row=0, column=0, padx=10, pady=10, sticky="nsew")
@@ -288,27 +727,6 @@ SEGMENT_KWARGS = dict(
     font=DEFAULT_FONT,
 )
 
-# логотип справа под кнопкой "Обзор..."
-if Image is not None and os.path.isfile(LOGO_PNG):
-    try:
-        logo_image = ctk.CTkImage(Image.open(LOGO_PNG), size=(90, 90))
-        logo_label = ctk.CTkLabel(
-            top_frame,
-            image=logo_image,
-            text="",
-            fg_color="transparent",
-        )
-        logo_label.grid(
-            row=1,
-            column=2,
-            rowspan=3,
-            padx=(10, 20),
-            pady=(10, 0),
-            sticky="ne",
-        )
-    except Exception as e:
-        print("Не удалось загрузить логотип (справа):", e)
-
 ENTRY_KWARGS = dict(
     fg_color="white",
     text_color="black",
@@ -321,6 +739,8 @@ label_file.grid(row=0, column=0, padx=10, pady=(8, 3), sticky="w")
 
 entry_file = ctk.CTkEntry(top_frame, textvariable=file_var, **ENTRY_KWARGS)
 entry_file.grid(row=0, column=1, padx=5, pady=(8, 3), sticky="we")
+entry_file.bind("<Return>", on_file_entered)
+entry_file.bind("<FocusOut>", on_file_entered)
 
 btn_browse = ctk.CTkButton(
     top_frame,
@@ -363,6 +783,7 @@ label_depth.grid(row=2, column=0, padx=10, pady=3, sticky="w")
 
 def on_depth_change(value: str):
     depth_var.set(value)
+    update_tuning()
 
 
 depth_segment = ctk.CTkSegmentedButton(
@@ -396,6 +817,7 @@ def on_mode_change(value: str):
         mode_var.set("fi")
     else:
         mode_var.set("fs")
+    update_tuning()
 
 
 mode_segment = ctk.CTkSegmentedButton(
@@ -418,6 +840,7 @@ label_letter.grid(row=4, column=0, padx=10, pady=3, sticky="w")
 
 def on_letter_change(value: str):
     code_letter_var.set(value)
+    update_tuning()
 
 
 letter_segment = ctk.CTkSegmentedButton(
@@ -444,6 +867,18 @@ entry_prefix = ctk.CTkEntry(
     **ENTRY_KWARGS,
 )
 entry_prefix.grid(row=5, column=1, padx=5, pady=3, sticky="w")
+code_prefix_var.trace_add("write", update_tuning)
+
+check_full_xml = ctk.CTkCheckBox(
+    top_frame,
+    text="Полный XML (без файла изменений относительно прошлой выгрузки)",
+    variable=full_xml_var,
+    font=DEFAULT_FONT,
+    text_color="white",
+    fg_color=BUTTON_MAIN,
+    hover_color=BUTTON_MAIN_HOVER,
+)
+check_full_xml.grid(row=6, column=1, padx=5, pady=3, sticky="w")
 
 btn_run = ctk.CTkButton(
     top_frame,
@@ -454,30 +889,37 @@ btn_run = ctk.CTkButton(
     hover_color=BUTTON_MAIN_HOVER,
     font=("Segoe UI", 13, "bold"),
 )
-btn_run.grid(row=6, column=0, columnspan=3, padx=10, pady=(10, 8), sticky="we")
+btn_run.grid(row=7, column=0, columnspan=2, padx=(10, 5), pady=(10, 8), sticky="we")
 
-# --- лог ---
+# "Пробный разбор" и "Отмена" справа от основной кнопки
+run_actions = ctk.CTkFrame(top_frame, fg_color="transparent")
+run_actions.grid(row=7, column=2, padx=10, pady=(10, 8), sticky="e")
 
-log_frame = ctk.CTkFrame(app, corner_radius=10, fg_color=PANEL_BG)
-log_frame.grid(row=2, column=0, padx=10, pady=(0, 10), sticky="nsew")
-
-label_log = ctk.CTkLabel(
-    log_frame,
-    text="Результат импорта",
+btn_quick = ctk.CTkButton(
+    run_actions,
+    text="Пробный разбор",
+    width=150,
+    height=38,
+    command=run_quick_preview,
+    fg_color=BUTTON_MAIN,
+    hover_color=BUTTON_MAIN_HOVER,
     font=("Segoe UI", 13, "bold"),
-    text_color="white",
 )
-label_log.pack(anchor="w", padx=10, pady=(10, 0))
+btn_quick.pack(side="left", padx=(0, 10))
 
-log_box = ctk.CTkTextbox(
-    log_frame,
-    wrap="word",
-    fg_color=LOG_BG,
-    text_color="black",
-    font=("Consolas", 12),
+btn_cancel = ctk.CTkButton(
+    run_actions,
+    text="■ Отмена",
+    width=110,
+    height=38,
+    command=gui_runner.cancel,
+    fg_color=BUTTON_MAIN,
+    hover_color=BUTTON_MAIN_HOVER,
+    font=("Segoe UI", 13, "bold"),
+    state="disabled",
 )
-log_box.pack(fill="both", expand=True, padx=10, pady=(5, 10))
-log_box.tag_config("bold")
-log_box.configure(state="disabled")
+btn_cancel.pack(side="left")
 
-app.mainloop()
\ No newline at end of file
+app.protocol("WM_DELETE_WINDOW", on_close)
+app.after(10, finish_startup)
+app.mainloop()
@@ -1,8 +1,24 @@
+import argparse
 import sys
 import os
-import pandas as pd
+import zipfile
 import xml.etree.ElementTree as ET
-from datetime import datetime
+
+try:
+    from core import archive_old, normalize_cell, result_dirs
+except ImportError:
+    # запуск из папки раздела: общий core.py лежит уровнем выше (scripts/)
+    sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+    from core import archive_old, normalize_cell, result_dirs
+
+from core import (
+    delta_path, diff_snapshot, file_digest, fingerprint, load_snapshot, manifest_path,
+    output_is_current, preorder, save_snapshot, snapshot_path, workbook_digest, write_manifest,
+    write_xml,
+)
+
+from excel_reader import read_sheet
+from graph_check import check_graph, has_errors, print_graph_report
 
 # Папка, где лежит этот скрипт (Служебные файлы)
 SCRIPT_DIR = os.path.abspath(os.path.dirname(__file__))
@@ -11,48 +27,21 @@ SCRIPT_DIR = os.path.abspath(os.path.dirname(__file__))
 BASE_DIR = os.path.abspath(os.path.join(SCRIPT_DIR, ".."))
 
 # Папки с результатами
-EXCEL_DIR = os.path.join(BASE_DIR, "Результаты_EXCEL")
-XML_DIR = os.path.join(BASE_DIR, "Результаты_XML")
+EXCEL_DIR, XML_DIR = result_dirs(BASE_DIR)
 
 # Имена файлов
 INPUT_FILE = os.path.join(EXCEL_DIR, "Functions.xlsx")
 OUTPUT_FILE = os.path.join(XML_DIR, "functions_output.xml")
 SHEET_NAME = "Функции"
 
+# Версия конвертера в манифесте выгрузки: увеличить при изменении XML,
+# чтобы прошлые манифесты перестали совпадать и XML пересоздался
+CONVERTER_VERSION = "2"
+
 # Если хочешь жёстко задать код ФИ – раскомментируй и укажи строку:
 # TARGET_FI = "ТЕСТ"
 TARGET_FI = None
 
-def archive_old(path: str):
-    """
-    Если файл path существует, переносит его в подкаталог 'Архив'
-    с добавлением штампа даты/времени к имени.
-    """
-    if not os.path.isfile(path):
-        return
-
-    folder = os.path.dirname(path)
-    archive_dir = os.path.join(folder, "Архив")
-    os.makedirs(archive_dir, exist_ok=True)
-
-    base = os.path.basename(path)
-    name, ext = os.path.splitext(base)
-
-    ts = datetime.now().strftime("%Y%m%d_%H%M%S")
-    new_name = f"{name}_{ts}{ext}"
-    new_path = os.path.join(archive_dir, new_name)
-
-    try:
-        os.replace(path, new_path)
-    except OSError as e:
-        # В GUI это уйдёт в лог консоли, не убьёт процесс
-        print(f"Не удалось переместить старый файл '{path}': {e}")
-        
-def normalize_cell(value):
-    if pd.isna(value):
-        return ""
-    return str(value).strip()
-
 
 def validate_and_build_functions(df):
     required_columns = [
@@ -133,7 +122,7 @@ def get_parentfi_for_root(func):
     return func["fi"]
 
 
-def add_function_xml(parent_element, func, children_map, functions):
+def function_attrs(func):
     # корневая или нет
     if func["parent_lcn"]:
         parent = func["parent_lcn"]
@@ -142,7 +131,7 @@ def add_function_xml(parent_element, func, children_map, functions):
         parent = ""
         parentfi = get_parentfi_for_root(func)
 
-    attrs = {
+    return {
         "guid": "",
         "description": func["description"],
         "parent": parent,
@@ -151,14 +140,51 @@ def add_function_xml(parent_element, func, children_map, functions):
         "name": func["name"],
     }
 
-    func_el = ET.SubElement(parent_element, "Function", attrs)
+
+def add_function_xml(parent_element, func, children_map, functions):
+    func_el = ET.SubElement(parent_element, "Function", function_attrs(func))
 
     for child_lcn in children_map[func["lcn"]]:
         child_func = functions[child_lcn]
         add_function_xml(func_el, child_func, children_map, functions)
 
 
+def build_delta_dataset(attrs, walk, prints, previous):
+    """
+    Дельта относительно снимка прошлой выгрузки: новые и изменённые функции
+    плоским списком (родитель указан в атрибуте parent, родители идут раньше
+    детей) и список удалённых в <Removed>.
+    """
+    added, changed, removed = diff_snapshot(previous, prints)
+
+    dataset = ET.Element("Dataset", {"GUID": "urn:placeholder", "mode": "delta"})
+    send = set(added) | set(changed)
+    for lcn in walk:
+        if lcn in send:
+            ET.SubElement(dataset, "Function", attrs[lcn])
+    if removed:
+        removed_el = ET.SubElement(dataset, "Removed")
+        for lcn in removed:
+            ET.SubElement(removed_el, "Function", {"lcn": lcn})
+
+    return dataset, (len(added), len(changed), len(removed))
+
+
 def main():
+    parser = argparse.ArgumentParser(description="Functions.xlsx -> XML для импорта в Pragmatica.")
+    parser.add_argument(
+        "--full",
+        action="store_true",
+        help="Только полная выгрузка: XML с изменениями относительно прошлой выгрузки "
+             "не создаётся, снимок пишется заново.",
+    )
+    parser.add_argument(
+        "--force",
+        action="store_true",
+        help="Пересоздать XML, даже если Functions.xlsx не менялся с прошлой выгрузки.",
+    )
+    args = parser.parse_args()
+
     print("================================")
     print(" Конвертация функций в XML")
     print(f" Входной файл : {INPUT_FILE}")
@@ -175,8 +201,33 @@ def main():
         print("Запустите импорт через GUI, чтобы сначала создать Functions.xlsx.")
         sys.exit(1)
 
+    # вход, конвертер и выгрузка те же, что в прошлый раз — XML уже готов
+    snapshot_file = snapshot_path(OUTPUT_FILE)
+    try:
+        input_hash = workbook_digest(INPUT_FILE)
+    except (OSError, zipfile.BadZipFile):
+        input_hash = None
+    expected = {
+        "input_hash": input_hash,
+        "converter": CONVERTER_VERSION,
+        "target_fi": TARGET_FI or "",
+    }
+    if args.full:
+        expected["mode"] = "full"
+    if (
+        not args.force
+        and input_hash is not None
+        and os.path.isfile(snapshot_file)
+        and output_is_current(OUTPUT_FILE, expected)
+    ):
+        print("Functions.xlsx не менялся с прошлой выгрузки — XML оставлен как есть (--force — пересоздать).")
+        print("Статус           : УСПЕХ")
+        print(f"Выходной файл    : {OUTPUT_FILE}")
+        print("================================")
+        return
+
     try:
-        df = pd.read_excel(INPUT_FILE, sheet_name=SHEET_NAME, engine="openpyxl")
+        df = read_sheet(INPUT_FILE, SHEET_NAME)
     except Exception as e:
         print(f"Ошибка при чтении файла {INPUT_FILE}: {e}")
         sys.exit(1)
@@ -189,34 +240,73 @@ def main():
         print(ve)
         sys.exit(1)
 
-    dataset = ET.Element("Dataset", {"GUID": "urn:placeholder"})
+    report = check_graph({lcn: functions[lcn]["parent_lcn"] for lcn in order})
+    print_graph_report(report)
+    if has_errors(report):
+        print("Ошибка: иерархия функций содержит циклы (см. выше), XML не создан.")
+        sys.exit(1)
 
+    walk = preorder(roots, children_map)
+    attrs = {lcn: function_attrs(functions[lcn]) for lcn in walk}
+    prints = {lcn: fingerprint(a.values()) for lcn, a in attrs.items()}
+
+    # снимок прошлой выгрузки годится, только если она была для тех же ФИ
+    scope = ",".join(sorted({attrs[lcn]["parentfi"] for lcn in roots}))
+    previous = None if args.full else load_snapshot(snapshot_file)
+    if previous is not None and previous[0] != scope:
+        print("ФИ отличается от прошлой выгрузки — выгружаем полностью.")
+        previous = None
+
+    dataset = ET.Element("Dataset", {"GUID": "urn:placeholder"})
     for root_lcn in roots:
         func = functions[root_lcn]
         add_function_xml(dataset, func, children_map, functions)
 
-    tree = ET.ElementTree(dataset)
-
-    try:
-        ET.indent(tree, space="    ", level=0)
-    except Exception:
-        # старые версии Python без ET.indent
-        pass
+    delta = delta_dataset = None
+    if previous is not None:
+        delta_dataset, delta = build_delta_dataset(attrs, walk, prints, previous[1])
 
-    # Перед записью нового XML отправим старый в Архив
+    # Перед записью нового XML отправим старый в Архив; старый XML изменений
+    # считался от прошлого снимка и без замены больше не годится
+    delta_file = delta_path(OUTPUT_FILE)
     archive_old(OUTPUT_FILE)
-        
+    archive_old(delta_file)
+
     try:
-        tree.write(OUTPUT_FILE, encoding="utf-8", xml_declaration=True)
+        write_xml(dataset, OUTPUT_FILE)
+        if delta_dataset is not None:
+            write_xml(delta_dataset, delta_file)
     except Exception as e:
         print(f"Ошибка при сохранении XML: {e}")
         sys.exit(1)
 
+    try:
+        save_snapshot(snapshot_file, scope, prints)
+    except OSError as e:
+        # старый снимок уже не соответствует XML; без снимка следующая выгрузка будет полной
+        print(f"Не удалось сохранить снимок выгрузки '{snapshot_file}': {e}")
+        try:
+            os.remove(snapshot_file)
+        except OSError:
+            pass
+    else:
+        if input_hash is not None:
+            manifest = dict(expected, mode="full" if delta is None else "delta", input=INPUT_FILE)
+            try:
+                manifest["output_hash"] = file_digest(OUTPUT_FILE)
+                write_manifest(manifest_path(OUTPUT_FILE), manifest)
+            except OSError as e:
+                print(f"Не удалось сохранить манифест выгрузки: {e}")
+
     print("Строк обработано :", len(functions))
     print("Корневых функций :", len(roots))
+    if delta is not None:
+        print("Изменения        : новых {}, изменено {}, удалено {}".format(*delta))
     print("--------------------------------")
     print("Статус           : УСПЕХ")
     print(f"Выходной файл    : {OUTPUT_FILE}")
+    if delta is not None:
+        print(f"Файл изменений   : {delta_file}")
     print("================================")
 
 
@@ -1,12 +1,33 @@
 import argparse
+import csv
+import heapq
+import io
+import itertools
+import mmap
 import os
+import random
 import re
 import sys
-from typing import List, Dict, Optional
-from datetime import datetime
+import tempfile
+import time
+from typing import List, Dict, Iterable, Iterator, Optional, Tuple
 
+import numpy as np
 import pandas as pd
 
+try:
+    from core import archive_old
+except ImportError:
+    # запуск из папки раздела: общий core.py лежит уровнем выше (scripts/)
+    sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+    from core import archive_old
+
+import catalog
+import progress
+from excel_reader import (
+    commit_sidecar, open_sidecar_csv, read_sheets, remove_sidecar, sidecar_data_path, write_sidecar,
+)
+
 # Ключевые слова, характерные для описаний отказов, а не для названий функций
 FAILURE_KEYWORDS = [
     "отказ", "потеря", "нарушен", "сбой", "неисправ",
@@ -15,40 +36,21 @@ FAILURE_KEYWORDS = [
     "effect of failure", "failure effect",
 ]
 
+# Пробный разбор (--preview): для docx и Excel "страницей" считается блок из
+# PREVIEW_BLOCK_ROWS строк листа, строк таблицы или абзацев, для .txt —
+# PREVIEW_TXT_BLOCK_BYTES байт файла (читаются только выбранные блоки)
+PREVIEW_BLOCK_ROWS = 60
+PREVIEW_TXT_BLOCK_BYTES = 256 * 1024
+PREVIEW_SHOW = 50
 
-def archive_old(path: str):
-    """
-    Если файл path существует, переносит его в подкаталог 'Архив'
-    с добавлением штампа даты/времени к имени.
-    """
-    if not os.path.isfile(path):
-        return
-
-    folder = os.path.dirname(path)
-    archive_dir = os.path.join(folder, "Архив")
-    os.makedirs(archive_dir, exist_ok=True)
-
-    base = os.path.basename(path)
-    name, ext = os.path.splitext(base)
-
-    ts = datetime.now().strftime("%Y%m%d_%H%M%S")
-    new_name = f"{name}_{ts}{ext}"
-    new_path = os.path.join(archive_dir, new_name)
 
-    try:
-        os.replace(path, new_path)
-    except OSError as e:
-        # В GUI это уйдёт в лог консоли, не убьёт процесс
-        print(f"Не удалось переместить старый файл '{path}': {e}")
+_FAILURE_RE = "|".join(re.escape(kw) for kw in FAILURE_KEYWORDS)
+_FAILURE_SEARCH = re.compile(_FAILURE_RE).search
 
 
 def is_failure_like(text: str) -> bool:
     """Грубая проверка: похоже ли название на описание отказа/сценария, а не на функцию."""
-    t = text.lower()
-    for kw in FAILURE_KEYWORDS:
-        if kw in t:
-            return True
-    return False
+    return _FAILURE_SEARCH(text.lower()) is not None
 
 
 def normalize_code(raw: str) -> str:
@@ -230,15 +232,48 @@ def strip_leading_code_tokens(code: str, name: str) -> str:
     return name
 
 
-def extract_functions_from_text(
-    text: str,
-    max_depth: int,
-    mode: str,
-    code_letter: Optional[str] = None,
-    code_prefix: Optional[str] = None,
-) -> List[Dict[str, str]]:
+# Код в начале строки; допускаются пробелы внутри кода и лишняя точка в конце
+FUNCTION_LINE_RE = re.compile(
+    r'^\s*([ФF]\s*\d+(?:\s*[.\-_]\s*\d+){0,4}\.?)\s+(.+)$',
+    re.UNICODE | re.MULTILINE,
+)
+
+# Маркеры списков в начале названия: "-", "—" и пробелы
+LIST_MARKS_RE = re.compile(r'^[\-\–—\s]+')
+
+
+def make_candidates(codes, names) -> pd.DataFrame:
+    """
+    Таблица кандидатов: столбцы Func_LCN и Name, строка — одна функция.
+
+    Код хранится как category: каждый код записан один раз, в строках —
+    только его номер (int32). Миллионы строк не превращаются в миллионы
+    словарей, а признаки кодов (build_candidate_index, infer_hierarchy)
+    считаются по уникальным кодам.
     """
-    Ищет функции в тексте.
+    return pd.DataFrame({
+        "Func_LCN": pd.Categorical(codes),
+        "Name": pd.Series(names, dtype=object),
+    })
+
+
+def concat_candidates(parts: List[pd.DataFrame]) -> pd.DataFrame:
+    """Склеивает таблицы кандидатов, сохраняя коды как category."""
+    parts = [p for p in parts if len(p)]
+    if not parts:
+        return make_candidates([], [])
+    if len(parts) == 1:
+        return parts[0]
+
+    codes = pd.api.types.union_categoricals([p["Func_LCN"] for p in parts])
+    names = np.concatenate([p["Name"].to_numpy(dtype=object) for p in parts])
+    return pd.DataFrame({"Func_LCN": codes, "Name": pd.Series(names, dtype=object)})
+
+
+def extract_candidates(text: str, report_progress: bool = True) -> pd.DataFrame:
+    """
+    Все строки с функциями в порядке документа — до фильтров по букве,
+    числовой части, типу и глубине.
 
     Форматы:
       F1 Название
@@ -247,45 +282,33 @@ def extract_functions_from_text(
       F1_2_3 Название
       Ф21.20.01 Название
 
-    Условия:
-      - код должен стоять в начале строки;
-      - строки, похожие на описания отказов, отбрасываются;
-      - глубина кода ограничена max_depth (0 = без ограничений);
-      - mode:
-          * 'fi' — функции ФИ;
-          * 'fs' — функции систем (ФС).
-      - code_letter: фильтр по букве кода (F / Ф). Если пусто — не фильтруем по букве.
-      - code_prefix: числовой порог по первой группе:
-          "1"  -> берем коды, где первая группа >= 1  (1,2,3,10,...)
-          "20" -> берем коды, где первая группа >= 20 (20,21,99,...)
-    """
-    # Разрешаем пробелы внутри кода и лишнюю точку в конце
-    pattern = re.compile(
-        r'^\s*([ФF]\s*\d+(?:\s*[.\-_]\s*\d+){0,4}\.?)\s+(.+)$',
-        re.UNICODE | re.MULTILINE,
-    )
+    Код должен стоять в начале строки; строки, похожие на описания отказов,
+    отбрасываются сразу. Фильтры накладываются отдельно (filter_candidates),
+    поэтому один набор кандидатов можно быстро перефильтровать с другими
+    настройками.
 
-    # нормализуем фильтры
-    if code_letter:
-        code_letter = _normalize_letter_for_filter(code_letter[0])
+    report_progress=False — не слать события прогресса (текст — лишь часть
+    файла, прогресс считает вызывающий код).
 
-    prefix_int: Optional[int] = None
-    if code_prefix:
-        code_prefix = code_prefix.strip()
-        if code_prefix and code_prefix.isdigit():
-            prefix_int = int(code_prefix)
-        else:
-            prefix_int = None  # ввели мусор — игнорируем фильтр
+    Возвращает таблицу кандидатов (make_candidates).
+    """
+    codes: List[str] = []
+    names: List[str] = []
+    normalized: Dict[str, str] = {}
+
+    total_chars = len(text)
+    if report_progress:
+        progress.emit("extract", 0, total_chars, "симв", force=True)
 
-    results: List[Dict[str, str]] = []
+    for n_matched, match in enumerate(FUNCTION_LINE_RE.finditer(text), 1):
+        if report_progress and progress.enabled and n_matched % 256 == 0:
+            progress.emit("extract", match.end(), total_chars, "симв", matched=n_matched)
 
-    for match in pattern.finditer(text):
         raw_code = match.group(1)
         raw_name = match.group(2).strip()
 
         # убираем ведущие маркеры списков: "-", "—" и лишние пробелы
-        name = re.sub(r'^[\-\–—\s]+', "", raw_name)
-        name = name.strip()
+        name = LIST_MARKS_RE.sub("", raw_name).strip()
         if not name:
             continue
 
@@ -293,144 +316,621 @@ def extract_functions_from_text(
         if is_failure_like(name):
             continue
 
-        code = normalize_code(raw_code)
+        code = normalized.get(raw_code)
+        if code is None:
+            code = normalized[raw_code] = normalize_code(raw_code)
         if not code:
             continue
 
-        # --- фильтр по букве ---
-        if code_letter:
-            head = code[0]
-            head_norm = _normalize_letter_for_filter(head)
-            if head_norm != code_letter:
-                continue
+        # убираем дублирующиеся коды в начале имени
+        if name[0] in ("F", "Ф"):
+            name = strip_leading_code_tokens(code, name)
 
-        # --- фильтр по первой числовой группе: >= prefix_int ---
-        if prefix_int is not None:
-            parts = _split_numeric_parts(code)
-            if not parts:
-                continue
-            first_group = parts[0]
-            if not first_group.isdigit():
-                continue
-            if int(first_group) < prefix_int:
-                continue
+        codes.append(code)
+        names.append(name)
 
-        # фильтрация по типу кода (ФИ / ФС)
-        if mode == "fi" and not is_fi_code(code):
-            continue
-        if mode == "fs" and not is_fs_code(code):
-            continue
+    return make_candidates(codes, names)
 
-        # ограничение глубины кода
-        if max_depth > 0 and get_depth(code) > max_depth:
-            continue
 
-        # убираем дублирующиеся коды в начале имени
-        name = strip_leading_code_tokens(code, name)
+def build_candidate_index(candidates: pd.DataFrame) -> Dict[str, np.ndarray]:
+    """
+    Признаки кандидатов для фильтрации, по массиву на признак:
+      letter   – буква кода в верхнем регистре;
+      first    – первая числовая группа (-1, если её нет);
+      depth    – глубина кода;
+      fi, fs   – подходит ли код под режим 'fi' / 'fs';
+      code_id  – номер кода (одинаковые коды — один номер).
+    Считается один раз на документ и только по уникальным кодам; дальше
+    любой набор фильтров — это несколько сравнений массивов (candidate_mask).
+    """
+    codes = candidates["Func_LCN"].astype("category").cat
+    by_code = index_from_codes(pd.Series(codes.categories, dtype=object))
+    rows = codes.codes.to_numpy()
+    index = {name: values[rows] for name, values in by_code.items()}
+    index["code_id"] = rows.astype(np.int64)
+    return index
 
-        results.append(
-            {
-                "Func_LCN": code,
-                "Name": name,
-            }
-        )
 
+def index_from_codes(codes: pd.Series) -> Dict[str, np.ndarray]:
+    """
+    То же, что build_candidate_index, по столбцу кодов: признаки считаются
+    строковыми операциями pandas над всем столбцом сразу. Результат совпадает
+    с get_depth / is_fi_code / is_fs_code для каждого кода.
+    """
+    codes = codes.astype(object)
+    body = codes.str[1:]
+
+    # get_depth: число частей через точку, пустые части тоже считаются
+    depth = np.where(body.str.len() > 0, body.str.count(r"\.") + 1, 0)
+
+    # _split_numeric_parts: только непустые части
+    n_parts = body.str.count(r"[^.]+").to_numpy()
+    first_part = body.str.extract(r"^\.*([^.]+)", expand=False).fillna("")
+    first_len = first_part.str.len().to_numpy()
+
+    first = np.full(len(codes), -1, dtype=np.int64)
+    digits = first_part.str.isdigit().to_numpy(dtype=bool)
+    if digits.any():
+        first[digits] = first_part[digits].map(int).to_numpy(dtype=np.int64)
+
+    fi = (n_parts == 1) | ((first_len == 1) & (n_parts >= 1) & (n_parts <= 4))
+    fs = (n_parts >= 1) & (first_len >= 2)
+
+    return {
+        "letter": codes.str[:1].str.upper().to_numpy(dtype=object),
+        "first": first,
+        "depth": depth.astype(np.int64),
+        "fi": fi,
+        "fs": fs,
+        "code_id": pd.factorize(codes)[0].astype(np.int64),
+    }
+
+
+def candidate_mask(
+    index: Dict[str, np.ndarray],
+    max_depth: int,
+    mode: str,
+    code_letter: Optional[str] = None,
+    code_prefix: Optional[str] = None,
+) -> np.ndarray:
+    """
+    Маска кандидатов, проходящих фильтры:
+      - max_depth: глубина кода не больше (0 = без ограничений);
+      - mode: 'fi' — функции ФИ, 'fs' — функции систем (ФС);
+      - code_letter: буква кода (F / Ф); пусто — не фильтруем по букве;
+      - code_prefix: числовой порог по первой группе:
+          "1"  -> берем коды, где первая группа >= 1  (1,2,3,10,...)
+          "20" -> берем коды, где первая группа >= 20 (20,21,99,...)
+        не число — фильтр игнорируется.
+    """
+    mask = np.ones(len(index["depth"]), dtype=bool)
+
+    # --- фильтр по букве ---
+    if code_letter:
+        mask &= index["letter"] == _normalize_letter_for_filter(code_letter[0])
+
+    # --- фильтр по первой числовой группе: >= prefix_int ---
+    code_prefix = (code_prefix or "").strip()
+    if code_prefix.isdigit():
+        mask &= index["first"] >= int(code_prefix)
+
+    # фильтрация по типу кода (ФИ / ФС)
+    if mode == "fi":
+        mask &= index["fi"]
+    elif mode == "fs":
+        mask &= index["fs"]
+
+    # ограничение глубины кода
+    if max_depth > 0:
+        mask &= index["depth"] <= max_depth
+
+    return mask
+
+
+def filter_candidates(
+    candidates: pd.DataFrame,
+    max_depth: int,
+    mode: str,
+    code_letter: Optional[str] = None,
+    code_prefix: Optional[str] = None,
+    index: Optional[Dict[str, np.ndarray]] = None,
+) -> pd.DataFrame:
+    """Кандидаты, прошедшие фильтры (см. candidate_mask), в порядке документа."""
+    if index is None:
+        index = build_candidate_index(candidates)
+    mask = candidate_mask(index, max_depth, mode, code_letter, code_prefix)
+    kept = candidates[mask].reset_index(drop=True)
+    kept["Func_LCN"] = kept["Func_LCN"].cat.remove_unused_categories()
+    return kept
+
+
+def extract_functions_from_text(
+    text: str,
+    max_depth: int,
+    mode: str,
+    code_letter: Optional[str] = None,
+    code_prefix: Optional[str] = None,
+) -> pd.DataFrame:
+    """
+    Ищет функции в тексте: extract_candidates + filter_candidates.
+    Параметры фильтров — см. candidate_mask.
+    """
+    candidates = extract_candidates(text)
+    results = filter_candidates(candidates, max_depth, mode, code_letter, code_prefix)
+
+    total_chars = len(text)
+    progress.emit("extract", total_chars, total_chars, "симв", force=True, kept=len(results))
     return results
 
 
-def infer_hierarchy(functions: List[Dict[str, str]], mode: str) -> List[Dict[str, str]]:
+def _code_order(codes: pd.Series) -> np.ndarray:
+    """
+    Порядок строк по sort_key_for_code (устойчивый: строки с одинаковым
+    ключом остаются в порядке документа). Ключи считаются только для
+    уникальных кодов.
+    """
+    codes = codes.astype("category").cat
+    categories = list(codes.categories)
+    keys = [sort_key_for_code(c) for c in categories]
+
+    # плотный ранг ключа: одинаковые ключи — одинаковый ранг
+    rank = np.zeros(len(categories), dtype=np.int64)
+    prev = None
+    r = -1
+    for i in sorted(range(len(categories)), key=keys.__getitem__):
+        if keys[i] != prev:
+            r += 1
+            prev = keys[i]
+        rank[i] = r
+
+    return np.argsort(rank[codes.codes.to_numpy()], kind="stable")
+
+
+def infer_hierarchy(functions: pd.DataFrame, mode: str) -> pd.DataFrame:
     """
-    Определяет иерархию функций по коду.
+    Определяет иерархию функций по коду: добавляет столбец Parent_LCN.
 
     Для режима "fi":
-      F1.2.3 -> родитель F1.2 (если он есть)
+      F1.2.3 -> родитель F1.2 (если он есть); строки сортируются по коду.
 
     Для режима "fs":
       иерархия не строится, Parent_LCN всегда пустой.
     """
+    functions = functions.copy()
+
     if mode == "fs":
-        for f in functions:
-            f["Parent_LCN"] = ""
+        functions["Parent_LCN"] = ""
         return functions
 
-    functions_sorted = sorted(functions, key=lambda f: sort_key_for_code(f["Func_LCN"]))
-    lookup = {f["Func_LCN"]: f for f in functions_sorted}
+    functions = functions.iloc[_code_order(functions["Func_LCN"])].reset_index(drop=True)
 
-    for f in functions_sorted:
-        parts = f["Func_LCN"].split(".")
-        if len(parts) > 1:
-            parent_code = ".".join(parts[:-1])
-        else:
-            parent_code = ""
+    # родитель считается один раз на уникальный код
+    codes = functions["Func_LCN"].astype("category").cat
+    present = set(codes.categories)
+    parents = []
+    for code in codes.categories:
+        parent_code = code.rsplit(".", 1)[0] if "." in code else ""
+        parents.append(parent_code if parent_code in present else "")
 
-        if parent_code and parent_code in lookup:
-            f["Parent_LCN"] = parent_code
-        else:
-            f["Parent_LCN"] = ""
+    functions["Parent_LCN"] = np.asarray(parents, dtype=object)[codes.codes.to_numpy()]
+    return functions
 
-    return functions_sorted
 
+def consolidate_functions(functions: pd.DataFrame) -> pd.DataFrame:
+    """
+    Схлопывает дубликаты по коду: остаётся первая строка кода (название и
+    родитель), названия остальных строк идут в Description (без повторов,
+    по алфавиту, через перевод строки). Результат отсортирован по коду.
+    """
+    order = _code_order(functions["Func_LCN"])
+    codes = functions["Func_LCN"].astype("category").cat
+
+    # дальше — только номера кодов и ссылки на строки, без копий текста
+    ids = codes.codes.to_numpy()[order]
+    names = functions["Name"].to_numpy(dtype=object)[order]
+    if "Parent_LCN" in functions.columns:
+        parents = functions["Parent_LCN"].to_numpy(dtype=object)[order]
+    else:
+        parents = np.full(len(ids), "", dtype=object)
 
-def consolidate_functions(functions: List[Dict[str, str]]) -> List[Dict[str, str]]:
-    """Схлопывает дубликаты по коду."""
-    by_code: Dict[str, Dict[str, str]] = {}
-    extras: Dict[str, List[str]] = {}
+    first = np.zeros(len(ids), dtype=bool)
+    first[np.unique(ids, return_index=True)[1]] = True
 
-    functions_sorted = sorted(functions, key=lambda f: sort_key_for_code(f["Func_LCN"]))
+    extras: Dict[int, set] = {}
+    for code_id, name in zip(ids[~first].tolist(), names[~first]):
+        name = str(name).strip()
+        if name:
+            extras.setdefault(code_id, set()).add(name)
 
-    for f in functions_sorted:
-        code = f["Func_LCN"]
-        name = f.get("Name", "").strip()
-        parent = f.get("Parent_LCN", "")
+    first_ids = ids[first].tolist()
+    return pd.DataFrame({
+        "Func_LCN": np.asarray(codes.categories, dtype=object)[ids[first]],
+        "Parent_LCN": parents[first],
+        "Name": [str(name).strip() for name in names[first]],
+        "Description": [
+            "\n".join(sorted(extras[i])) if i in extras else "" for i in first_ids
+        ],
+    })
 
-        if code not in by_code:
-            by_code[code] = {
-                "Func_LCN": code,
-                "Parent_LCN": parent,
-                "Name": name,
-            }
-        else:
-            if name:
-                extras.setdefault(code, []).append(name)
-
-    result: List[Dict[str, str]] = []
-
-    for code in sorted(by_code.keys(), key=sort_key_for_code):
-        base = by_code[code]
-        desc_list = extras.get(code, [])
-        desc_text = ""
-        if desc_list:
-            desc_text = "\n".join(sorted(set(d for d in desc_list if d)))
-
-        result.append(
-            {
-                "Func_LCN": base["Func_LCN"],
-                "Parent_LCN": base["Parent_LCN"],
-                "Name": base["Name"],
-                "Description": desc_text,
-            }
-        )
 
-    return result
+# ---------------- Большие наборы: сортировка и слияние через диск ----------------
+
+# Оценка памяти на строку кандидата сверх текста названия
+# (объект str, ссылки в массивах, ключ сортировки при записи порции)
+ROW_OVERHEAD_BYTES = 200
+
+# Сколько порций сливается за один проход; если порций больше,
+# они сначала сливаются группами в более крупные
+MERGE_FAN_IN = 64
+
+
+def iter_candidate_batches(path: str) -> Iterator[pd.DataFrame]:
+    """Кандидаты из файла порциями: .txt — по частям файла, остальное — одной таблицей."""
+    if os.path.splitext(path)[1].lower() == ".txt":
+        yield from iter_txt_candidates(path)
+    else:
+        yield read_candidates(path)
+
+
+def _estimate_bytes(candidates: pd.DataFrame) -> int:
+    """Грубая оценка памяти под таблицу кандидатов (текст названий в UCS-2 + строка)."""
+    return int(candidates["Name"].str.len().sum()) * 2 + ROW_OVERHEAD_BYTES * len(candidates)
+
+
+def _write_run(folder: str, number: int, rows: Iterable) -> str:
+    """Порция на диск: строки (порядковый номер, код, название), уже отсортированные."""
+    path = os.path.join(folder, f"run_{number:05d}.tsv")
+    with open(path, "w", encoding="utf-8", newline="") as f:
+        csv.writer(f, delimiter="\t").writerows(rows)
+    return path
+
+
+def _read_run(path: str) -> Iterator[Tuple[list, int, str, str]]:
+    """Строки порции в виде (ключ сортировки кода, порядковый номер, код, название)."""
+    with open(path, "r", encoding="utf-8", newline="") as f:
+        for seq, code, name in csv.reader(f, delimiter="\t"):
+            yield sort_key_for_code(code), int(seq), code, name
+
+
+def _spill(buffer: List[pd.DataFrame], first_seq: int, folder: str, number: int) -> str:
+    """Сортирует накопленные кандидаты по коду (устойчиво) и пишет порцию на диск."""
+    table = concat_candidates(buffer)
+    order = _code_order(table["Func_LCN"])
+
+    codes = table["Func_LCN"].cat
+    code_text = np.asarray(codes.categories, dtype=object)[codes.codes.to_numpy()[order]]
+    names = table["Name"].to_numpy(dtype=object)[order]
+    seqs = (first_seq + order).tolist()
+    return _write_run(folder, number, zip(seqs, code_text, names))
+
+
+def _merge_runs(paths: List[str]) -> Iterator[Tuple[list, int, str, str]]:
+    """
+    k-путевое слияние порций по (ключ кода, порядковый номер): порядок тот же,
+    что у устойчивой сортировки всех строк сразу (_code_order).
+    """
+    return heapq.merge(*(_read_run(p) for p in paths))
+
+
+def _merged_functions(records: Iterable, mode: str) -> Iterator[Tuple[str, str, str, str]]:
+    """
+    Правила consolidate_functions и infer_hierarchy поверх отсортированного
+    потока строк. Возвращает (Func_LCN, Parent_LCN, Name, Description).
+
+    Строки одного кода идут подряд в группе с одинаковым ключом (в одну
+    группу попадают и коды с равным ключом, например F1 и Ф1). Родитель
+    F1.2.3 — код F1.2 с ключом [1, 2]; он всегда раньше в потоке, поэтому
+    хватает стека кодов на пути от корня к текущему ключу.
+    """
+    path: List[Tuple[list, set]] = []
+
+    for key, group in itertools.groupby(records, key=lambda r: r[0]):
+        by_code: Dict[str, list] = {}
+        for _, _, code, name in group:
+            name = name.strip()
+            entry = by_code.get(code)
+            if entry is None:
+                by_code[code] = [name, set()]
+            elif name:
+                entry[1].add(name)
+
+        siblings_parent: set = set()
+        if mode == "fi":
+            while path and (len(path[-1][0]) >= len(key) or key[:len(path[-1][0])] != path[-1][0]):
+                path.pop()
+            if path and len(path[-1][0]) == len(key) - 1:
+                siblings_parent = path[-1][1]
+            path.append((key, set(by_code)))
+
+        for code, (name, extras) in by_code.items():
+            parent = code.rsplit(".", 1)[0] if "." in code else ""
+            yield (
+                code,
+                parent if parent in siblings_parent else "",
+                name,
+                "\n".join(sorted(extras)),
+            )
+
+
+def consolidate_external(
+    batches: Iterable[pd.DataFrame],
+    mode: str,
+    memory_budget_mb: int,
+    temp_dir: Optional[str] = None,
+) -> Iterator[Tuple[str, str, str, str]]:
+    """
+    infer_hierarchy + consolidate_functions для наборов, которые не
+    помещаются в память (например, функции из многих документов сразу).
+
+    Кандидаты (уже отфильтрованные) копятся, пока оценка памяти не превысит
+    memory_budget_mb; накопленное сортируется по коду и уходит во временный
+    файл. В конце порции сливаются (heapq.merge), а схлопывание дубликатов и
+    поиск родителей идут прямо по слитому потоку. Результат совпадает с
+    consolidate_functions(infer_hierarchy(...)) и выдаётся по строке:
+    (Func_LCN, Parent_LCN, Name, Description).
+
+    Одна порция из iter_candidate_batches (например, большой лист Excel)
+    целиком в памяти всё равно оказывается — бюджет ограничивает то, что
+    копится между порциями, сортировку и слияние.
+    """
+    budget = max(memory_budget_mb, 1) * 1024 * 1024
+
+    with tempfile.TemporaryDirectory(prefix="functions_", dir=temp_dir) as folder:
+        runs: List[str] = []
+        buffer: List[pd.DataFrame] = []
+        buffered = 0
+        first_seq = next_seq = 0
+
+        for batch in batches:
+            if batch.empty:
+                continue
+            buffer.append(batch)
+            buffered += _estimate_bytes(batch)
+            next_seq += len(batch)
+            if buffered >= budget:
+                runs.append(_spill(buffer, first_seq, folder, len(runs)))
+                progress.emit("hierarchy", len(runs), 0, "порц", force=True, rows=next_seq)
+                buffer, buffered, first_seq = [], 0, next_seq
+
+        if buffer:
+            runs.append(_spill(buffer, first_seq, folder, len(runs)))
+            buffer = []
+
+        # слишком много порций — сливаем группами, чтобы не держать открытыми сотни файлов
+        number = len(runs)
+        while len(runs) > MERGE_FAN_IN:
+            merged = []
+            for i in range(0, len(runs), MERGE_FAN_IN):
+                group = runs[i:i + MERGE_FAN_IN]
+                merged.append(_write_run(
+                    folder, number, ((seq, code, name) for _, seq, code, name in _merge_runs(group))
+                ))
+                number += 1
+                for old in group:
+                    os.remove(old)
+            runs = merged
+
+        print(f"Сортировка через диск: {next_seq} строк, порций: {len(runs)}")
+        yield from _merged_functions(_merge_runs(runs), mode)
+
+
+# ---------------- Большие .txt: чтение через mmap частями ----------------
+
+# Размер части файла; вместе с декодированным текстом и найденными строками
+# это и есть пиковый расход памяти на .txt, каким бы большим ни был файл
+TXT_CHUNK_BYTES = 16 * 1024 * 1024
+
+# .txt больше этого размера сводится через временные файлы (consolidate_external)
+# и без --memory-budget: кандидаты со всего файла в памяти не собираются
+TXT_EXTERNAL_BYTES = 256 * 1024 * 1024
+
+# Бюджет памяти (МБ) для такого .txt, если --memory-budget не задан
+TXT_MEMORY_BUDGET_MB = 512
+
+# По такому началу файла определяется кодировка
+ENCODING_SAMPLE_BYTES = 1024 * 1024
+
+_UTF8_BOM = b"\xef\xbb\xbf"
+_MB = 1024 * 1024
+
+# Строка, на которой совпадение FUNCTION_LINE_RE может не закончиться:
+# пустая или "висящий" код без названия (F1, Ф 1 . 2 -) — \s в шаблоне
+# захватывает перевод строки, и название может оказаться на следующей строке
+_OPEN_LINE_RE = re.compile(r"\s*(?:[ФF][\s\d.\-_]*)?")
+
+
+def detect_text_encoding(path: str) -> str:
+    """
+    Кодировка текстового файла по первым ENCODING_SAMPLE_BYTES: BOM или
+    корректный UTF-8 -> 'utf-8', иначе 'cp1251' (выгрузки из Windows-систем).
+    """
+    with open(path, "rb") as f:
+        sample = f.read(ENCODING_SAMPLE_BYTES)
+
+    if sample.startswith(_UTF8_BOM):
+        return "utf-8"
+
+    if len(sample) == ENCODING_SAMPLE_BYTES:
+        # не проверяем символ, разрезанный границей выборки
+        cut = sample.rfind(b"\n")
+        if cut > 0:
+            sample = sample[:cut]
+    try:
+        sample.decode("utf-8")
+    except UnicodeDecodeError:
+        return "cp1251"
+    return "utf-8"
+
+
+def _safe_cut(text: str) -> int:
+    """
+    Позиция после последней строки, на которой не может "зависнуть"
+    совпадение FUNCTION_LINE_RE: всё до неё можно разбирать отдельно от
+    продолжения файла.
+    """
+    end = len(text)
+    while end > 0:
+        start = text.rfind("\n", 0, end - 1) + 1
+        if not _OPEN_LINE_RE.fullmatch(text, start, end):
+            return end
+        end = start
+    # в части одни пустые строки и висящие коды — переносим её целиком
+    return 0
+
+
+def _decode_chunk(raw: bytes, encoding: str, where: str) -> str:
+    """
+    Байты части файла -> текст. Кодировка файла определяется по его началу;
+    если дальше встречаются строки, которые в ней не читаются (выгрузки,
+    склеенные из файлов в разных кодировках), эти строки читаются как
+    cp1251, а не теряют символы молча.
+    """
+    try:
+        return raw.decode(encoding)
+    except UnicodeDecodeError as e:
+        bad = e.start
+    # в cp1251 не определён только байт 0x98
+    if encoding == "cp1251":
+        return raw.decode("cp1251", errors="replace")
+
+    print(f"Часть файла ({where}) не в кодировке {encoding} — такие строки читаем как cp1251.")
+    cut = raw.rfind(b"\n", 0, bad) + 1
+    lines = [raw[:cut].decode(encoding)]
+    for line in raw[cut:].splitlines(keepends=True):
+        try:
+            lines.append(line.decode(encoding))
+        except UnicodeDecodeError:
+            lines.append(line.decode("cp1251", errors="replace"))
+    return "".join(lines)
+
+
+def _txt_line_start(mm, offset: int, size: int) -> int:
+    """Начало строки, которая содержит байт offset - 1 или начинается с offset."""
+    if offset <= 0:
+        return 0
+    nl = mm.find(b"\n", offset - 1)
+    return size if nl < 0 else min(nl + 1, size)
+
+
+def iter_txt_chunks(path: str, encoding: Optional[str] = None,
+                    chunk_bytes: int = TXT_CHUNK_BYTES):
+    """
+    Текст .txt частями по ~chunk_bytes. Файл отображается в память (mmap),
+    части режутся по переводу строки, поэтому многобайтовые символы не
+    разрываются. Хвост части, который может продолжиться в следующей
+    (см. _safe_cut), переносится в неё — поиск по частям находит то же,
+    что поиск по всему тексту.
+    """
+    encoding = encoding or detect_text_encoding(path)
+    size = os.path.getsize(path)
+    if size == 0:
+        return
+
+    with open(path, "rb") as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+        pos = len(_UTF8_BOM) if mm[:len(_UTF8_BOM)] == _UTF8_BOM else 0
+        carry = ""
+        released = 0
+
+        while pos < size:
+            end = min(pos + chunk_bytes, size)
+            if end < size:
+                nl = mm.rfind(b"\n", pos, end)
+                if nl < 0:
+                    # строка длиннее части — берём её целиком
+                    nl = mm.find(b"\n", end)
+                end = size if nl < 0 else nl + 1
+
+            text = carry + _decode_chunk(mm[pos:end], encoding, f"байты {pos}–{end}")
+            pos = end
+
+            # прочитанные страницы отображения больше не нужны — иначе они
+            # числятся за процессом до конца разбора
+            done = pos // mmap.PAGESIZE * mmap.PAGESIZE
+            if hasattr(mm, "madvise") and hasattr(mmap, "MADV_DONTNEED") and done > released:
+                mm.madvise(mmap.MADV_DONTNEED, released, done - released)
+                released = done
+
+            if pos < size:
+                cut = _safe_cut(text)
+                text, carry = text[:cut], text[cut:]
+            else:
+                carry = ""
+
+            progress.emit("read", round(pos / _MB, 1), round(size / _MB, 1), "МБ")
+            yield text
+
+
+def iter_txt_blocks(path: str, blocks: List[int], encoding: Optional[str] = None,
+                    block_bytes: int = PREVIEW_TXT_BLOCK_BYTES):
+    """
+    Текст выбранных блоков .txt (номера blocks по возрастанию) для пробного
+    разбора: блок — строки, которые начинаются в его block_bytes байтах.
+    Остальной файл не читается, поэтому выборка из начала большого файла
+    занимает столько же, сколько из маленького.
+    """
+    encoding = encoding or detect_text_encoding(path)
+    size = os.path.getsize(path)
+    if size == 0:
+        return
+
+    with open(path, "rb") as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+        bom = len(_UTF8_BOM) if mm[:len(_UTF8_BOM)] == _UTF8_BOM else 0
+        for i, block in enumerate(blocks):
+            start = max(_txt_line_start(mm, block * block_bytes, size), bom)
+            end = _txt_line_start(mm, (block + 1) * block_bytes, size)
+            progress.emit("read", i, len(blocks), "блок")
+            if start < end:
+                yield _decode_chunk(mm[start:end], encoding, f"байты {start}–{end}")
+        progress.emit("read", len(blocks), len(blocks), "блок", force=True)
+
+
+def txt_block_count(path: str, block_bytes: int = PREVIEW_TXT_BLOCK_BYTES) -> int:
+    return -(-os.path.getsize(path) // block_bytes)
+
+
+def is_large_txt(path: str) -> bool:
+    """.txt, который читается только порциями (больше TXT_EXTERNAL_BYTES)."""
+    return (
+        os.path.splitext(path)[1].lower() == ".txt"
+        and os.path.getsize(path) > TXT_EXTERNAL_BYTES
+    )
+
+
+def iter_txt_candidates(path: str):
+    """
+    Кандидаты (extract_candidates) из .txt по частям файла: на каждую часть —
+    своя таблица, весь текст в памяти не держится.
+    """
+    encoding = detect_text_encoding(path)
+    print("Кодировка текста:", encoding)
+
+    found = 0
+    for chunk in iter_txt_chunks(path, encoding):
+        batch = extract_candidates(chunk, report_progress=False)
+        found += len(batch)
+        yield batch
+    progress.emit("extract", 1, 1, "", force=True, matched=found)
 
 
 def read_file_content(path: str) -> str:
     """
     Универсальное чтение текста из:
-      .txt, .docx, .pdf, .xlsx, .xls
+      .docx, .pdf, .xlsx, .xls
 
-    Для Excel читаем все листы книги и превращаем в текст.
+    Для Excel читаем все листы книги и превращаем в текст. .txt сюда не
+    попадает: он может быть больше памяти и читается частями
+    (iter_txt_chunks, iter_txt_candidates; для пробного разбора — iter_txt_blocks).
     """
     ext = os.path.splitext(path)[1].lower()
     text = ""
 
     if ext == ".txt":
-        with open(path, "r", encoding="utf-8", errors="ignore") as f:
-            text = f.read()
+        raise ValueError(".txt читается частями: iter_txt_chunks / iter_txt_candidates")
 
     elif ext == ".docx":
         try:
             from docx import Document
+            progress.emit("read", 0, 0, "", force=True)
             doc = Document(path)
 
             chunks = []
@@ -458,28 +958,19 @@ def read_file_content(path: str) -> str:
             import fitz  # PyMuPDF
             doc = fitz.open(path)
             pages = []
-            for page in doc:
+            for i, page in enumerate(doc):
+                progress.emit("read", i, len(doc), "стр")
                 pages.append(page.get_text("text"))
+            progress.emit("read", len(doc), len(doc), "стр", force=True)
             text = "\n".join(pages)
         except Exception as e:
             print("Ошибка чтения PDF:", e)
 
     elif ext in [".xlsx", ".xls"]:
         try:
-            all_sheets = pd.read_excel(path, sheet_name=None, header=None)
-            lines = []
-
-            for sheet_name, df in all_sheets.items():
-                for _, row in df.iterrows():
-                    vals = []
-                    for v in row.tolist():
-                        s = str(v).strip()
-                        if s and s.lower() != "nan":
-                            vals.append(s)
-                    if vals:
-                        lines.append(" ".join(vals))
-
-            text = "\n".join(lines)
+            progress.emit("read", 0, 0, "лист", force=True)
+            all_sheets = read_sheets(path)
+            text = text_from_sheets(all_sheets)
         except Exception as e:
             print("Ошибка чтения Excel:", e)
 
@@ -489,18 +980,617 @@ def read_file_content(path: str) -> str:
     return text
 
 
+def text_from_sheets(all_sheets: Dict[str, pd.DataFrame]) -> str:
+    """
+    Листы Excel (header=None) -> текст: каждая строка листа становится
+    строкой текста из непустых ячеек через пробел.
+    """
+    lines = []
+
+    for i, df in enumerate(all_sheets.values()):
+        progress.emit("read", i, len(all_sheets), "лист", force=True)
+        for _, row in df.iterrows():
+            vals = []
+            for v in row.tolist():
+                s = str(v).strip()
+                if s and s.lower() != "nan":
+                    vals.append(s)
+            if vals:
+                lines.append(" ".join(vals))
+
+    return "\n".join(lines)
+
+
+# ---------------- Excel: разбор по столбцам ----------------
+
+# Ячейка, в которой стоит только код функции (без названия)
+CODE_CELL_RE = re.compile(r"\s*[ФF]\s*\d+(?:\s*[.\-_]\s*\d+){0,4}\.?\s*")
+
+# Столбец считается столбцом кодов, если кодов в нём не меньше
+# CODE_COLUMN_MIN_ROWS и они составляют не меньше CODE_COLUMN_MIN_SHARE
+# непустых ячеек (остальное — заголовки, разделы, примечания)
+CODE_COLUMN_MIN_ROWS = 2
+CODE_COLUMN_MIN_SHARE = 0.5
+
+def cell_strings(df: pd.DataFrame) -> pd.DataFrame:
+    """Ячейки листа -> строки без пробелов по краям ('' для пустых)."""
+    df = df.astype(object).where(df.notna(), "")
+    return df.apply(lambda col: col.astype(str).str.strip())
+
+
+def normalize_codes(codes: pd.Series) -> pd.Series:
+    """normalize_code для целого столбца (строковые операции pandas)."""
+    codes = codes.str.strip()
+    tail = (
+        codes.str[1:]
+        .str.replace(" ", "", regex=False)
+        .str.replace(r"[_\-]", ".", regex=True)
+        .str.replace(r"\.{2,}", ".", regex=True)
+        .str.strip(".")
+    )
+    return codes.str[:1] + tail
+
+
+def detect_function_columns(cells: pd.DataFrame) -> Optional[Tuple[object, object, pd.Series]]:
+    """
+    Ищет на листе столбец кодов и столбец названий.
+
+    Столбец кодов — тот, где больше всего ячеек из одного кода (CODE_CELL_RE).
+    Столбец названий — тот, где в строках с кодом больше всего непустых
+    ячеек, не являющихся кодами; при равенстве берётся ближайший к столбцу
+    кодов (справа раньше, чем слева).
+
+    Возвращает (столбец кодов, столбец названий, маска строк с кодом)
+    или None, если таблицы "код | название" на листе нет.
+    """
+    if cells.empty:
+        return None
+
+    nonempty = cells != ""
+    is_code = cells.apply(lambda col: col.str.fullmatch(CODE_CELL_RE).fillna(False))
+
+    n_codes = is_code.sum()
+    best = n_codes.idxmax()
+    if n_codes[best] < CODE_COLUMN_MIN_ROWS:
+        return None
+    if n_codes[best] < CODE_COLUMN_MIN_SHARE * nonempty[best].sum():
+        return None
+
+    rows = is_code[best]
+    columns = list(cells.columns)
+    pos = columns.index(best)
+
+    name_col = None
+    name_score = None
+    for i, col in enumerate(columns):
+        if col == best:
+            continue
+        filled = int((nonempty[col] & ~is_code[col] & rows).sum())
+        distance = i - pos if i > pos else (pos - i) + len(columns)
+        score = (filled, -distance)
+        if filled and (name_score is None or score > name_score):
+            name_col, name_score = col, score
+
+    if name_col is None:
+        return None
+    return best, name_col, rows
+
+
+def candidates_from_columns(codes: pd.Series, names: pd.Series) -> pd.DataFrame:
+    """
+    Кандидаты из столбца кодов и столбца названий (строки с кодом уже
+    отобраны). Очистка та же, что у extract_candidates: маркеры списков
+    в начале названия, строки-описания отказов, повтор кода в начале названия.
+    """
+    codes = normalize_codes(codes)
+    names = (
+        names.str.replace(r"\s+", " ", regex=True)
+        .str.replace(LIST_MARKS_RE, "", regex=True)
+        .str.strip()
+    )
+
+    keep = (names != "") & ~names.str.lower().str.contains(_FAILURE_RE, regex=True)
+    codes = codes[keep].tolist()
+    names = names[keep].tolist()
+
+    names = [
+        strip_leading_code_tokens(code, name) if name[0] in ("F", "Ф") else name
+        for code, name in zip(codes, names)
+    ]
+    return make_candidates(codes, names)
+
+
+def candidates_from_sheet(cells: pd.DataFrame) -> Optional[pd.DataFrame]:
+    """
+    Кандидаты из листа с таблицей "код | название" (ячейки — из cell_strings).
+    Код и название берутся каждый из своего столбца, без склейки строки
+    в текст: названия с числами и соседние столбцы (описания, примечания)
+    не путаются с кодом. None — таблица на листе не найдена.
+    """
+    found = detect_function_columns(cells)
+    if found is None:
+        return None
+    code_col, name_col, rows = found
+    return candidates_from_columns(cells.loc[rows, code_col], cells.loc[rows, name_col])
+
+
+def candidates_from_sheets(all_sheets: Dict[str, pd.DataFrame]) -> pd.DataFrame:
+    """
+    Кандидаты из всех листов книги (header=None). Листы с таблицей
+    "код | название" разбираются по столбцам (candidates_from_sheet),
+    остальные — как раньше, через текст строк (text_from_sheets).
+    """
+    results: List[pd.DataFrame] = []
+
+    for i, (sheet_name, df) in enumerate(all_sheets.items()):
+        progress.emit("read", i, len(all_sheets), "лист", force=True)
+        found = candidates_from_sheet(cell_strings(df))
+        if found is None:
+            found = extract_candidates(text_from_sheets({sheet_name: df}), report_progress=False)
+        results.append(found)
+
+    progress.emit("read", len(all_sheets), len(all_sheets), "лист", force=True)
+    return concat_candidates(results)
+
+
+# ---------------- Word: таблицы по строкам ----------------
+
+def _docx_cell_text(tc, qn) -> str:
+    """Текст ячейки w:tc: абзацы через перевод строки, табуляции и переносы — пробелы."""
+    text_tag = qn("w:t")
+    parts = []
+    for p in tc.iterchildren(qn("w:p")):
+        if parts:
+            parts.append("\n")
+        for el in p.iter(text_tag, qn("w:tab"), qn("w:br"), qn("w:cr")):
+            parts.append((el.text or "") if el.tag == text_tag else " ")
+    return "".join(parts).strip()
+
+
+def docx_table_cells(table, rows=None) -> Tuple[pd.DataFrame, pd.DataFrame]:
+    """
+    Таблица Word -> (ячейки, продолжения): одна строка DataFrame на строку
+    таблицы, один столбец на столбец сетки. rows — только эти строки w:tr
+    (для пробного разбора), по умолчанию все.
+
+    Объединённые ячейки не размножаются (в отличие от row.cells):
+      - по горизонтали текст стоит в первом столбце, остальные пустые;
+      - по вертикали текст стоит в первой строке, в следующих — '',
+        а в таблице продолжений для них True.
+
+    XML таблицы читается напрямую: объекты python-docx на каждую ячейку
+    (_Cell, Paragraph, Run) в больших таблицах занимают почти всё время.
+    """
+    from docx.oxml.ns import qn
+
+    val = qn("w:val")
+    if rows is None:
+        rows = table._tbl.iterchildren(qn("w:tr"))
+    cells: List[List[str]] = []
+    continued: List[List[bool]] = []
+
+    for tr in rows:
+        before = tr.find(f"{qn('w:trPr')}/{qn('w:gridBefore')}")
+        skip = int(before.get(val, 0)) if before is not None else 0
+        row = [""] * skip
+        cont = [False] * skip
+
+        for tc in tr.iterchildren(qn("w:tc")):
+            span = 1
+            merged = False
+            tc_pr = tc.find(qn("w:tcPr"))
+            if tc_pr is not None:
+                grid_span = tc_pr.find(qn("w:gridSpan"))
+                if grid_span is not None:
+                    span = int(grid_span.get(val, 1))
+                v_merge = tc_pr.find(qn("w:vMerge"))
+                # w:vMerge без значения — тоже продолжение
+                merged = v_merge is not None and v_merge.get(val, "continue") == "continue"
+
+            row.append("" if merged else _docx_cell_text(tc, qn))
+            cont.append(merged)
+            row.extend([""] * (span - 1))
+            cont.extend([False] * (span - 1))
+
+        cells.append(row)
+        continued.append(cont)
+
+    width = max((len(r) for r in cells), default=0)
+    for row, cont in zip(cells, continued):
+        row.extend([""] * (width - len(row)))
+        cont.extend([False] * (width - len(cont)))
+
+    return pd.DataFrame(cells, dtype=object), pd.DataFrame(continued, dtype=bool)
+
+
+def candidates_from_docx_table(table, rows=None) -> Optional[pd.DataFrame]:
+    """
+    Кандидаты из таблицы Word "код | название": строка таблицы — одна
+    функция, столбцы ищутся как на листе Excel (detect_function_columns).
+
+    Если ячейка кода объединена на несколько строк, а название в каждой
+    строке своё, части названия склеиваются через пробел.
+    rows — как у docx_table_cells. None — таблицы "код | название" нет.
+    """
+    cells, continued = docx_table_cells(table, rows)
+    found = detect_function_columns(cells)
+    if found is None:
+        return None
+    code_col, name_col, rows = found
+
+    names = cells[name_col].copy()
+    last = None
+    for r in range(len(cells)):
+        if rows.iat[r]:
+            last = r
+        elif continued.iat[r, code_col] and last is not None:
+            part = names.iat[r]
+            if part and not continued.iat[r, name_col]:
+                names.iat[last] = f"{names.iat[last]} {part}".strip()
+        else:
+            last = None
+
+    return candidates_from_columns(cells.loc[rows, code_col], names[rows])
+
+
+def read_docx_candidates(path: str) -> pd.DataFrame:
+    """
+    Кандидаты из .docx: абзацы разбираются как текст, таблицы — по строкам
+    (candidates_from_docx_table). Таблицы без столбцов "код | название"
+    разбираются как раньше: каждая ячейка — строка текста.
+    """
+    try:
+        from docx import Document
+        progress.emit("read", 0, 0, "", force=True)
+        doc = Document(path)
+    except Exception as e:
+        print("Ошибка чтения DOCX:", e)
+        return make_candidates([], [])
+
+    text = "\n".join(p.text for p in doc.paragraphs if p.text)
+    results = [extract_candidates(text, report_progress=False)]
+
+    tables = doc.tables
+    for i, table in enumerate(tables):
+        progress.emit("read", i, len(tables), "табл")
+        results.append(_docx_table_candidates(table))
+    progress.emit("read", len(tables), len(tables), "табл", force=True)
+
+    return concat_candidates(results)
+
+
+def _docx_table_candidates(table, rows=None) -> pd.DataFrame:
+    """
+    candidates_from_docx_table, а для таблиц без столбцов "код | название" —
+    разбор как раньше: каждая ячейка — строка текста.
+    """
+    found = candidates_from_docx_table(table, rows)
+    if found is None:
+        cells, _ = docx_table_cells(table, rows)
+        lines = [v for v in cells.to_numpy().ravel() if v]
+        found = extract_candidates("\n".join(lines), report_progress=False)
+    return found
+
+
+def read_candidates(path: str) -> pd.DataFrame:
+    """
+    Кандидаты из файла любого поддерживаемого формата. .txt читается частями
+    (iter_txt_candidates), Excel — по столбцам (candidates_from_sheets),
+    таблицы Word — по строкам (read_docx_candidates), PDF — через текст
+    документа (read_file_content).
+
+    Большой .txt (is_large_txt) одной таблицей не отдаётся — ValueError:
+    его кандидаты идут порциями (iter_candidate_batches) в consolidate_external.
+    """
+    ext = os.path.splitext(path)[1].lower()
+
+    if ext == ".txt":
+        if is_large_txt(path):
+            raise ValueError(
+                f"файл .txt больше {TXT_EXTERNAL_BYTES // _MB} МБ читается только "
+                "порциями при импорте"
+            )
+        return concat_candidates(list(iter_txt_candidates(path)))
+
+    if ext == ".docx":
+        return read_docx_candidates(path)
+
+    if ext in [".xlsx", ".xls"]:
+        try:
+            progress.emit("read", 0, 0, "лист", force=True)
+            all_sheets = read_sheets(path)
+        except Exception as e:
+            print("Ошибка чтения Excel:", e)
+            return make_candidates([], [])
+        return candidates_from_sheets(all_sheets)
+
+    return extract_candidates(read_file_content(path))
+
+
+def _choose_sample(total: int, count: int, sample: str, seed: Optional[int]) -> List[int]:
+    """Номера страниц выборки: первые count или count случайных (по порядку)."""
+    if count <= 0 or count >= total:
+        return list(range(total))
+    if sample == "random":
+        return sorted(random.Random(seed).sample(range(total), count))
+    return list(range(count))
+
+
+def _choose_blocks(sizes: List[int], count: int, sample: str, seed: Optional[int]):
+    """
+    Делит части документа (листы, таблицы, абзацы) размером sizes строк на
+    блоки по PREVIEW_BLOCK_ROWS и выбирает из них выборку (_choose_sample).
+    Возвращает ({номер части: множество начальных строк блоков}, блоков всего).
+    """
+    blocks = [(part, start) for part, size in enumerate(sizes) for start in range(0, size, PREVIEW_BLOCK_ROWS)]
+    chosen: Dict[int, set] = {}
+    for i in _choose_sample(len(blocks), count, sample, seed):
+        part, start = blocks[i]
+        chosen.setdefault(part, set()).add(start)
+    return chosen, len(blocks)
+
+
+def _in_blocks(row_no: int, starts: set) -> bool:
+    return row_no - row_no % PREVIEW_BLOCK_ROWS in starts
+
+
+def _sample_xlsx(path: str, count: int, sample: str, seed: Optional[int]):
+    """
+    Выборка блоков строк из листов .xlsx (openpyxl read_only): у каждого листа
+    читаются строки от первого до последнего выбранного блока, таблица из
+    выбранных строк разбирается как лист при импорте (candidates_from_sheet).
+    Возвращает (кандидаты, блоков в выборке, блоков всего, время открытия книги).
+    """
+    import openpyxl
+
+    t0 = time.perf_counter()
+    wb = openpyxl.load_workbook(path, read_only=True, data_only=True)
+    try:
+        sheets = wb.worksheets
+        for ws in sheets:
+            if ws.max_row is None:
+                ws.calculate_dimension(force=True)
+        opened = time.perf_counter() - t0
+
+        chosen, total = _choose_blocks([ws.max_row or 0 for ws in sheets], count, sample, seed)
+        results = []
+        for sheet_no, ws in enumerate(sheets):
+            starts = chosen.get(sheet_no)
+            if not starts:
+                continue
+            progress.emit("read", sheet_no, len(sheets), "лист", force=True)
+            first = min(starts)
+            rows = [
+                row for row_no, row in enumerate(
+                    ws.iter_rows(min_row=first + 1, max_row=max(starts) + PREVIEW_BLOCK_ROWS, values_only=True),
+                    start=first,
+                )
+                if _in_blocks(row_no, starts)
+            ]
+            df = pd.DataFrame(rows, dtype=object)
+            found = candidates_from_sheet(cell_strings(df))
+            if found is None:
+                found = extract_candidates(text_from_sheets({ws.title: df}), report_progress=False)
+            results.append(found)
+    finally:
+        wb.close()
+
+    return concat_candidates(results), sum(len(v) for v in chosen.values()), total, opened
+
+
+def _sample_docx(path: str, count: int, sample: str, seed: Optional[int]):
+    """
+    Выборка блоков из .docx: абзацы и строки каждой таблицы делятся на блоки
+    по PREVIEW_BLOCK_ROWS; текст и ячейки извлекаются только у выбранных
+    (сам XML документа python-docx всё равно загружает целиком).
+    Возвращает (кандидаты, блоков в выборке, блоков всего, время открытия документа).
+    """
+    from docx import Document
+    from docx.oxml.ns import qn
+
+    t0 = time.perf_counter()
+    doc = Document(path)
+    paragraphs = doc.paragraphs
+    tables = doc.tables
+    table_rows = [list(table._tbl.iterchildren(qn("w:tr"))) for table in tables]
+    opened = time.perf_counter() - t0
+
+    chosen, total = _choose_blocks([len(paragraphs)] + [len(r) for r in table_rows], count, sample, seed)
+    starts = chosen.get(0, set())
+    text = "\n".join(
+        p.text for i, p in enumerate(paragraphs) if _in_blocks(i, starts) and p.text
+    )
+    results = [extract_candidates(text, report_progress=False)]
+
+    for i, (table, rows) in enumerate(zip(tables, table_rows)):
+        starts = chosen.get(i + 1)
+        if starts:
+            progress.emit("read", i, len(tables), "табл")
+            results.append(_docx_table_candidates(
+                table, [tr for r, tr in enumerate(rows) if _in_blocks(r, starts)]
+            ))
+    progress.emit("read", len(tables), len(tables), "табл", force=True)
+
+    return concat_candidates(results), sum(len(v) for v in chosen.values()), total, opened
+
+
+def read_sample(
+    path: str,
+    count: int,
+    sample: str = "head",
+    seed: Optional[int] = None,
+) -> Tuple[pd.DataFrame, int, int, float]:
+    """
+    Кандидаты из выборки документа для пробного разбора.
+
+    PDF читается только по выбранным страницам, .txt — только по выбранным
+    блокам байт (iter_txt_blocks), .xlsx и .docx — только по выбранным
+    блокам строк листов, строк таблиц и абзацев (_sample_xlsx,
+    _sample_docx); разбор тот же, что при полном запуске. .xls читается
+    целиком (read_candidates), и найденные строки с кодом делятся на блоки
+    по PREVIEW_BLOCK_ROWS, из которых берётся выборка.
+
+    Возвращает (кандидаты, страниц в выборке, страниц всего, оценка времени
+    чтения всего документа в секундах).
+    """
+    ext = os.path.splitext(path)[1].lower()
+    t0 = time.perf_counter()
+
+    if ext == ".pdf":
+        try:
+            import fitz  # PyMuPDF
+            doc = fitz.open(path)
+        except Exception as e:
+            print("Ошибка чтения PDF:", e)
+            return make_candidates([], []), 0, 0, 0.0
+
+        total = len(doc)
+        chosen = _choose_sample(total, count, sample, seed)
+        pages = []
+        for i, page_no in enumerate(chosen):
+            progress.emit("read", i, len(chosen), "стр")
+            pages.append(doc[page_no].get_text("text"))
+        progress.emit("read", len(chosen), len(chosen), "стр", force=True)
+
+        elapsed = time.perf_counter() - t0
+        read_full = elapsed * total / len(chosen) if chosen else 0.0
+        return extract_candidates("\n".join(pages), report_progress=False), len(chosen), total, read_full
+
+    if ext == ".txt":
+        total = txt_block_count(path)
+        chosen = _choose_sample(total, count, sample, seed)
+        candidates = concat_candidates([
+            extract_candidates(text, report_progress=False) for text in iter_txt_blocks(path, chosen)
+        ])
+        elapsed = time.perf_counter() - t0
+        read_full = elapsed * total / len(chosen) if chosen else 0.0
+        return candidates, len(chosen), total, read_full
+
+    if ext in (".xlsx", ".docx"):
+        reader = _sample_xlsx if ext == ".xlsx" else _sample_docx
+        try:
+            candidates, sampled, total, opened = reader(path, count, sample, seed)
+        except Exception as e:
+            print("Ошибка чтения:", e)
+            return make_candidates([], []), 0, 0, 0.0
+        # открытие файла не зависит от размера выборки, чтение блоков — пропорционально
+        elapsed = time.perf_counter() - t0 - opened
+        read_full = opened + (elapsed * total / sampled if sampled else 0.0)
+        return candidates, sampled, total, read_full
+
+    candidates = read_candidates(path)
+    read_full = time.perf_counter() - t0
+
+    blocks = -(-len(candidates) // PREVIEW_BLOCK_ROWS)
+    chosen = _choose_sample(blocks, count, sample, seed)
+    block_of_row = np.arange(len(candidates)) // PREVIEW_BLOCK_ROWS
+    sampled = candidates[np.isin(block_of_row, chosen)].reset_index(drop=True)
+    sampled["Func_LCN"] = sampled["Func_LCN"].cat.remove_unused_categories()
+    return sampled, len(chosen), blocks, read_full
+
+
+def _estimate_export_time(functions: pd.DataFrame, expected: int) -> float:
+    """Пишет выборку в Excel в памяти и пересчитывает время на expected строк."""
+    if functions.empty:
+        return 0.0
+    t0 = time.perf_counter()
+    functions.to_excel(io.BytesIO(), index=False, sheet_name="Функции")
+    return (time.perf_counter() - t0) * expected / len(functions)
+
+
+def _format_seconds(seconds: float) -> str:
+    if seconds < 60:
+        return f"{seconds:.1f} с"
+    minutes, seconds = divmod(int(seconds), 60)
+    return f"{minutes} мин {seconds:02d} с"
+
+
+def run_preview(args) -> None:
+    """
+    Пробный разбор: читает выборку страниц, применяет те же фильтры, что и
+    полный запуск, печатает найденные функции и оценку итогового количества
+    и времени. Functions.xlsx не создаётся.
+    """
+    path = args.input_file[0]
+    candidates, sampled, total, read_full = read_sample(path, args.preview, args.sample, args.seed)
+    if candidates.empty:
+        print("В выборке не найдено строк с кодами функций.")
+        sys.exit(1)
+
+    t0 = time.perf_counter()
+    functions = filter_candidates(
+        candidates,
+        max_depth=args.max_depth,
+        mode=args.mode,
+        code_letter=args.code_letter or None,
+        code_prefix=args.code_prefix or None,
+    )
+    functions = consolidate_functions(infer_hierarchy(functions, mode=args.mode))
+    process_sample = time.perf_counter() - t0
+
+    unit = "стр." if os.path.splitext(path)[1].lower() == ".pdf" else "блоков"
+    scale = total / sampled if sampled else 0.0
+    expected = round(len(functions) * scale)
+
+    print()
+    print(f"Пробный разбор: {sampled} из {total} {unit} "
+          f"({'случайные' if args.sample == 'random' else 'первые'})")
+    print(f"Найдено в выборке: {len(functions)}")
+
+    shown = functions.head(PREVIEW_SHOW)
+    for code, name in zip(shown["Func_LCN"], shown["Name"]):
+        print(f"  {code:<14} {name}")
+    if len(functions) > PREVIEW_SHOW:
+        print(f"  ... (ещё {len(functions) - PREVIEW_SHOW})")
+
+    if not functions.empty:
+        depth_counts = functions["Func_LCN"].map(get_depth).value_counts().sort_index()
+        levels = ", ".join(f"{d}: {n}" for d, n in depth_counts.items())
+        print(f"По уровням      : {levels}")
+
+    full_time = read_full + process_sample * scale + _estimate_export_time(functions, expected)
+
+    print(f"Оценка для всего документа: ~{expected} функций, "
+          f"~{_format_seconds(full_time)} на полный разбор")
+    if args.sample == "head" and sampled < total:
+        print("Первые страницы часто содержат оглавление — "
+              "для оценки надёжнее случайная выборка (--sample random).")
+
+
+# Столбцы листа "Функции" (шаблон Pragmatica)
+EXCEL_COLUMNS = [
+    "FI_Обозначение",
+    "Func_LCN",
+    "Parent_LCN",
+    "Name",
+    "Description",
+    "Products_List",
+]
+
+# Строк данных на листе Excel (без заголовка)
+EXCEL_MAX_ROWS = 1048575
+
+
+def _too_many_rows_message() -> str:
+    return f"Функций больше, чем строк на листе Excel ({EXCEL_MAX_ROWS})."
+
+
 def export_to_excel(
-    functions: List[Dict[str, str]],
+    functions: pd.DataFrame,
     fi_name: str,
     output_file: str = "Functions.xlsx",
 ):
-    """Сохраняет функции в Excel в формате шаблона Pragmatica."""
-    if not functions:
-        print("Не найдено ни одной функции в документе.")
-        # важное изменение: сообщаем об ошибке вызывающему коду
-        sys.exit(1)
+    """
+    Сохраняет функции (таблица из consolidate_functions) в Excel в формате
+    шаблона Pragmatica. Если сохранять нечего (нет функций или их больше,
+    чем строк на листе), бросает ValueError; старый файл при этом не трогается.
+    """
+    if functions.empty:
+        raise ValueError("Не найдено ни одной функции в документе.")
+    if len(functions) > EXCEL_MAX_ROWS:
+        raise ValueError(_too_many_rows_message())
 
-    df = pd.DataFrame(functions)
+    df = functions.copy()
 
     df.insert(0, "FI_Обозначение", fi_name)
     if "Products_List" not in df.columns:
@@ -510,16 +1600,7 @@ def export_to_excel(
         if col not in df.columns:
             df[col] = ""
 
-    df = df[
-        [
-            "FI_Обозначение",
-            "Func_LCN",
-            "Parent_LCN",
-            "Name",
-            "Description",
-            "Products_List",
-        ]
-    ]
+    df = df[EXCEL_COLUMNS]
 
     output_path = os.path.abspath(output_file)
 
@@ -527,22 +1608,88 @@ def export_to_excel(
     archive_old(output_path)
 
     df.to_excel(output_path, index=False, sheet_name="Функции")
+    # копия листа для быстрого чтения конвертером (для больших книг)
+    write_sidecar(output_path, "Функции", df)
 
     print("Сохранено {} функций в файл: {}".format(len(df), output_path))
 
 
+def export_rows_to_excel(
+    rows: Iterable[Tuple[str, str, str, str]],
+    fi_name: str,
+    output_file: str = "Functions.xlsx",
+):
+    """
+    То же, что export_to_excel, но для потока строк (Func_LCN, Parent_LCN,
+    Name, Description) из consolidate_external: лист пишется построчно
+    (openpyxl, write_only), таблица целиком в памяти не собирается.
+    Заодно строки пишутся в CSV-копию листа (sidecar, см. excel_reader).
+
+    Сколько строк в потоке, заранее неизвестно, поэтому книга пишется во
+    временный файл рядом и встаёт на место старой (та уходит в Архив) только
+    после успешной записи; при ошибке старый Functions.xlsx остаётся как был.
+    """
+    from openpyxl import Workbook
+
+    rows = iter(rows)
+    first = next(rows, None)
+    if first is None:
+        raise ValueError("Не найдено ни одной функции в документе.")
+
+    output_path = os.path.abspath(output_file)
+    part_path = os.path.splitext(output_path)[0] + ".part.xlsx"
+
+    wb = Workbook(write_only=True)
+    ws = wb.create_sheet("Функции")
+    ws.append(EXCEL_COLUMNS)
+
+    sidecar, sidecar_rows = open_sidecar_csv(part_path, EXCEL_COLUMNS)
+    count = 0
+    try:
+        for code, parent, name, description in itertools.chain([first], rows):
+            count += 1
+            if count > EXCEL_MAX_ROWS:
+                raise ValueError(_too_many_rows_message())
+            # пустые значения — пустые ячейки, как у pandas
+            ws.append([fi_name, code, parent or None, name, description or None, None])
+            sidecar_rows.writerow([fi_name, code, parent or "", name, description or "", ""])
+            progress.emit("export", count, 0, "функц")
+
+        wb.save(part_path)
+    except BaseException:
+        if not ws.closed:
+            ws.close()  # дописывает временный поток листа, иначе openpyxl ругается при сборке мусора
+        sidecar.close()
+        remove_sidecar(part_path)
+        if os.path.exists(part_path):
+            os.remove(part_path)
+        raise
+    sidecar.close()
+
+    # Перед заменой утащим старый файл в Архив
+    archive_old(output_path)
+    os.replace(part_path, output_path)
+    remove_sidecar(output_path)
+    data_path = sidecar_data_path(output_path, "csv")
+    os.replace(sidecar.name, data_path)
+    commit_sidecar(output_path, "Функции", data_path)
+    print("Сохранено {} функций в файл: {}".format(count, output_path))
+
+
 def main():
     parser = argparse.ArgumentParser(
         description="Парсер функций из документа в Excel (шаблон Pragmatica)"
     )
     parser.add_argument(
         "input_file",
-        help="Путь к файлу (.docx, .pdf, .txt, .xlsx, .xls)",
+        nargs="+",
+        help="Путь к файлу (.docx, .pdf, .txt, .xlsx, .xls); несколько файлов "
+             "сводятся в один Functions.xlsx",
     )
     parser.add_argument(
         "--fi",
-        required=True,
-        help="Обозначение функционального экземпляра (ФИ)",
+        default="",
+        help="Обозначение функционального экземпляра (ФИ); обязательно, кроме --preview",
     )
     parser.add_argument(
         "--out",
@@ -573,14 +1720,74 @@ def main():
         help="Порог по первой числовой группе (например '1', '20'). "
              "Берем только коды, у которых первая группа >= этого значения.",
     )
+    parser.add_argument(
+        "--progress",
+        action="store_true",
+        help="Печатать машиночитаемые события прогресса (используется GUI).",
+    )
+
+    parser.add_argument(
+        "--preview",
+        type=int,
+        default=0,
+        metavar="N",
+        help="Пробный разбор: обработать только N страниц (для txt/docx/Excel — "
+             f"блоков по {PREVIEW_BLOCK_ROWS} строк или абзацев), показать найденное и оценку "
+             "для всего документа. Excel не создаётся.",
+    )
+    parser.add_argument(
+        "--sample",
+        choices=["head", "random"],
+        default="head",
+        help="Какие страницы брать для --preview: первые ('head') или случайные ('random').",
+    )
+    parser.add_argument(
+        "--seed",
+        type=int,
+        default=None,
+        help="Зерно случайной выборки для повторяемого --preview --sample random.",
+    )
+    parser.add_argument(
+        "--memory-budget",
+        type=int,
+        default=0,
+        metavar="МБ",
+        help="Сортировать и сводить функции через временные файлы, держа в памяти "
+             "не больше ~МБ накопленных строк (для наборов, которые не помещаются "
+             "в память). 0 = всё в памяти.",
+    )
+    parser.add_argument(
+        "--temp-dir",
+        default=None,
+        help="Папка для временных файлов --memory-budget (по умолчанию системная).",
+    )
+    parser.add_argument(
+        "--no-catalog",
+        action="store_true",
+        help="Не записывать результат в каталог импортов (Каталог.sqlite).",
+    )
 
     args = parser.parse_args()
 
-    if not os.path.exists(args.input_file):
-        print("Ошибка: файл '{}' не найден.".format(args.input_file))
-        sys.exit(1)
+    if not args.fi and args.preview <= 0:
+        parser.error("the following arguments are required: --fi")
+    if args.preview > 0 and len(args.input_file) > 1:
+        parser.error("--preview работает с одним файлом")
+
+    if args.progress:
+        progress.enable()
+
+    for path in args.input_file:
+        if not os.path.exists(path):
+            print("Ошибка: файл '{}' не найден.".format(path))
+            sys.exit(1)
 
-    print("Обработка файла:", args.input_file)
+    if args.preview > 0:
+        run_preview(args)
+        return
+
+    for path in args.input_file:
+        print("Обработка файла:", path)
     print("Обозначение ФИ:", args.fi)
     print("Режим:", args.mode)
     print("Выходной файл:", args.out)
@@ -590,25 +1797,66 @@ def main():
     if args.code_prefix:
         print("Порог первой группы:", args.code_prefix)
 
-    text = read_file_content(args.input_file)
-    if not text.strip():
-        print("Не удалось извлечь текст из файла.")
-        sys.exit(1)
-
-    functions = extract_functions_from_text(
-        text,
+    filters = dict(
         max_depth=args.max_depth,
         mode=args.mode,
         code_letter=args.code_letter or None,
         code_prefix=args.code_prefix or None,
     )
-    if not functions:
+
+    memory_budget = args.memory_budget
+    if memory_budget <= 0 and any(is_large_txt(path) for path in args.input_file):
+        # все части большого .txt в памяти не уместятся — сводим через диск
+        memory_budget = TXT_MEMORY_BUDGET_MB
+        print(f"Файл .txt больше {TXT_EXTERNAL_BYTES // _MB} МБ: сводим через временные файлы")
+
+    if memory_budget > 0:
+        print("Бюджет памяти (МБ):", memory_budget)
+        batches = (
+            filter_candidates(batch, **filters)
+            for path in args.input_file
+            for batch in iter_candidate_batches(path)
+        )
+        rows = consolidate_external(batches, args.mode, memory_budget, args.temp_dir)
+        if not args.no_catalog:
+            rows = catalog.recording(rows, "functions", args.fi, args.input_file)
+        progress.emit("export", 0, 0, "функц", force=True)
+        try:
+            export_rows_to_excel(rows, args.fi, args.out)
+        except ValueError as e:
+            print("Ошибка:", e)
+            sys.exit(1)
+        return
+
+    # .txt читается частями, таблицы Excel и Word — по столбцам,
+    # остальное — через текст документа (см. read_candidates)
+    functions = filter_candidates(
+        concat_candidates([read_candidates(path) for path in args.input_file]),
+        **filters,
+    )
+    progress.emit("extract", 1, 1, "", force=True, kept=len(functions))
+
+    if functions.empty:
         print("Не найдено ни одной строки с функцией.")
         sys.exit(1)
 
+    progress.emit("hierarchy", 0, len(functions), "функц", force=True)
     functions = infer_hierarchy(functions, mode=args.mode)
     functions = consolidate_functions(functions)
-    export_to_excel(functions, args.fi, args.out)
+
+    progress.emit("export", 0, len(functions), "функц", force=True)
+    try:
+        export_to_excel(functions, args.fi, args.out)
+    except ValueError as e:
+        print("Ошибка:", e)
+        sys.exit(1)
+    progress.emit("export", len(functions), len(functions), "функц", force=True)
+
+    if not args.no_catalog:
+        catalog.record_import(
+            functions[["Func_LCN", "Parent_LCN", "Name", "Description"]].itertuples(index=False),
+            "functions", args.fi, args.input_file,
+        )
 
 
 if __name__ == "__main__":
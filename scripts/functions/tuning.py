@@ -0,0 +1,139 @@
+# tuning.py
+"""
+Кэш кандидатов для подбора фильтров в GUI.
+
+Функции вызываются в резидентном worker.py (задание {"call": "tuning.load",
+"kwargs": {...}}); state — словарь worker.py, который живёт между заданиями.
+Документ читается один раз: все строки с кодами (до фильтров) и индекс
+признаков остаются в процессе worker.py, а не в окне. Смена фильтров только
+пересчитывает маску по индексу (summary), "Запустить импорт" выгружает
+Functions.xlsx из кэша без повторного чтения (export).
+
+Ключ кэша — (путь, время изменения, размер): изменённый файл читается заново.
+"""
+import os
+import sys
+import time
+from typing import Optional
+
+import numpy as np
+
+try:
+    import catalog
+except ImportError:
+    # запуск из папки раздела: общие модули лежат уровнем выше (scripts/)
+    sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+    import catalog
+
+import parse_functions as pf
+
+
+def file_key(path: str) -> Optional[list]:
+    try:
+        st = os.stat(path)
+    except OSError:
+        return None
+    return [os.path.abspath(path), st.st_mtime, st.st_size]
+
+
+def _cached(state: dict, path: str):
+    """Кэш для path, если файл не менялся после чтения, иначе None."""
+    cache = state.get("tuning")
+    key = file_key(path)
+    if cache is None or key is None or cache["key"] != key:
+        return None
+    return cache
+
+
+def load(state: dict, path: str) -> dict:
+    """
+    Читает документ в кэш (если он ещё не там).
+    Возвращает {"key", "rows", "seconds"} или {"error": текст}.
+    """
+    cache = _cached(state, path)
+    if cache is not None:
+        return {"key": cache["key"], "rows": len(cache["candidates"]), "seconds": 0.0}
+
+    # прежний документ освобождаем до чтения нового
+    state.pop("tuning", None)
+    key = file_key(path)
+    t0 = time.perf_counter()
+    try:
+        candidates = pf.read_candidates(path)
+        index = pf.build_candidate_index(candidates)
+    except Exception as e:
+        return {"error": str(e)}
+
+    state["tuning"] = {"key": key, "candidates": candidates, "index": index}
+    return {"key": key, "rows": len(candidates), "seconds": time.perf_counter() - t0}
+
+
+def summary(state: dict, path: str, max_depth: int, mode: str, code_letter: str,
+            code_prefix: str, sample_rows: int) -> dict:
+    """
+    Сводка под фильтры: строк с кодами, прошло фильтры, функций (уникальных
+    кодов), число функций по уровням и первые sample_rows строк [код, название].
+    {"stale": True} — документа в кэше нет (изменён или worker.py перезапущен).
+    """
+    cache = _cached(state, path)
+    if cache is None:
+        return {"stale": True}
+    candidates, index = cache["candidates"], cache["index"]
+
+    mask = pf.candidate_mask(index, max_depth, mode, code_letter or None, code_prefix or None)
+
+    # одинаковые коды схлопываются при выгрузке — считаем уникальные,
+    # глубину берём по первой строке каждого кода
+    kept_ids, first_pos = np.unique(index["code_id"][mask], return_index=True)
+    depth_by_id = index["depth"][mask][first_pos]
+    levels = [[d, int(n)] for d, n in enumerate(np.bincount(depth_by_id)) if n and d]
+
+    sample = candidates.iloc[np.flatnonzero(mask)[:sample_rows]]
+    return {
+        "rows": len(candidates),
+        "passed": int(mask.sum()),
+        "functions": len(kept_ids),
+        "levels": levels,
+        "sample": [[str(code), name] for code, name in zip(sample["Func_LCN"], sample["Name"])],
+    }
+
+
+def export(state: dict, path: str, fi: str, out: str, max_depth: int, mode: str,
+           code_letter: str, code_prefix: str) -> dict:
+    """
+    Шаг 1 импорта из кэша: фильтры, иерархия и запись Functions.xlsx.
+    Если документа в кэше уже нет, он читается заново. Ошибки — как у
+    parse_functions.py: сообщение и код выхода 1. Сбой каталога печатается
+    и импорт не прерывает.
+    """
+    cache = _cached(state, path)
+    if cache is None:
+        loaded = load(state, path)
+        if "error" in loaded:
+            print("Ошибка:", loaded["error"])
+            sys.exit(1)
+        cache = state["tuning"]
+
+    functions = pf.filter_candidates(
+        cache["candidates"], max_depth, mode, code_letter or None, code_prefix or None,
+        index=cache["index"],
+    )
+    if functions.empty:
+        print("Не найдено ни одной строки с функцией.")
+        sys.exit(1)
+
+    functions = pf.consolidate_functions(pf.infer_hierarchy(functions, mode=mode))
+    try:
+        pf.export_to_excel(functions, fi, out)
+    except ValueError as e:
+        print("Ошибка:", e)
+        sys.exit(1)
+
+    try:
+        catalog.record_import(
+            functions[["Func_LCN", "Parent_LCN", "Name", "Description"]].itertuples(index=False),
+            "functions", fi, [path],
+        )
+    except Exception as e:
+        print(f"Каталог не обновлён: {e}")
+    return {"functions": len(functions)}
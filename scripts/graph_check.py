@@ -0,0 +1,134 @@
+# graph_check.py
+"""
+Проверка дерева "элемент -> родитель" перед генерацией XML.
+
+За один линейный проход по ссылкам на родителя находит:
+  - циклы (A -> B -> A) и самоссылки (A -> A);
+  - сирот (родитель указан, но такого элемента нет);
+  - элементы, висящие под циклом (из корней до них не дойти);
+  - распределение глубин.
+
+Используется и для структуры изделия (Item_ID / Parent_ID),
+и для функций (Func_LCN / Parent_LCN).
+"""
+from typing import Dict, List
+
+_IN_PROGRESS = -1
+_UNREACHABLE = -2
+
+
+def check_graph(parents: Dict[str, str]) -> Dict:
+    """
+    parents: {id: parent_id}, пустой parent_id — корень.
+
+    Возвращает словарь:
+      roots         – корни (пустой родитель);
+      orphans       – элементы с несуществующим родителем (считаются корнями);
+      self_parents  – элементы, ссылающиеся сами на себя;
+      cycles        – циклы длиной >= 2, каждый списком id по ссылкам на родителя;
+      unreachable   – элементы, до которых не дойти из корней из-за цикла выше;
+      depth_counts  – {глубина: количество}, корень имеет глубину 1;
+      max_depth     – максимальная глубина.
+    """
+    depth: Dict[str, int] = {}
+    depth_counts: Dict[int, int] = {}
+
+    roots: List[str] = []
+    orphans: List[str] = []
+    self_parents: List[str] = []
+    cycles: List[List[str]] = []
+    unreachable: List[str] = []
+
+    for start in parents:
+        if start in depth:
+            continue
+
+        # Поднимаемся по родителям, пока не упрёмся в известный узел,
+        # корень, сироту или в узел текущего пути (цикл)
+        path: List[str] = []
+        pos: Dict[str, int] = {}
+        node = start
+        while True:
+            d = depth.get(node)
+            if d is not None:
+                if d == _IN_PROGRESS:
+                    i = pos[node]
+                    loop = path[i:]
+                    for n in loop:
+                        depth[n] = _UNREACHABLE
+                    if len(loop) == 1:
+                        self_parents.append(loop[0])
+                    else:
+                        cycles.append(loop)
+                    del path[i:]
+                    d = _UNREACHABLE
+                break
+
+            depth[node] = _IN_PROGRESS
+            pos[node] = len(path)
+            path.append(node)
+
+            parent = parents[node]
+            if not parent:
+                roots.append(node)
+                d = 0
+                break
+            if parent not in parents:
+                orphans.append(node)
+                d = 0
+                break
+            node = parent
+
+        # Раскручиваем путь обратно, проставляя глубины
+        for n in reversed(path):
+            if d == _UNREACHABLE:
+                depth[n] = _UNREACHABLE
+                unreachable.append(n)
+            else:
+                d += 1
+                depth[n] = d
+                depth_counts[d] = depth_counts.get(d, 0) + 1
+
+    return {
+        "roots": roots,
+        "orphans": orphans,
+        "self_parents": self_parents,
+        "cycles": cycles,
+        "unreachable": unreachable,
+        "depth_counts": dict(sorted(depth_counts.items())),
+        "max_depth": max(depth_counts) if depth_counts else 0,
+    }
+
+
+def has_errors(report: Dict) -> bool:
+    """Есть ли в отчёте циклы или самоссылки."""
+    return bool(report["cycles"] or report["self_parents"])
+
+
+def print_graph_report(report: Dict, limit: int = 20) -> None:
+    """Печатает сводку проверки; длинные списки обрезаются до limit."""
+
+    def preview(values) -> str:
+        shown = ", ".join(str(v) for v in values[:limit])
+        if len(values) > limit:
+            shown += f", ... (ещё {len(values) - limit})"
+        return shown
+
+    for item_id in report["self_parents"][:limit]:
+        print(f"Предупреждение: элемент '{item_id}' указан родителем самого себя.")
+    for loop in report["cycles"][:limit]:
+        chain = " -> ".join(loop + [loop[0]])
+        print(f"Предупреждение: цикл в иерархии: {chain}")
+    if report["unreachable"]:
+        print(
+            "Предупреждение: элементы под циклом "
+            f"({len(report['unreachable'])}): {preview(report['unreachable'])}"
+        )
+    if report["orphans"]:
+        print(
+            "Предупреждение: элементы с несуществующим родителем "
+            f"({len(report['orphans'])}): {preview(report['orphans'])}"
+        )
+
+    levels = ", ".join(f"{d}: {n}" for d, n in report["depth_counts"].items())
+    print(f"Глубина дерева  : {report['max_depth']} (по уровням — {levels})")
@@ -0,0 +1,461 @@
+# gui_runner.py
+"""
+Общая часть окон импорта (functions/GUI.py и structure/GUI.py):
+
+  - лог: текст копится и переносится в виджет пачками (flush_log);
+  - очередь сообщений из рабочего потока в окно (ui_queue, poll_ui_queue);
+  - запуск шагов импорта в резидентном worker.py или отдельным процессом
+    (run_stage) и их отмена (cancel);
+  - полоса прогресса со строкой "стадия · % · скорость · ETA".
+  - запись времени запуска окна в startup.log (record_startup_time).
+
+Окно одно на процесс, поэтому состояние хранится на уровне модуля.
+Порядок подключения:
+
+    gui_runner.configure(SCRIPT_DIR, STAGE_TITLES)       # при импорте GUI
+    gui_runner.attach(app, log_box, progress_bar, progress_label,
+                      {"finished": on_finished, ...})     # после создания лога
+
+Tk трогается только из главного потока: рабочие потоки пишут в ui_queue
+("log", текст, жирный) / ("progress", событие) / ("error"|"warning"|"info",
+заголовок, текст) / ("finished",) и свои сообщения, обработчики которых
+передаются в attach.
+"""
+import json
+import os
+import queue
+import shutil
+import subprocess
+import tempfile
+import threading
+import time
+import tkinter.filedialog as filedialog
+import tkinter.messagebox as messagebox
+from collections import deque
+from datetime import datetime
+
+from progress import parse_event
+
+# Папка раздела, в которой выполняются шаги (functions или structure)
+SCRIPT_DIR = os.getcwd()
+
+STAGE_TITLES: dict = {}
+
+_app = None
+_log_box = None
+_progress_bar = None
+_progress_label = None
+_handlers: dict = {}
+
+
+def configure(script_dir: str, stage_titles: dict) -> None:
+    """Папка скриптов раздела и подписи стадий прогресса."""
+    global SCRIPT_DIR, STAGE_TITLES
+    SCRIPT_DIR = script_dir
+    STAGE_TITLES = stage_titles
+
+
+def attach(app, log_box, progress_bar, progress_label, handlers: dict) -> None:
+    """
+    Виджеты лога и прогресса; запускает перенос лога и разбор ui_queue.
+    handlers — {вид сообщения: функция(*остальные поля)} для сообщений окна
+    ("finished", "preview", ...).
+    """
+    global _app, _log_box, _progress_bar, _progress_label, _handlers
+    _app, _log_box = app, log_box
+    _progress_bar, _progress_label = progress_bar, progress_label
+    _handlers = handlers
+
+    app.after(UI_POLL_MS, poll_ui_queue)
+    app.after(LOG_FLUSH_MS, flush_log)
+
+
+# ===== Лог =====
+
+# Текст не пишется в виджет сразу: он копится и сбрасывается пачкой
+# не чаще LOG_FLUSH_MS. В окне хранится не больше LOG_MAX_LINES строк,
+# полный лог пишется во временный файл (удаляется при закрытии окна) и
+# копируется кнопкой "Сохранить лог...", в памяти он не копится.
+LOG_FLUSH_MS = 100
+LOG_MAX_LINES = 5000
+
+_log_pending: "deque[tuple[str, bool]]" = deque(maxlen=LOG_MAX_LINES)
+_log_file = None
+
+
+def _log_spool():
+    global _log_file
+    if _log_file is None:
+        _log_file = tempfile.TemporaryFile("w+", encoding="utf-8", newline="")
+    return _log_file
+
+
+def log_box_insert(text: str, bold: bool = False):
+    _log_pending.append((text, bold))
+    _log_spool().write(text)
+
+
+def flush_log():
+    """Переносит накопленный текст в виджет одной операцией на каждый стиль."""
+    if _log_pending:
+        chunks = []
+        for text, bold in _log_pending:
+            if chunks and chunks[-1][1] == bold:
+                chunks[-1][0].append(text)
+            else:
+                chunks.append(([text], bold))
+        _log_pending.clear()
+
+        _log_box.configure(state="normal")
+        for parts, bold in chunks:
+            _log_box.insert("end", "".join(parts), ("bold",) if bold else ())
+
+        # кольцевой буфер: старые строки уходят из окна
+        lines = int(_log_box.index("end-1c").split(".")[0])
+        if lines > LOG_MAX_LINES:
+            _log_box.delete("1.0", f"{lines - LOG_MAX_LINES + 1}.0")
+
+        _log_box.see("end")
+        _log_box.configure(state="disabled")
+
+    _app.after(LOG_FLUSH_MS, flush_log)
+
+
+def clear_log():
+    _log_pending.clear()
+    spool = _log_spool()
+    spool.seek(0)
+    spool.truncate()
+    _log_box.configure(state="normal")
+    _log_box.delete("1.0", "end")
+    _log_box.configure(state="disabled")
+
+
+def save_log():
+    path = filedialog.asksaveasfilename(
+        title="Сохранение лога",
+        defaultextension=".txt",
+        filetypes=[("Текстовые файлы", "*.txt"), ("Все файлы", "*.*")],
+    )
+    if not path:
+        return
+    spool = _log_spool()
+    try:
+        spool.seek(0)
+        with open(path, "w", encoding="utf-8") as f:
+            shutil.copyfileobj(spool, f)
+    except OSError as e:
+        messagebox.showerror("Ошибка", f"Не удалось сохранить лог:\n{e}")
+    finally:
+        spool.seek(0, os.SEEK_END)
+
+
+# ===== Фоновый запуск шагов импорта =====
+
+ui_queue: "queue.Queue[tuple]" = queue.Queue()
+cancel_event = threading.Event()
+_current_proc = None
+
+UI_POLL_MS = 50
+
+
+def log(text: str, bold: bool = False):
+    """Строка в лог из рабочего потока."""
+    ui_queue.put(("log", text, bold))
+
+
+def _child_env() -> dict:
+    # без буферизации, иначе вывод придёт одним куском в конце
+    return dict(os.environ, PYTHONUNBUFFERED="1", PYTHONIOENCODING="utf-8")
+
+
+def _forward_output(line: str):
+    event = parse_event(line)
+    if event is not None:
+        ui_queue.put(("progress", event))
+    else:
+        log(line)
+
+
+def start_background(target, *args):
+    """Сбрасывает отмену и прогресс и запускает target(*args) в рабочем потоке."""
+    reset_progress()
+    cancel_event.clear()
+    threading.Thread(target=target, args=args, daemon=True).start()
+
+
+def poll_ui_queue():
+    """Забирает сообщения рабочего потока и отображает их в окне."""
+    try:
+        while True:
+            msg = ui_queue.get_nowait()
+            kind = msg[0]
+            if kind == "log":
+                log_box_insert(msg[1], bold=msg[2])
+            elif kind == "progress":
+                show_progress(msg[1])
+            elif kind == "error":
+                messagebox.showerror(msg[1], msg[2])
+            elif kind == "warning":
+                messagebox.showwarning(msg[1], msg[2])
+            elif kind == "info":
+                messagebox.showinfo(msg[1], msg[2])
+            elif kind in _handlers:
+                _handlers[kind](*msg[1:])
+    except queue.Empty:
+        pass
+    _app.after(UI_POLL_MS, poll_ui_queue)
+
+
+def cancel():
+    """
+    Останавливает текущий шаг; следующий шаг не запускается.
+    Если шаг шёл в worker.py, тот завершается и перезапустится при следующем импорте.
+    """
+    cancel_event.set()
+    proc = _current_proc
+    if proc is not None and proc.poll() is None:
+        proc.terminate()
+
+
+# ===== Резидентный worker.py =====
+
+# Запускается один раз и держит pandas/fitz/docx загруженными,
+# поэтому повторные импорты в сессии стартуют сразу.
+WORKER_SCRIPT = os.path.join(os.path.abspath(os.path.dirname(__file__)), "worker.py")
+WORKER_DONE_PREFIX = "@@done "
+WORKER_RESULT_PREFIX = "@@result "
+
+_worker_proc = None
+_worker_lock = threading.Lock()
+
+# Задания идут в worker.py по одному: окно отдаёт их из разных потоков
+# (шаги импорта, подбор фильтров), и вывод двух заданий не должен смешиваться
+_worker_jobs = threading.Lock()
+
+
+def start_worker():
+    """Запускает worker.py, если он ещё не запущен (или упал/был остановлен)."""
+    global _worker_proc
+    with _worker_lock:
+        if _worker_proc is not None and _worker_proc.poll() is None:
+            return _worker_proc
+        if not os.path.isfile(WORKER_SCRIPT):
+            return None
+        try:
+            _worker_proc = subprocess.Popen(
+                ["python", WORKER_SCRIPT, SCRIPT_DIR],
+                stdin=subprocess.PIPE,
+                stdout=subprocess.PIPE,
+                stderr=subprocess.STDOUT,
+                text=True,
+                encoding="utf-8",
+                errors="replace",
+                bufsize=1,
+                cwd=SCRIPT_DIR,
+                env=_child_env(),
+                creationflags=getattr(subprocess, "CREATE_NO_WINDOW", 0),
+            )
+        except Exception as e:
+            print("Не удалось запустить worker.py:", e)
+            _worker_proc = None
+        return _worker_proc
+
+
+def stop_worker():
+    proc = _worker_proc
+    if proc is not None and proc.poll() is None:
+        proc.terminate()
+
+
+def _send_job(proc, job: dict, forward: bool = True):
+    """
+    Отдаёт задание резидентному процессу и читает вывод до строки @@done;
+    forward=False — вывод в лог не идёт. Возвращает (код выхода, результат
+    задания "call" из строки @@result или None).
+    """
+    proc.stdin.write(json.dumps(job, ensure_ascii=False) + "\n")
+    proc.stdin.flush()
+
+    result = None
+    for line in proc.stdout:
+        head, sep, tail = line.partition(WORKER_RESULT_PREFIX)
+        if sep:
+            result = json.loads(tail)
+            line = head and head + "\n"
+        head, sep, tail = line.partition(WORKER_DONE_PREFIX)
+        if sep:
+            if head and forward:
+                _forward_output(head + "\n")
+            return int(tail.strip() or 1), result
+        if line and forward:
+            _forward_output(line)
+
+    # worker завершился, не дописав задание (упал или остановлен отменой);
+    # дожидаемся его, чтобы следующий шаг запустил новый
+    proc.wait()
+    return 1, None
+
+
+def _run_stage_in_subprocess(cmd) -> int:
+    global _current_proc
+
+    proc = subprocess.Popen(
+        cmd,
+        stdout=subprocess.PIPE,
+        stderr=subprocess.STDOUT,
+        text=True,
+        encoding="utf-8",
+        errors="replace",
+        cwd=SCRIPT_DIR,
+        env=_child_env(),
+    )
+    _current_proc = proc
+    if cancel_event.is_set():
+        # отмену нажали, пока процесс запускался: cancel() его ещё не видел
+        proc.terminate()
+    for line in proc.stdout:
+        _forward_output(line)
+    return proc.wait()
+
+
+def _run_stage(job: dict, fallback) -> int | None:
+    """Задание шага в worker.py (или fallback(), если его нет) с поддержкой отмены."""
+    global _current_proc
+
+    if cancel_event.is_set():
+        return None
+
+    with _worker_jobs:
+        proc = start_worker()
+        try:
+            if proc is not None:
+                _current_proc = proc
+                # отмену нажали, пока запускался worker.py: задание не отдаём
+                if cancel_event.is_set():
+                    return None
+                returncode, _ = _send_job(proc, job)
+            else:
+                returncode = fallback()
+        finally:
+            _current_proc = None
+
+    if cancel_event.is_set():
+        return None
+    return returncode
+
+
+def run_stage(cmd) -> int | None:
+    """
+    Выполняет один шаг (cmd = ["python", script, args...]) и построчно
+    отправляет его вывод в лог. Шаг идёт в резидентном worker.py, а если
+    его нет — отдельным процессом. Возвращает код завершения или None,
+    если шаг отменён.
+    """
+    return _run_stage({"script": cmd[1], "args": cmd[2:]}, lambda: _run_stage_in_subprocess(cmd))
+
+
+def _no_worker() -> int:
+    log("worker.py не запущен.\n")
+    return 1
+
+
+def run_call_stage(name: str, **kwargs) -> int | None:
+    """
+    Шаг импорта — вызов функции name ("модуль.функция") в worker.py, как
+    run_stage: вывод идёт в лог, шаг отменяется cancel(). Без worker.py — код 1.
+    """
+    return _run_stage({"call": name, "kwargs": kwargs}, _no_worker)
+
+
+def call_worker(name: str, **kwargs):
+    """
+    Вызывает функцию name в worker.py без вывода в лог (например, сводку
+    подбора фильтров) и возвращает её результат; None — worker.py недоступен
+    или функция завершилась ошибкой. Ждёт, пока worker.py занят другим заданием.
+    """
+    with _worker_jobs:
+        proc = start_worker()
+        if proc is None:
+            return None
+        returncode, result = _send_job(proc, {"call": name, "kwargs": kwargs}, forward=False)
+    return result if returncode == 0 else None
+
+
+# ===== Прогресс =====
+
+_progress_stage = None
+_progress_started = 0.0
+
+
+def _format_eta(seconds: float) -> str:
+    minutes, seconds = divmod(int(seconds), 60)
+    return f"{minutes:02d}:{seconds:02d}"
+
+
+def reset_progress():
+    global _progress_stage
+    _progress_stage = None
+    _progress_bar.set(0)
+    _progress_label.configure(text="")
+
+
+def show_progress(event: dict):
+    """Событие парсера -> полоса прогресса и строка "стадия · % · скорость · ETA"."""
+    global _progress_stage, _progress_started
+
+    now = time.monotonic()
+    stage = event.get("stage", "")
+    if stage != _progress_stage:
+        _progress_stage = stage
+        _progress_started = now
+
+    done = event.get("done", 0)
+    total = event.get("total", 0)
+    unit = event.get("unit", "")
+
+    parts = [STAGE_TITLES.get(stage, stage)]
+    if total:
+        fraction = min(done / total, 1.0)
+        _progress_bar.set(fraction)
+        parts.append(f"{fraction:.0%}")
+
+    elapsed = now - _progress_started
+    if done and elapsed > 0:
+        rate = done / elapsed
+        if unit:
+            parts.append(f"{rate:,.0f} {unit}/с".replace(",", " "))
+        if total and done < total:
+            parts.append(f"осталось ~{_format_eta((total - done) / rate)}")
+
+    if "kept" in event:
+        parts.append(f"найдено: {event['kept']}")
+    if "rows" in event:
+        parts.append(f"строк: {event['rows']}")
+
+    _progress_label.configure(text=" · ".join(parts))
+
+
+# ===== Время запуска окна =====
+
+# Сколько последних запусков хранится в startup.log
+STARTUP_LOG_MAX_LINES = 100
+
+
+def record_startup_time(path: str, window_ms: float, ready_ms: float):
+    """Печатает время запуска окна и дописывает его в path, отрезая старые строки."""
+    line = (
+        f"{datetime.now():%Y-%m-%d %H:%M:%S}  "
+        f"окно: {window_ms:.0f} мс  полностью: {ready_ms:.0f} мс\n"
+    )
+    print("Запуск GUI —", line.split("  ", 1)[1].strip())
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            lines = f.readlines()[-(STARTUP_LOG_MAX_LINES - 1):]
+    except (OSError, UnicodeDecodeError):
+        lines = []
+    try:
+        with open(path, "w", encoding="utf-8") as f:
+            f.writelines(lines + [line])
+    except OSError:
+        pass
@@ -0,0 +1,59 @@
+# progress.py
+"""
+Машиночитаемые события прогресса для GUI.
+
+Парсер, запущенный с --progress, печатает в stdout отдельные строки вида
+
+    @@progress {"stage": "read", "done": 12, "total": 340, "unit": "стр"}
+
+GUI распознаёт их по префиксу, показывает полосу прогресса и не пишет в лог.
+Без --progress emit() сразу возвращается, поэтому вызовы в горячих циклах
+почти ничего не стоят; при включённом режиме события прореживаются по времени.
+"""
+import json
+import sys
+import time
+
+PROGRESS_PREFIX = "@@progress "
+
+# Не чаще одного события за интервал (секунды), кроме принудительных
+MIN_INTERVAL = 0.2
+
+enabled = False
+_last_emit = 0.0
+
+
+def enable() -> None:
+    global enabled
+    enabled = True
+
+
+def emit(stage: str, done: int = 0, total: int = 0, unit: str = "",
+         force: bool = False, **extra) -> None:
+    """
+    Событие стадии stage: обработано done из total (total = 0 — неизвестно).
+    force=True — отправить независимо от прореживания (смена стадии, итог).
+    """
+    global _last_emit
+    if not enabled:
+        return
+
+    now = time.monotonic()
+    if not force and now - _last_emit < MIN_INTERVAL:
+        return
+    _last_emit = now
+
+    event = {"stage": stage, "done": done, "total": total, "unit": unit}
+    event.update(extra)
+    sys.stdout.write(PROGRESS_PREFIX + json.dumps(event, ensure_ascii=False) + "\n")
+    sys.stdout.flush()
+
+
+def parse_event(line: str):
+    """Строка вывода -> словарь события или None, если это обычный текст."""
+    if not line.startswith(PROGRESS_PREFIX):
+        return None
+    try:
+        return json.loads(line[len(PROGRESS_PREFIX):])
+    except ValueError:
+        return None
@@ -1,18 +1,26 @@
 # GUI.py  (для "Структура изделия")
+import time
+
+_STARTUP_T0 = time.perf_counter()  # замер времени запуска окна
+
 import os
 import socket
-import subprocess
+import sys
+import threading
 import tkinter as tk
 import tkinter.filedialog as filedialog
 import tkinter.messagebox as messagebox
 
 import customtkinter as ctk
 
-# Попробуем подключить Pillow для логотипа
 try:
-    from PIL import Image
+    import gui_runner
 except ImportError:
-    Image = None
+    # запуск из папки раздела: общие модули лежат уровнем выше (scripts/)
+    sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+    import gui_runner
+
+from tree_preview import open_hierarchy_preview
 
 # ===== Пути =====
 SCRIPT_DIR = os.path.abspath(os.path.dirname(__file__))      # ...\Структура изделия\Служебные файлы
@@ -30,6 +38,15 @@ RESULT_XML_DIR = os.path.join(BASE_DIR, "Результаты_XML")
 os.makedirs(RESULT_EXCEL_DIR, exist_ok=True)
 os.makedirs(RESULT_XML_DIR, exist_ok=True)
 
+# Подписи стадий прогресса
+STAGE_TITLES = {
+    "read": "Чтение файла",
+    "build": "Сборка структуры",
+    "export": "Запись Excel",
+}
+
+gui_runner.configure(SCRIPT_DIR, STAGE_TITLES)
+
 _single_instance_socket = None
 
 
@@ -47,23 +64,73 @@ def ensure_single_instance():
         raise SystemExit
 
 
-def log_box_insert(text: str, bold: bool = False):
-    log_box.configure(state="normal")
-    if bold:
-        log_box.insert("end", text, ("bold",))
-    else:
-        log_box.insert("end", text)
-    log_box.see("end")
-    log_box.configure(state="disabled")
+# ===== Фоновый запуск шагов импорта =====
+
+# Лог, очередь сообщений, запуск шагов в worker.py и прогресс — в gui_runner.py
+# (общий для разделов, лежит уровнем выше — в scripts/).
+
+def _import_worker(cmd_parse, cmd_xml, out_excel):
+    try:
+        try:
+            returncode = gui_runner.run_stage(cmd_parse)
+        except Exception as e:
+            gui_runner.ui_queue.put(("error", "Ошибка", f"Не удалось запустить Python:\n{e}"))
+            return
+
+        if returncode is None:
+            gui_runner.log("\nИмпорт отменён пользователем.\n", bold=True)
+            return
+
+        if returncode != 0:
+            gui_runner.ui_queue.put((
+                "error",
+                "Ошибка",
+                "parse_structure.py завершился с ошибкой.\nСм. лог выше.",
+            ))
+            return
+
+        if not os.path.isfile(out_excel):
+            gui_runner.ui_queue.put(("error", "Ошибка", "Файл Structure.xlsx не создан. См. лог выше."))
+            return
+
+        # ---------- Шаг 2: конвертация Structure.xlsx в XML ----------
+        gui_runner.log("\nШаг 2. Конвертация Structure.xlsx в XML\n", bold=True)
+        gui_runner.log("> " + " ".join(cmd_xml) + "\n\n")
+
+        try:
+            returncode = gui_runner.run_stage(cmd_xml)
+        except Exception as e:
+            gui_runner.ui_queue.put(("error", "Ошибка", f"Не удалось запустить Python:\n{e}"))
+            return
+
+        if returncode is None:
+            gui_runner.log("\nИмпорт отменён пользователем.\n", bold=True)
+            return
+
+        xml_path = os.path.join(RESULT_XML_DIR, "structure_output.xml")
+        delta_file = os.path.join(RESULT_XML_DIR, "structure_output.delta.xml")
+        if returncode == 0 and os.path.isfile(xml_path):
+            message = f"Создан файл:\n{xml_path}"
+            if os.path.isfile(delta_file):
+                message += f"\n\nИзменения относительно прошлой выгрузки:\n{delta_file}"
+            gui_runner.ui_queue.put(("info", "Готово", message))
+        else:
+            gui_runner.ui_queue.put(("warning", "Предупреждение", "XML не найден. Проверьте лог."))
+    finally:
+        gui_runner.ui_queue.put(("finished",))
+
+
+def on_close():
+    gui_runner.cancel()
+    gui_runner.stop_worker()
+    app.destroy()
 
 
 def run_import():
     file_path = file_var.get().strip()
 
     # очистка лога
-    log_box.configure(state="normal")
-    log_box.delete("1.0", "end")
-    log_box.configure(state="disabled")
+    gui_runner.clear_log()
 
     if not file_path:
         messagebox.showerror("Ошибка", "Не указан файл структуры.")
@@ -98,73 +165,27 @@ def run_import():
         file_path,
         "--out",
         out_excel,
+        "--progress",
     ]
 
-    log_box_insert("Шаг 1. Анализ файла и создание Structure.xlsx\n", bold=True)
-    log_box_insert(f"Файл структуры: {file_path}\n")
-    log_box_insert(f"Выходной Excel: {out_excel}\n")
-    log_box_insert("\n> " + " ".join(cmd_parse) + "\n\n")
-
-    btn_run.configure(state="disabled")
-    try:
-        result = subprocess.run(
-            cmd_parse,
-            capture_output=True,
-            text=True,
-            cwd=SCRIPT_DIR,
-        )
-    except Exception as e:
-        messagebox.showerror("Ошибка", f"Не удалось запустить Python:\n{e}")
-        btn_run.configure(state="normal")
-        return
-    finally:
-        btn_run.configure(state="normal")
-
-    if result.stdout:
-        log_box_insert(result.stdout + "\n")
-    if result.stderr:
-        log_box_insert("STDERR:\n" + result.stderr + "\n")
-
-    if result.returncode != 0:
-        messagebox.showerror(
-            "Ошибка",
-            "parse_structure.py завершился с ошибкой.\nСм. лог выше.",
-        )
-        return
+    gui_runner.log_box_insert("Шаг 1. Анализ файла и создание Structure.xlsx\n", bold=True)
+    gui_runner.log_box_insert(f"Файл структуры: {file_path}\n")
+    gui_runner.log_box_insert(f"Выходной Excel: {out_excel}\n")
+    gui_runner.log_box_insert("\n> " + " ".join(cmd_parse) + "\n\n")
 
-    if not os.path.isfile(out_excel):
-        messagebox.showerror(
-            "Ошибка",
-            "Файл Structure.xlsx не создан. См. лог выше.",
-        )
-        return
-
-    # ---------- Шаг 2: конвертация Structure.xlsx в XML ----------
+    # ---------- Шаг 2 (в фоне, после успешного шага 1) ----------
     cmd_xml = ["python", xml_script]
+    if full_xml_var.get():
+        cmd_xml.append("--full")
 
-    log_box_insert("\nШаг 2. Конвертация Structure.xlsx в XML\n", bold=True)
-    log_box_insert("> " + " ".join(cmd_xml) + "\n\n")
-
-    result2 = subprocess.run(
-        cmd_xml,
-        capture_output=True,
-        text=True,
-        cwd=SCRIPT_DIR,
-    )
+    btn_run.configure(state="disabled")
+    btn_cancel.configure(state="normal")
+    gui_runner.start_background(_import_worker, cmd_parse, cmd_xml, out_excel)
 
-    if result2.stdout:
-        log_box_insert(result2.stdout + "\n")
-    if result2.stderr:
-        log_box_insert("STDERR:\n" + result2.stderr + "\n")
 
-    xml_path = os.path.join(RESULT_XML_DIR, "structure_output.xml")
-    if os.path.isfile(xml_path):
-        messagebox.showinfo("Готово", f"Создан файл:\n{xml_path}")
-    else:
-        messagebox.showwarning(
-            "Предупреждение",
-            "XML не найден. Проверьте лог.",
-        )
+def on_finished():
+    btn_run.configure(state="normal")
+    btn_cancel.configure(state="disabled")
 
 
 def choose_file():
@@ -183,6 +204,172 @@ def choose_file():
         file_var.set(path)
 
 
+# ===== Просмотр иерархии =====
+
+def open_preview():
+    """Читает Structure.xlsx в фоне и открывает дерево без запуска Excel."""
+    out_excel = os.path.join(RESULT_EXCEL_DIR, "Structure.xlsx")
+    if not os.path.isfile(out_excel):
+        messagebox.showwarning(
+            "Предупреждение",
+            "Файл Structure.xlsx ещё не создан. Сначала запустите импорт.",
+        )
+        return
+
+    btn_preview.configure(state="disabled")
+    progress_label.configure(text="Загрузка иерархии...")
+    threading.Thread(target=_load_preview_data, args=(out_excel,), daemon=True).start()
+
+
+def _load_preview_data(out_excel):
+    try:
+        # тяжёлые модули нужны только здесь — грузим по требованию
+        import excel_to_xml_structure as conv
+        from excel_reader import read_sheet
+
+        df = read_sheet(out_excel, conv.SHEET_NAME)
+        items, order = conv.validate_and_build_items(df)
+        roots, children = conv.build_children_map(items, order)
+        labels = {item_id: f"{item_id}  {item['name']}" for item_id, item in items.items()}
+    except Exception as e:
+        gui_runner.ui_queue.put(("error", "Ошибка", f"Не удалось загрузить иерархию:\n{e}"))
+        gui_runner.ui_queue.put(("preview", None))
+        return
+
+    gui_runner.ui_queue.put(("preview", (roots, children, labels)))
+
+
+def show_preview(data):
+    btn_preview.configure(state="normal")
+    progress_label.configure(text="")
+    if data is not None:
+        roots, children, labels = data
+        open_hierarchy_preview(app, "Структура изделия", roots, children, labels)
+
+
+# ===== Отложенная загрузка =====
+
+# Сначала показываем окно с формой, а лог, иконку и логотип (вместе с Pillow)
+# создаём уже после первой отрисовки. Время запуска пишется в STARTUP_LOG
+# (последние gui_runner.STARTUP_LOG_MAX_LINES запусков).
+STARTUP_LOG = os.path.join(SCRIPT_DIR, "startup.log")
+
+
+def build_log_panel():
+    global log_frame, log_header, label_log, btn_save_log, btn_preview
+    global progress_label, progress_bar, log_box
+
+    log_frame = ctk.CTkFrame(app, corner_radius=10, fg_color=PANEL_BG)
+    log_frame.grid(row=2, column=0, padx=10, pady=(0, 10), sticky="nsew")
+
+    log_header = ctk.CTkFrame(log_frame, fg_color="transparent")
+    log_header.pack(fill="x", padx=10, pady=(10, 0))
+
+    label_log = ctk.CTkLabel(
+        log_header,
+        text="Результат импорта структуры",
+        font=("Segoe UI", 13, "bold"),
+        text_color="white",
+    )
+    label_log.pack(side="left")
+
+    btn_save_log = ctk.CTkButton(
+        log_header,
+        text="Сохранить лог...",
+        width=140,
+        command=gui_runner.save_log,
+        fg_color=BUTTON_MAIN,
+        hover_color=BUTTON_MAIN_HOVER,
+        font=SMALL_FONT,
+    )
+    btn_save_log.pack(side="right")
+
+    btn_preview = ctk.CTkButton(
+        log_header,
+        text="Просмотр иерархии...",
+        width=170,
+        command=open_preview,
+        fg_color=BUTTON_MAIN,
+        hover_color=BUTTON_MAIN_HOVER,
+        font=SMALL_FONT,
+    )
+    btn_preview.pack(side="right", padx=(0, 10))
+
+    progress_label = ctk.CTkLabel(
+        log_frame,
+        text="",
+        font=SMALL_FONT,
+        text_color="white",
+    )
+    progress_label.pack(anchor="w", padx=10, pady=(2, 0))
+
+    progress_bar = ctk.CTkProgressBar(log_frame, progress_color=BUTTON_MAIN)
+    progress_bar.pack(fill="x", padx=10, pady=(2, 0))
+    progress_bar.set(0)
+
+    log_box = ctk.CTkTextbox(
+        log_frame,
+        wrap="word",
+        fg_color=LOG_BG,
+        text_color="black",
+        font=("Consolas", 12),
+    )
+    log_box.pack(fill="both", expand=True, padx=10, pady=(5, 10))
+    log_box.tag_config("bold")
+    log_box.configure(state="disabled")
+
+
+def load_assets():
+    """Иконка окна и логотип; Pillow импортируется только здесь."""
+    global _app_icon, logo_image, logo_label
+
+    try:
+        if os.path.isfile(LOGO_ICO):
+            app.iconbitmap(LOGO_ICO)
+        elif os.path.isfile(LOGO_PNG):
+            _app_icon = tk.PhotoImage(file=LOGO_PNG)
+            app.iconphoto(False, _app_icon)
+    except Exception as e:
+        print("Не удалось установить иконку окна:", e)
+
+    if os.path.isfile(LOGO_PNG):
+        try:
+            from PIL import Image
+
+            logo_image = ctk.CTkImage(Image.open(LOGO_PNG), size=(90, 90))
+            logo_label = ctk.CTkLabel(
+                top_frame,
+                image=logo_image,
+                text="",
+                fg_color="transparent",
+            )
+            logo_label.grid(
+                row=1,
+                column=2,
+                padx=(10, 20),
+                pady=(10, 0),
+                sticky="n",
+            )
+        except Exception as e:
+            print("Не удалось загрузить логотип (структура):", e)
+
+
+def finish_startup():
+    window_ms = (time.perf_counter() - _STARTUP_T0) * 1000
+
+    build_log_panel()
+    load_assets()
+
+    gui_runner.attach(app, log_box, progress_bar, progress_label, {
+        "preview": show_preview,
+        "finished": on_finished,
+    })
+    app.after(100, gui_runner.start_worker)
+
+    ready_ms = (time.perf_counter() - _STARTUP_T0) * 1000
+    gui_runner.record_startup_time(STARTUP_LOG, window_ms, ready_ms)
+
+
 # ================ GUI =====================
 
 ctk.set_appearance_mode("light")
@@ -207,46 +394,17 @@ app.geometry("950x700")
 app.minsize(850, 550)
 app.configure(fg_color=APP_BG)
 
-# иконка окна
-try:
-    if os.path.isfile(LOGO_ICO):
-        app.iconbitmap(LOGO_ICO)
-    elif os.path.isfile(LOGO_PNG):
-        _app_icon = tk.PhotoImage(file=LOGO_PNG)
-        app.iconphoto(False, _app_icon)
-except Exception as e:
-    print("Не удалось установить иконку окна:", e)
-
 app.grid_rowconfigure(2, weight=2)
 app.grid_columnconfigure(0, weight=1)
 
 file_var = ctk.StringVar()
+full_xml_var = ctk.BooleanVar(value=False)
 
 top_frame = ctk.CTkFrame(app, corner_radius=10, fg_color=PANEL_BG)
 top_frame.grid(row=0, column=0, padx=10, pady=10, sticky="nsew")
 top_frame.grid_columnconfigure(1, weight=1)
 top_frame.grid_columnconfigure(2, weight=0)
 
-# логотип под кнопкой "Обзор..."
-if Image is not None and os.path.isfile(LOGO_PNG):
-    try:
-        logo_image = ctk.CTkImage(Image.open(LOGO_PNG), size=(90, 90))
-        logo_label = ctk.CTkLabel(
-            top_frame,
-            image=logo_image,
-            text="",
-            fg_color="transparent",
-        )
-        logo_label.grid(
-            row=1,
-            column=2,
-            padx=(10, 20),
-            pady=(10, 0),
-            sticky="n",
-        )
-    except Exception as e:
-        print("Не удалось загрузить логотип (структура):", e)
-
 ENTRY_KWARGS = dict(
     fg_color="white",
     text_color="black",
@@ -280,6 +438,17 @@ btn_browse = ctk.CTkButton(
 )
 btn_browse.grid(row=0, column=2, padx=10, pady=(8, 3), sticky="e")
 
+check_full_xml = ctk.CTkCheckBox(
+    top_frame,
+    text="Полный XML (без файла изменений относительно прошлой выгрузки)",
+    variable=full_xml_var,
+    font=DEFAULT_FONT,
+    text_color="white",
+    fg_color=BUTTON_MAIN,
+    hover_color=BUTTON_MAIN_HOVER,
+)
+check_full_xml.grid(row=1, column=1, padx=5, pady=3, sticky="w")
+
 btn_run = ctk.CTkButton(
     top_frame,
     text="▶ Запустить импорт",
@@ -289,30 +458,21 @@ btn_run = ctk.CTkButton(
     hover_color=BUTTON_MAIN_HOVER,
     font=("Segoe UI", 13, "bold"),
 )
-btn_run.grid(row=2, column=0, columnspan=3, padx=10, pady=(10, 8), sticky="we")
-
-# --- лог ---
-
-log_frame = ctk.CTkFrame(app, corner_radius=10, fg_color=PANEL_BG)
-log_frame.grid(row=2, column=0, padx=10, pady=(0, 10), sticky="nsew")
+btn_run.grid(row=2, column=0, columnspan=2, padx=(10, 5), pady=(10, 8), sticky="we")
 
-label_log = ctk.CTkLabel(
-    log_frame,
-    text="Результат импорта структуры",
+btn_cancel = ctk.CTkButton(
+    top_frame,
+    text="■ Отмена",
+    width=110,
+    height=38,
+    command=gui_runner.cancel,
+    fg_color=BUTTON_MAIN,
+    hover_color=BUTTON_MAIN_HOVER,
     font=("Segoe UI", 13, "bold"),
-    text_color="white",
-)
-label_log.pack(anchor="w", padx=10, pady=(10, 0))
-
-log_box = ctk.CTkTextbox(
-    log_frame,
-    wrap="word",
-    fg_color=LOG_BG,
-    text_color="black",
-    font=("Consolas", 12),
+    state="disabled",
 )
-log_box.pack(fill="both", expand=True, padx=10, pady=(5, 10))
-log_box.tag_config("bold")
-log_box.configure(state="disabled")
+btn_cancel.grid(row=2, column=2, padx=10, pady=(10, 8), sticky="e")
 
-app.mainloop()
\ No newline at end of file
+app.protocol("WM_DELETE_WINDOW", on_close)
+app.after(10, finish_startup)
+app.mainloop()
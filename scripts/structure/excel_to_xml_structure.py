@@ -1,8 +1,24 @@
+import argparse
 import sys
 import os
-import pandas as pd
+import zipfile
 import xml.etree.ElementTree as ET
-from datetime import datetime
+
+try:
+    from core import archive_old, normalize_cell, result_dirs
+except ImportError:
+    # запуск из папки раздела: общий core.py лежит уровнем выше (scripts/)
+    sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+    from core import archive_old, normalize_cell, result_dirs
+
+from core import (
+    delta_path, diff_snapshot, file_digest, fingerprint, load_snapshot, manifest_path,
+    output_is_current, preorder, save_snapshot, snapshot_path, workbook_digest, write_manifest,
+    write_xml,
+)
+from excel_reader import read_sheet
+from graph_check import check_graph, has_errors, print_graph_report
+from hierarchy import build_prefix_index, code_sort_key, resolve_parent
 
 # ---------------- БАЗОВЫЕ ПУТИ ----------------
 
@@ -13,47 +29,16 @@ SCRIPT_DIR = os.path.abspath(os.path.dirname(__file__))
 BASE_DIR = os.path.abspath(os.path.join(SCRIPT_DIR, ".."))
 
 # Папки с результатами
-EXCEL_DIR = os.path.join(BASE_DIR, "Результаты_EXCEL")
-XML_DIR = os.path.join(BASE_DIR, "Результаты_XML")
+EXCEL_DIR, XML_DIR = result_dirs(BASE_DIR)
 
 # Имена файлов
 INPUT_FILE = os.path.join(EXCEL_DIR, "Structure.xlsx")
 OUTPUT_FILE = os.path.join(XML_DIR, "structure_output.xml")
 SHEET_NAME = "Структура"
 
-
-# ---------------- СЛУЖЕБКА ----------------
-
-def archive_old(path: str):
-    """
-    Если файл path существует, переносит его в подкаталог 'Архив'
-    с добавлением штампа даты/времени к имени.
-    """
-    if not os.path.isfile(path):
-        return
-
-    folder = os.path.dirname(path)
-    archive_dir = os.path.join(folder, "Архив")
-    os.makedirs(archive_dir, exist_ok=True)
-
-    base = os.path.basename(path)
-    name, ext = os.path.splitext(base)
-
-    ts = datetime.now().strftime("%Y%m%d_%H%M%S")
-    new_name = f"{name}_{ts}{ext}"
-    new_path = os.path.join(archive_dir, new_name)
-
-    try:
-        os.replace(path, new_path)
-    except OSError as e:
-        # Просто пишем в консоль, чтобы не ронять весь процесс
-        print(f"Не удалось переместить старый файл '{path}': {e}")
-
-
-def normalize_cell(value):
-    if pd.isna(value):
-        return ""
-    return str(value).strip()
+# Версия конвертера в манифесте выгрузки: увеличить при изменении XML,
+# чтобы прошлые манифесты перестали совпадать и XML пересоздался
+CONVERTER_VERSION = "2"
 
 
 # ---------------- ЛОГИКА СТРУКТУРЫ ----------------
@@ -70,7 +55,9 @@ def validate_and_build_items(df):
           * если данные отличаются – объединяем, стараясь дополнить пустые поля,
             и выводим предупреждение.
       - Parent_ID, который ни на кого не указывает:
-          * вместо фатальной ошибки делаем элемент корневым и пишем предупреждение.
+          * родитель ищется по префиксу кода (hierarchy.resolve_parent);
+          * если и так не найден — элемент становится корневым, пишем предупреждение.
+      - Порядок обхода — естественный числовой порядок Item_ID.
     """
     required_columns = [
         "Item_ID",
@@ -161,20 +148,53 @@ def validate_and_build_items(df):
                 # parent_id, даже если отличается, не меняем, чтобы не порвать структуру
 
     # проверка, что все Parent_ID существуют
+    index = None
     for item in items.values():
         parent_id = item["parent_id"]
         if parent_id and parent_id not in items:
-            # вместо падения делаем элемент корневым
-            print(
-                f"Предупреждение: для элемента '{item['id']}' "
-                f"указан несуществующий Parent_ID '{parent_id}'. "
-                f"Элемент будет считаться корневым."
-            )
-            item["parent_id"] = ""
+            # пробуем найти родителя по префиксу кода (21.10.05 -> 21.10 -> 21.00)
+            if index is None:
+                index = build_prefix_index(order)
+            resolved = resolve_parent(item["id"], index)
+            if resolved:
+                print(
+                    f"Предупреждение: для элемента '{item['id']}' "
+                    f"указан несуществующий Parent_ID '{parent_id}'. "
+                    f"Родителем по коду назначен '{resolved}'."
+                )
+            else:
+                # вместо падения делаем элемент корневым
+                print(
+                    f"Предупреждение: для элемента '{item['id']}' "
+                    f"указан несуществующий Parent_ID '{parent_id}'. "
+                    f"Элемент будет считаться корневым."
+                )
+            item["parent_id"] = resolved
+
+    # естественный числовой порядок кодов: 21.00 < 100.10
+    sort_keys = {item_id: code_sort_key(item_id) for item_id in order}
+    order.sort(key=sort_keys.__getitem__)
 
     return items, order
 
 
+def break_cycles(items, report):
+    """
+    Разрывает циклы и самоссылки из отчёта check_graph: первый элемент
+    каждого цикла становится корневым, чтобы ветка не потерялась и
+    add_cube_xml не ушёл в бесконечную рекурсию.
+    """
+    for item_id in report["self_parents"]:
+        items[item_id]["parent_id"] = ""
+        print(f"Предупреждение: элемент '{item_id}' сделан корневым.")
+    for loop in report["cycles"]:
+        items[loop[0]]["parent_id"] = ""
+        print(
+            f"Предупреждение: элемент '{loop[0]}' сделан корневым, "
+            f"чтобы разорвать цикл."
+        )
+
+
 def build_children_map(items, order):
     children = {item_id: [] for item_id in items.keys()}
     roots = []
@@ -190,10 +210,10 @@ def build_children_map(items, order):
     return roots, children
 
 
-def add_cube_xml(parent_element, item, children_map, items, is_root=False):
+def cube_attrs(item, is_root=False):
     final_item = "1" if is_root else "0"
 
-    cube_attrs = {
+    return {
         "is_MSI": "0",
         "final_item": final_item,
         "description": item["description"],
@@ -202,7 +222,9 @@ def add_cube_xml(parent_element, item, children_map, items, is_root=False):
         "uom": item["uom"],
     }
 
-    cube_el = ET.SubElement(parent_element, "Cube", cube_attrs)
+
+def add_cube_xml(parent_element, item, children_map, items, is_root=False):
+    cube_el = ET.SubElement(parent_element, "Cube", cube_attrs(item, is_root))
 
     for child_id in children_map[item["id"]]:
         child = items[child_id]
@@ -212,9 +234,55 @@ def add_cube_xml(parent_element, item, children_map, items, is_root=False):
         add_cube_xml(link_el, child, children_map, items, is_root=False)
 
 
+def delta_cube_attrs(item):
+    """
+    Атрибуты Cube для дельты: в полном XML родитель и количество задаются
+    вложенностью (Cube -> CubeLink quantity -> Cube), в плоской дельте —
+    атрибутами parent и quantity.
+    """
+    attrs = cube_attrs(item, is_root=not item["parent_id"])
+    attrs["parent"] = item["parent_id"]
+    attrs["quantity"] = (item["quantity"] or "1") if item["parent_id"] else ""
+    return attrs
+
+
+def build_delta_dataset(attrs, walk, prints, previous):
+    """
+    Дельта относительно снимка прошлой выгрузки: новые и изменённые элементы
+    плоским списком (родители раньше детей) и список удалённых в <Removed>.
+    """
+    added, changed, removed = diff_snapshot(previous, prints)
+
+    dataset = ET.Element("Dataset", {"GUID": "urn:placeholder", "mode": "delta"})
+    send = set(added) | set(changed)
+    for item_id in walk:
+        if item_id in send:
+            ET.SubElement(dataset, "Cube", attrs[item_id])
+    if removed:
+        removed_el = ET.SubElement(dataset, "Removed")
+        for item_id in removed:
+            ET.SubElement(removed_el, "Cube", {"id": item_id})
+
+    return dataset, (len(added), len(changed), len(removed))
+
+
 # ---------------- MAIN ----------------
 
 def main():
+    parser = argparse.ArgumentParser(description="Structure.xlsx -> XML для импорта в Pragmatica.")
+    parser.add_argument(
+        "--full",
+        action="store_true",
+        help="Только полная выгрузка: XML с изменениями относительно прошлой выгрузки "
+             "не создаётся, снимок пишется заново.",
+    )
+    parser.add_argument(
+        "--force",
+        action="store_true",
+        help="Пересоздать XML, даже если Structure.xlsx не менялся с прошлой выгрузки.",
+    )
+    args = parser.parse_args()
+
     print("================================")
     print(" Конвертация структуры изделия в XML")
     print(f" Входной файл : {INPUT_FILE}")
@@ -229,14 +297,44 @@ def main():
         print("Положи Structure.xlsx в папку 'Результаты_EXCEL' рядом с этой папкой.")
         sys.exit(1)
 
+    # вход, конвертер и выгрузка те же, что в прошлый раз — XML уже готов
+    snapshot_file = snapshot_path(OUTPUT_FILE)
+    try:
+        input_hash = workbook_digest(INPUT_FILE)
+    except (OSError, zipfile.BadZipFile):
+        input_hash = None
+    expected = {
+        "input_hash": input_hash,
+        "converter": CONVERTER_VERSION,
+    }
+    if args.full:
+        expected["mode"] = "full"
+    if (
+        not args.force
+        and input_hash is not None
+        and os.path.isfile(snapshot_file)
+        and output_is_current(OUTPUT_FILE, expected)
+    ):
+        print("Structure.xlsx не менялся с прошлой выгрузки — XML оставлен как есть (--force — пересоздать).")
+        print("Статус          : УСПЕХ")
+        print(f"Выходной файл   : {OUTPUT_FILE}")
+        print("================================")
+        return
+
     try:
-        df = pd.read_excel(INPUT_FILE, sheet_name=SHEET_NAME, engine="openpyxl")
+        df = read_sheet(INPUT_FILE, SHEET_NAME)
     except Exception as e:
         print(f"Ошибка при чтении файла {INPUT_FILE}: {e}")
         sys.exit(1)
 
     try:
         items, order = validate_and_build_items(df)
+
+        report = check_graph({item_id: items[item_id]["parent_id"] for item_id in order})
+        print_graph_report(report)
+        if has_errors(report):
+            break_cycles(items, report)
+
         roots, children_map = build_children_map(items, order)
     except ValueError as ve:
         print("Ошибка при обработке данных Excel:")
@@ -247,34 +345,62 @@ def main():
         print("Ошибка: не найден ни один корневой элемент (строка с пустым Parent_ID).")
         sys.exit(1)
 
-    dataset = ET.Element("Dataset", {"GUID": "urn:placeholder"})
+    walk = preorder(roots, children_map)
+    attrs = {item_id: delta_cube_attrs(items[item_id]) for item_id in walk}
+    prints = {item_id: fingerprint(a.values()) for item_id, a in attrs.items()}
+
+    previous = None if args.full else load_snapshot(snapshot_file)
 
+    dataset = ET.Element("Dataset", {"GUID": "urn:placeholder"})
     for root_id in roots:
         root_item = items[root_id]
         add_cube_xml(dataset, root_item, children_map, items, is_root=True)
 
-    tree = ET.ElementTree(dataset)
-
-    try:
-        ET.indent(tree, space="    ", level=0)
-    except Exception:
-        # старые версии Python без ET.indent — просто живём дальше
-        pass
+    delta = delta_dataset = None
+    if previous is not None:
+        delta_dataset, delta = build_delta_dataset(attrs, walk, prints, previous[1])
 
-    # Перед записью нового XML отправим старый в Архив
+    # Перед записью нового XML отправим старый в Архив; старый XML изменений
+    # считался от прошлого снимка и без замены больше не годится
+    delta_file = delta_path(OUTPUT_FILE)
     archive_old(OUTPUT_FILE)
+    archive_old(delta_file)
 
     try:
-        tree.write(OUTPUT_FILE, encoding="utf-8", xml_declaration=True)
+        write_xml(dataset, OUTPUT_FILE)
+        if delta_dataset is not None:
+            write_xml(delta_dataset, delta_file)
     except Exception as e:
         print(f"Ошибка при сохранении XML: {e}")
         sys.exit(1)
 
+    try:
+        save_snapshot(snapshot_file, "", prints)
+    except OSError as e:
+        # старый снимок уже не соответствует XML; без снимка следующая выгрузка будет полной
+        print(f"Не удалось сохранить снимок выгрузки '{snapshot_file}': {e}")
+        try:
+            os.remove(snapshot_file)
+        except OSError:
+            pass
+    else:
+        if input_hash is not None:
+            manifest = dict(expected, mode="full" if delta is None else "delta", input=INPUT_FILE)
+            try:
+                manifest["output_hash"] = file_digest(OUTPUT_FILE)
+                write_manifest(manifest_path(OUTPUT_FILE), manifest)
+            except OSError as e:
+                print(f"Не удалось сохранить манифест выгрузки: {e}")
+
     print("Элементов всего :", len(items))
     print("Корневых узлов  :", len(roots))
+    if delta is not None:
+        print("Изменения       : новых {}, изменено {}, удалено {}".format(*delta))
     print("--------------------------------")
     print("Статус          : УСПЕХ")
     print(f"Выходной файл   : {OUTPUT_FILE}")
+    if delta is not None:
+        print(f"Файл изменений  : {delta_file}")
     print("================================")
 
 
@@ -0,0 +1,90 @@
+# hierarchy.py
+"""
+Иерархия кодов структуры изделия (ATA-подобные главы):
+
+    21.00        система
+    21.10        подсистема        -> родитель 21.00
+    21.10.05     агрегат           -> родитель 21.10
+    21.10.05.02  деталь            -> родитель 21.10.05
+
+Общая логика для parse_structure.py и excel_to_xml_structure.py.
+"""
+import re
+from typing import Dict, Iterable, List, Tuple
+
+_SEPARATORS = re.compile(r"[.\-_\s]+")
+
+
+def split_code(code: str) -> List[str]:
+    """
+    Разбивает код на части по разделителям '.', '-', '_' и пробелам:
+      '21-10-05' -> ['21', '10', '05']
+    """
+    return [p for p in _SEPARATORS.split(str(code).strip()) if p]
+
+
+def join_code(*parts: str) -> str:
+    """Склеивает части кода через точку: ('21', '10-05') -> '21.10.05'."""
+    result: List[str] = []
+    for part in parts:
+        result.extend(split_code(part))
+    return ".".join(result)
+
+
+def _segment_key(segment: str):
+    # Числа сравниваются как числа, остальное — как строки после чисел
+    if segment.isdigit():
+        return (0, int(segment))
+    return (1, segment)
+
+
+def code_sort_key(code: str) -> Tuple:
+    """
+    Ключ естественной сортировки: '21.00' < '100.10', '21.9' < '21.10'.
+    """
+    return tuple(_segment_key(p) for p in split_code(code))
+
+
+def _is_zero_group(segment: str) -> bool:
+    return segment.isdigit() and int(segment) == 0
+
+
+def significant_prefix(code: str) -> Tuple:
+    """
+    Значимая часть кода без хвостовых нулевых групп:
+      '21.00'    -> ('21',)
+      '21.10'    -> ('21', '10')
+      '21.10.00' -> ('21', '10')
+    Элемент с нулевым хвостом — "общий" узел своего уровня.
+    Группы остаются строками: '21.05' и '21.5' — разные элементы
+    (числами они сравниваются только при сортировке, см. code_sort_key).
+    """
+    key = split_code(code)
+    while key and _is_zero_group(key[-1]):
+        key.pop()
+    return tuple(key)
+
+
+def build_prefix_index(item_ids: Iterable[str]) -> Dict[Tuple, str]:
+    """
+    Индекс "значимая часть кода -> Item_ID". При совпадении побеждает
+    первое вхождение.
+    """
+    index: Dict[Tuple, str] = {}
+    for item_id in item_ids:
+        index.setdefault(significant_prefix(item_id), item_id)
+    return index
+
+
+def resolve_parent(item_id: str, index: Dict[Tuple, str]) -> str:
+    """
+    Родитель — существующий элемент с самой длинной значимой частью,
+    которая является собственным префиксом значимой части item_id.
+    Если такого нет, элемент корневой ("").
+    """
+    prefix = significant_prefix(item_id)
+    for k in range(len(prefix) - 1, 0, -1):
+        parent_id = index.get(prefix[:k])
+        if parent_id is not None:
+            return parent_id
+    return ""
@@ -3,9 +3,10 @@ import argparse
 import os
 import re
 import sys
-from datetime import datetime
-from typing import List, Dict, Tuple
+import time
+from typing import Dict, Iterable, List, Optional, Tuple
 
+import numpy as np
 import pandas as pd
 
 try:
@@ -13,46 +14,41 @@ try:
 except Exception:
     fitz = None
 
+try:
+    import openpyxl
+except Exception:
+    openpyxl = None
 
-SCRIPT_DIR = os.path.abspath(os.path.dirname(__file__))
-BASE_DIR = os.path.abspath(os.path.join(SCRIPT_DIR, ".."))
-
-# По умолчанию пишем Structure.xlsx в папку "Результаты_EXCEL"
-DEFAULT_OUT = os.path.join(BASE_DIR, "Результаты_EXCEL", "Structure.xlsx")
-
+try:
+    from core import archive_old, result_dirs
+except ImportError:
+    # запуск из папки раздела: общий core.py лежит уровнем выше (scripts/)
+    sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+    from core import archive_old, result_dirs
 
-# ---------------- Служебка ----------------
+import catalog
+import progress
+from excel_reader import read_sheets, write_sidecar
+from hierarchy import build_prefix_index, code_sort_key, join_code, resolve_parent
 
-def archive_old(path: str) -> None:
-    """
-    Если файл существует, переносит его в подкаталог 'Архив' рядом с ним.
-    """
-    if not os.path.isfile(path):
-        return
 
-    folder = os.path.dirname(path)
-    archive_dir = os.path.join(folder, "Архив")
-    os.makedirs(archive_dir, exist_ok=True)
-
-    base = os.path.basename(path)
-    name, ext = os.path.splitext(base)
-    ts = datetime.now().strftime("%Y%m%d_%H%M%S")
-    new_name = f"{name}_{ts}{ext}"
-    new_path = os.path.join(archive_dir, new_name)
+SCRIPT_DIR = os.path.abspath(os.path.dirname(__file__))
+BASE_DIR = os.path.abspath(os.path.join(SCRIPT_DIR, ".."))
 
-    try:
-        os.replace(path, new_path)
-    except OSError as e:
-        print(f"Не удалось переместить старый файл '{path}': {e}")
+# По умолчанию пишем Structure.xlsx в папку "Результаты_EXCEL"
+DEFAULT_OUT = os.path.join(result_dirs(BASE_DIR)[0], "Structure.xlsx")
+SHEET_NAME = "Структура"
 
 
-def normalize_cell(value) -> str:
-    if pd.isna(value):
-        return ""
-    return str(value).strip()
+# ---------------- PDF: таблица "Система / Подсистема / Наименование" ----------------
 
+def _open_pdf(pdf_path: str):
+    if fitz is None:
+        raise RuntimeError(
+            "Для парсинга PDF нужна библиотека PyMuPDF (модуль 'fitz')."
+        )
+    return fitz.open(pdf_path)
 
-# ---------------- PDF: таблица "Система / Подсистема / Наименование" ----------------
 
 def _extract_system_rows_from_pdf(pdf_path: str) -> List[Tuple[str, str, str]]:
     """
@@ -62,17 +58,24 @@ def _extract_system_rows_from_pdf(pdf_path: str) -> List[Tuple[str, str, str]]:
       Подсистема
       Наименование
     """
-    if fitz is None:
-        raise RuntimeError(
-            "Для парсинга PDF нужна библиотека PyMuPDF (модуль 'fitz')."
-        )
+    doc = _open_pdf(pdf_path)
 
-    rows: List[Tuple[str, str, str]] = []
+    def page_texts():
+        for page_no, page in enumerate(doc):
+            progress.emit("read", page_no, len(doc), "стр")
+            yield page.get_text("text")
 
-    doc = fitz.open(pdf_path)
+    return rows_from_page_texts(page_texts())
+
+
+def rows_from_page_texts(texts: Iterable[str]) -> List[Tuple[str, str, str]]:
+    """
+    Построчный разбор: тексты страниц (page.get_text("text")) ->
+    список (система, подсистема, имя).
+    """
+    rows: List[Tuple[str, str, str]] = []
 
-    for page in doc:
-        text = page.get_text("text")
+    for text in texts:
         lines = [ln.strip() for ln in text.splitlines()]
 
         in_table = False
@@ -149,73 +152,394 @@ def _extract_system_rows_from_pdf(pdf_path: str) -> List[Tuple[str, str, str]]:
     return rows
 
 
-# ---------------- Excel: таблица "Система / Подсистема / Наименование" ----------------
+# ---------------- PDF: разбор таблицы по координатам слов ----------------
 
-def _extract_system_rows_from_excel(path: str) -> List[Tuple[str, str, str]]:
+# Допуск по вертикали при сборке слов в строку (доля высоты слова)
+ROW_Y_TOLERANCE = 0.5
+
+TABLE_END_MARKER = "перечень функций самолета"
+
+
+def _group_words_into_rows(words) -> List[List[tuple]]:
     """
-    Ожидается таблица типа HB-17:
+    Собирает слова страницы (page.get_text("words")) в визуальные строки
+    по вертикальному центру. Внутри строки слова упорядочены слева направо.
+    """
+    rows: List[List[tuple]] = []
+    row_yc = 0.0
+    row_h = 0.0
+
+    for w in sorted(words, key=lambda w: ((w[1] + w[3]) / 2, w[0])):
+        yc = (w[1] + w[3]) / 2
+        h = w[3] - w[1]
+        if rows and abs(yc - row_yc) <= max(h, row_h) * ROW_Y_TOLERANCE:
+            rows[-1].append(w)
+        else:
+            rows.append([w])
+            row_yc = yc
+            row_h = h
 
-        ... | Система | Подсистема | Наименование/Функции | ...
+    for row in rows:
+        row.sort(key=lambda w: w[0])
+    return rows
 
-    Ищем строку с такими заголовками, ниже собираем строки (Система, Подсистема, Имя).
+
+def _find_header_columns(row: List[tuple]) -> Tuple[float, float] | None:
     """
-    all_sheets = pd.read_excel(path, sheet_name=None, header=None)
-    rows: List[Tuple[str, str, str]] = []
+    Если строка — заголовок "Система / Подсистема / Наименование",
+    возвращает границы колонок (x между Системой и Подсистемой,
+    x между Подсистемой и Наименованием). Иначе None.
+    """
+    w_sys = w_sub = w_name = None
+    for w in row:
+        low = w[4].lower()
+        if w_sys is None:
+            if low.startswith("система"):
+                w_sys = w
+        elif w_sub is None:
+            if low.startswith("подсистема"):
+                w_sub = w
+        elif low.startswith("наимен") or low.startswith("функц"):
+            w_name = w
+            break
+
+    if w_name is None:
+        return None
+
+    # Граница — середина промежутка между соседними заголовками
+    b_sub = (w_sys[2] + w_sub[0]) / 2
+    b_name = (w_sub[2] + w_name[0]) / 2
+    return b_sub, b_name
+
+
+def _extract_system_rows_from_pdf_words(pdf_path: str) -> List[Tuple[str, str, str]]:
+    """
+    Геометрический разбор таблицы "Система / Подсистема / Наименование".
+
+    Слова берутся с координатами (page.get_text("words")), границы колонок
+    определяются один раз по строке заголовка и используются на следующих
+    страницах, даже если заголовок там не повторён. Принадлежность к колонке
+    определяется по положению слова, а не по порядку строк в тексте, поэтому
+    перенос названия на несколько строк не ломает разбор: строка без кодов
+    считается продолжением названия предыдущей подсистемы.
+    """
+    doc = _open_pdf(pdf_path)
 
-    for sheet_name, df in all_sheets.items():
-        header_row_idx: int | None = None
-        col_sys = col_sub = col_name = None
+    def page_words():
+        for page_no, page in enumerate(doc):
+            progress.emit("read", page_no, len(doc), "стр")
+            yield page.get_text("words")
 
-        # Поиск строки заголовков
-        for ridx in range(len(df)):
-            row = df.iloc[ridx]
-            for cidx in range(len(row) - 2):
-                c0 = normalize_cell(row.iloc[cidx]).lower()
-                c1 = normalize_cell(row.iloc[cidx + 1]).lower()
-                c2 = normalize_cell(row.iloc[cidx + 2]).lower()
+    return rows_from_page_words(page_words())
 
-                if (
-                    c0.startswith("система")
-                    and c1.startswith("подсистема")
-                    and (c2.startswith("наимен") or c2.startswith("функц"))
-                ):
-                    header_row_idx = ridx
-                    col_sys = cidx
-                    col_sub = cidx + 1
-                    col_name = cidx + 2
-                    break
-            if header_row_idx is not None:
-                break
 
-        if header_row_idx is None:
-            # На этом листе нет нужной таблицы
-            continue
+def rows_from_page_words(pages_words: Iterable[list]) -> List[Tuple[str, str, str]]:
+    """
+    Геометрический разбор: слова страниц (page.get_text("words")) ->
+    список (система, подсистема, имя). Подробности — в
+    _extract_system_rows_from_pdf_words.
+    """
+    rows: List[Tuple[str, str, str]] = []
 
-        current_system: str | None = None
+    bounds: Tuple[float, float] | None = None
+    in_table = False
+    current_system: str | None = None
+
+    # Текущая подсистема, к которой ещё могут дописываться строки названия
+    pending: List | None = None
+
+    def flush():
+        nonlocal pending
+        if pending is not None:
+            name = " ".join(pending[2]).strip()
+            if name:
+                rows.append((pending[0], pending[1], name))
+        pending = None
+
+    for words in pages_words:
+        for row in _group_words_into_rows(words):
+            header = _find_header_columns(row)
+            if header is not None:
+                flush()
+                if bounds is None:
+                    bounds = header
+                in_table = True
+                continue
 
-        # Все строки ниже заголовка
-        for ridx in range(header_row_idx + 1, len(df)):
-            row = df.iloc[ridx]
-            sys_raw = normalize_cell(row.iloc[col_sys])
-            sub_raw = normalize_cell(row.iloc[col_sub])
-            name_raw = normalize_cell(row.iloc[col_name])
+            if not in_table:
+                continue
 
-            # Пустая строка
-            if not sys_raw and not sub_raw and not name_raw:
+            line = " ".join(w[4] for w in row)
+            if line.lower().startswith(TABLE_END_MARKER):
+                flush()
+                in_table = False
+                current_system = None
                 continue
 
-            # Если в строке указан код системы – обновляем "текущую систему"
-            if sys_raw:
-                current_system = sys_raw
+            b_sub, b_name = bounds
+            sys_parts: List[str] = []
+            sub_parts: List[str] = []
+            name_parts: List[str] = []
+            for w in row:
+                xc = (w[0] + w[2]) / 2
+                if xc < b_sub:
+                    sys_parts.append(w[4])
+                elif xc < b_name:
+                    sub_parts.append(w[4])
+                else:
+                    name_parts.append(w[4])
+
+            sys_cell = " ".join(sys_parts)
+            sub_cell = " ".join(sub_parts)
+
+            if sys_cell:
+                if not sys_cell.isdigit():
+                    # Не код (колонтитул, номер листа и т.п.)
+                    continue
+                flush()
+                current_system = sys_cell
 
-            if not current_system:
+            if sub_cell:
+                flush()
+                if not sub_cell.isdigit() or current_system is None:
+                    continue
+                pending = [current_system, sub_cell, name_parts]
                 continue
 
-            if not sub_raw or not name_raw:
+            if name_parts and pending is not None:
+                # Продолжение многострочного названия
+                pending[2].extend(name_parts)
+
+        # Название не переносится через границу страницы
+        flush()
+
+    return rows
+
+
+def benchmark_pdf_engines(pdf_path: str) -> None:
+    """
+    Сравнивает геометрический и построчный разбор PDF: время и результат.
+    """
+    engines = [
+        ("words", _extract_system_rows_from_pdf_words),
+        ("text", _extract_system_rows_from_pdf),
+    ]
+    results = {}
+    for label, func in engines:
+        t0 = time.perf_counter()
+        rows = func(pdf_path)
+        elapsed = time.perf_counter() - t0
+        results[label] = rows
+        print(f"{label:<6}: {len(rows):>6} строк за {elapsed:.3f} с")
+
+    words_set = set(results["words"])
+    text_set = set(results["text"])
+    print(f"Совпадает       : {len(words_set & text_set)}")
+    print(f"Только 'words'  : {len(words_set - text_set)}")
+    print(f"Только 'text'   : {len(text_set - words_set)}")
+
+
+# ---------------- Excel: таблица "Система / Подсистема / Наименование" ----------------
+
+# Сколько строк листа за раз проверяется при поиске заголовка
+HEADER_SCAN_BLOCK = 500
+
+# Первый блок при потоковом поиске заголовка: обычно таблица начинается в
+# первых строках листа; если нет, лист дочитывается блоками по HEADER_SCAN_BLOCK
+HEADER_SCAN_ROWS = 100
+
+
+def _normalize_frame(df: pd.DataFrame) -> pd.DataFrame:
+    """
+    Векторный аналог normalize_cell для всего DataFrame:
+    NaN -> "", остальное -> str(value).strip().
+    """
+    return df.astype(object).where(df.notna(), "").astype(str).apply(
+        lambda col: col.str.strip()
+    )
+
+
+def _find_header_in_frame(df: pd.DataFrame) -> Tuple[int, int] | None:
+    """
+    Ищет строку заголовков "Система | Подсистема | Наименование/Функции"
+    масками по строкам в нижнем регистре. Возвращает (строка, колонка "Система")
+    первого совпадения или None.
+    """
+    if df.shape[1] < 3:
+        return None
+
+    for start in range(0, len(df), HEADER_SCAN_BLOCK):
+        block = _normalize_frame(df.iloc[start:start + HEADER_SCAN_BLOCK])
+        low = block.apply(lambda col: col.str.lower())
+
+        is_sys = low.apply(lambda col: col.str.startswith("система")).to_numpy(bool)
+        is_sub = low.apply(lambda col: col.str.startswith("подсистема")).to_numpy(bool)
+        is_name = low.apply(
+            lambda col: col.str.startswith("наимен") | col.str.startswith("функц")
+        ).to_numpy(bool)
+
+        triple = is_sys[:, :-2] & is_sub[:, 1:-1] & is_name[:, 2:]
+        hits = np.argwhere(triple)
+        if len(hits):
+            ridx, cidx = hits[0]
+            return start + int(ridx), int(cidx)
+
+    return None
+
+
+def _rows_from_table_body(body: pd.DataFrame) -> List[Tuple[str, str, str]]:
+    """
+    Тело таблицы (три колонки: Система, Подсистема, Наименование, строки
+    ниже заголовка) -> список (система, подсистема, имя).
+    Код системы протягивается вниз (ffill) до следующего указанного кода.
+    """
+    body = _normalize_frame(body)
+    body.columns = ["sys", "sub", "name"]
+
+    current_system = body["sys"].replace("", np.nan).ffill()
+    keep = current_system.notna() & (body["sub"] != "") & (body["name"] != "")
+
+    return list(
+        zip(
+            current_system[keep].tolist(),
+            body["sub"][keep].tolist(),
+            body["name"][keep].tolist(),
+        )
+    )
+
+
+def _excel_value(value):
+    """Как pandas: целые числа из Excel (21.0) отдаются как int (21)."""
+    if isinstance(value, float) and value.is_integer():
+        return int(value)
+    return value
+
+
+def _report_skipped(skipped: List[str]) -> None:
+    """Печатает листы, на которых не нашлось заголовка таблицы."""
+    if skipped:
+        names = ", ".join(f"'{name}'" for name in skipped)
+        print(f"Заголовок 'Система / Подсистема / Наименование' не найден, листы пропущены: {names}")
+
+
+def _find_header_streaming(ws) -> Tuple[int, int] | None:
+    """
+    _find_header_in_frame по строкам листа openpyxl: сначала первые
+    HEADER_SCAN_ROWS строк, потом остальные блоками по HEADER_SCAN_BLOCK;
+    чтение останавливается на первом найденном заголовке, лист целиком
+    в памяти не собирается.
+    """
+    block: List[tuple] = []
+    start = 0
+    for r in ws.iter_rows(values_only=True):
+        block.append(tuple(_excel_value(v) for v in r))
+        if len(block) == (HEADER_SCAN_ROWS if start == 0 else HEADER_SCAN_BLOCK):
+            found = _find_header_in_frame(pd.DataFrame(block, dtype=object))
+            if found is not None:
+                return start + found[0], found[1]
+            start += len(block)
+            block = []
+    if block:
+        found = _find_header_in_frame(pd.DataFrame(block, dtype=object))
+        if found is not None:
+            return start + found[0], found[1]
+    return None
+
+
+def _read_table_streaming(ws, header_row_idx: int, col_sys: int) -> List[Tuple[str, str, str]]:
+    """Три колонки таблицы ниже строки заголовка -> (система, подсистема, имя)."""
+    body = pd.DataFrame(
+        [
+            tuple(_excel_value(v) for v in r)
+            for r in ws.iter_rows(
+                min_row=header_row_idx + 2,
+                min_col=col_sys + 1,
+                max_col=col_sys + 3,
+                values_only=True,
+            )
+        ],
+        columns=range(3),
+        dtype=object,
+    )
+    return _rows_from_table_body(body)
+
+
+def _extract_system_rows_from_xlsx_streaming(path: str) -> List[Tuple[str, str, str]]:
+    """
+    Потоковый просмотр .xlsx через openpyxl (read_only): заголовок ищется
+    по строкам листа (_find_header_streaming) и обычно находится в первых
+    HEADER_SCAN_ROWS строках; у листов с таблицей загружаются только три
+    нужные колонки. Лист без заголовка прочитывается до конца, но в память
+    целиком не попадает; такие листы печатаются.
+    """
+    wb = openpyxl.load_workbook(path, read_only=True, data_only=True)
+    rows: List[Tuple[str, str, str]] = []
+
+    try:
+        sheets = wb.worksheets
+        skipped = []
+        for sheet_no, ws in enumerate(sheets):
+            progress.emit("read", sheet_no, len(sheets), "лист", force=True, rows=len(rows))
+            found = _find_header_streaming(ws)
+            if found is None:
+                # На этом листе нет нужной таблицы
+                skipped.append(ws.title)
                 continue
+            rows.extend(_read_table_streaming(ws, *found))
+        _report_skipped(skipped)
+    finally:
+        wb.close()
+
+    return rows
 
-            rows.append((current_system, sub_raw, name_raw))
 
+def _extract_system_rows_from_excel(path: str) -> List[Tuple[str, str, str]]:
+    """
+    Ожидается таблица типа HB-17:
+
+        ... | Система | Подсистема | Наименование/Функции | ...
+
+    Ищем строку с такими заголовками, ниже собираем строки (Система, Подсистема, Имя).
+
+    .xlsx просматриваются потоково по листам (см.
+    _extract_system_rows_from_xlsx_streaming); .xls и случай без openpyxl
+    читаются целиком (read_sheets: calamine, если установлен, иначе pandas).
+    """
+    ext = os.path.splitext(path)[1].lower()
+    if ext == ".xlsx" and openpyxl is not None:
+        return _extract_system_rows_from_xlsx_streaming(path)
+
+    return rows_from_sheets(read_sheets(path))
+
+
+def rows_from_sheet_frame(df: pd.DataFrame) -> Optional[List[Tuple[str, str, str]]]:
+    """
+    Лист, прочитанный целиком (header=None) -> строки таблицы
+    "Система / Подсистема / Наименование" или None, если заголовка на листе нет.
+    """
+    found = _find_header_in_frame(df)
+    if found is None:
+        return None
+
+    header_row_idx, col_sys = found
+    return _rows_from_table_body(df.iloc[header_row_idx + 1:, col_sys:col_sys + 3])
+
+
+def rows_from_sheets(all_sheets: Dict[str, pd.DataFrame]) -> List[Tuple[str, str, str]]:
+    """
+    Строки таблицы со всех листов (read_sheets, header=None); каждый лист
+    просматривается до первого заголовка, листы без него печатаются.
+    """
+    rows: List[Tuple[str, str, str]] = []
+    skipped = []
+    for sheet_no, (name, df) in enumerate(all_sheets.items()):
+        progress.emit("read", sheet_no, len(all_sheets), "лист", force=True, rows=len(rows))
+        sheet_rows = rows_from_sheet_frame(df)
+        if sheet_rows is None:
+            skipped.append(name)
+            continue
+        rows.extend(sheet_rows)
+    _report_skipped(skipped)
     return rows
 
 
@@ -225,6 +549,10 @@ def build_items_from_rows(rows: List[Tuple[str, str, str]]) -> pd.DataFrame:
     """
     На вход: список (код_системы, код_подсистемы, имя).
     На выход: DataFrame с колонками шаблона Pragmatica.
+
+    Код подсистемы может быть многоуровневым ('10', '10.05', '10-05-02'),
+    родитель определяется по префиксу кода (см. hierarchy.resolve_parent),
+    порядок строк — естественный числовой (21.00 < 100.10).
     """
     items: Dict[str, Dict[str, str]] = {}
 
@@ -236,13 +564,12 @@ def build_items_from_rows(rows: List[Tuple[str, str, str]]) -> pd.DataFrame:
         if not sys_code or not sub_code or not name:
             continue
 
-        item_id = f"{sys_code}.{sub_code}"
-        parent_id = "" if sub_code == "00" else f"{sys_code}.00"
+        item_id = join_code(sys_code, sub_code)
 
         if item_id not in items:
             items[item_id] = {
                 "Item_ID": item_id,
-                "Parent_ID": parent_id,
+                "Parent_ID": "",
                 "Name": name,
                 "Description": "",
                 "Quantity": "1",
@@ -262,13 +589,30 @@ def build_items_from_rows(rows: List[Tuple[str, str, str]]) -> pd.DataFrame:
                     else:
                         existing["Description"] = "Альтернативное название: " + alt
 
-    df = pd.DataFrame(items.values())
-    df = df[["Item_ID", "Parent_ID", "Name", "Description", "Quantity", "UOM"]]
-    df.sort_values("Item_ID", inplace=True)
-    df.reset_index(drop=True, inplace=True)
+    index = build_prefix_index(items.keys())
+    for item_id, item in items.items():
+        item["Parent_ID"] = resolve_parent(item_id, index)
+
+    sort_keys = {item_id: code_sort_key(item_id) for item_id in items}
+    ordered = sorted(items, key=sort_keys.__getitem__)
+
+    columns = ["Item_ID", "Parent_ID", "Name", "Description", "Quantity", "UOM"]
+    df = pd.DataFrame([items[item_id] for item_id in ordered], columns=columns)
     return df
 
 
+def export_structure_excel(df: pd.DataFrame, out_path: str) -> None:
+    """Пишет Structure.xlsx; прежний файл перед этим уезжает в Архив."""
+    archive_old(out_path)
+
+    out_dir = os.path.dirname(out_path)
+    if out_dir:
+        os.makedirs(out_dir, exist_ok=True)
+
+    df.to_excel(out_path, index=False, sheet_name=SHEET_NAME)
+    write_sidecar(out_path, SHEET_NAME, df)
+
+
 # ---------------- main ----------------
 
 def main():
@@ -287,8 +631,35 @@ def main():
             "(по умолчанию Structure.xlsx в папке 'Результаты_EXCEL')."
         ),
     )
+    parser.add_argument(
+        "--pdf-engine",
+        choices=["words", "text"],
+        default="words",
+        help=(
+            "Способ разбора PDF: 'words' – по координатам слов (по умолчанию), "
+            "'text' – построчный разбор текста."
+        ),
+    )
+    parser.add_argument(
+        "--bench",
+        action="store_true",
+        help="Только сравнить скорость и результат движков разбора PDF, без записи Excel.",
+    )
+    parser.add_argument(
+        "--progress",
+        action="store_true",
+        help="Печатать машиночитаемые события прогресса (используется GUI).",
+    )
+    parser.add_argument(
+        "--no-catalog",
+        action="store_true",
+        help="Не записывать результат в каталог импортов (Каталог.sqlite).",
+    )
 
     args = parser.parse_args()
+
+    if args.progress:
+        progress.enable()
     src = os.path.abspath(args.input_file)
     out_path = os.path.abspath(args.out)
 
@@ -304,9 +675,22 @@ def main():
 
     ext = os.path.splitext(src)[1].lower()
 
+    if args.bench:
+        if ext != ".pdf":
+            print("Ошибка: сравнение движков доступно только для PDF.")
+            sys.exit(1)
+        benchmark_pdf_engines(src)
+        return
+
     if ext == ".pdf":
         print("Источник: PDF, поиск таблицы 'Система / Подсистема / Наименование'.")
-        rows = _extract_system_rows_from_pdf(src)
+        if args.pdf_engine == "words":
+            rows = _extract_system_rows_from_pdf_words(src)
+            if not rows:
+                print("Разбор по координатам ничего не нашёл, пробуем построчный.")
+                rows = _extract_system_rows_from_pdf(src)
+        else:
+            rows = _extract_system_rows_from_pdf(src)
     elif ext in (".xlsx", ".xls"):
         print("Источник: Excel, поиск таблицы 'Система / Подсистема / Наименование'.")
         rows = _extract_system_rows_from_excel(src)
@@ -318,6 +702,8 @@ def main():
         print("Не найдено ни одной строки вида 'Система / Подсистема / Наименование'.")
         sys.exit(1)
 
+    progress.emit("read", 1, 1, "", force=True, rows=len(rows))
+    progress.emit("build", 0, len(rows), "строк", force=True)
     df = build_items_from_rows(rows)
 
     print(f"Элементов всего : {len(df)}")
@@ -325,18 +711,19 @@ def main():
     print(f"Корневых узлов  : {roots}")
     print("--------------------------------")
 
-    # Перед записью нового Structure.xlsx старый уезжает в Архив
-    archive_old(out_path)
-
-    out_dir = os.path.dirname(out_path)
-    if out_dir:
-        os.makedirs(out_dir, exist_ok=True)
-
+    progress.emit("export", 0, len(df), "элем", force=True)
     try:
-        df.to_excel(out_path, index=False, sheet_name="Структура")
+        export_structure_excel(df, out_path)
     except Exception as e:
         print(f"Ошибка при сохранении Excel: {e}")
         sys.exit(1)
+    progress.emit("export", len(df), len(df), "элем", force=True)
+
+    if not args.no_catalog:
+        catalog.record_import(
+            df[["Item_ID", "Parent_ID", "Name", "Description"]].itertuples(index=False),
+            "structure", "", [src],
+        )
 
     print("Статус          : УСПЕХ")
     print(f"Выходной Excel  : {out_path}")
@@ -0,0 +1,177 @@
+# tree_preview.py
+"""
+Окно просмотра иерархии по результату build_children_map
+(roots + {id: [id детей]}) без открытия Excel.
+
+Узлы создаются только при раскрытии родителя и порциями по PAGE_SIZE:
+в конце порции стоит узел "… ещё N", выбор которого подгружает следующую.
+Поиск идёт по заранее подготовленным строкам в нижнем регистре, найденный
+элемент раскрывается — подгружаются только узлы на пути к нему.
+"""
+import tkinter as tk
+from tkinter import ttk
+
+import customtkinter as ctk
+
+PAGE_SIZE = 500
+SEARCH_DELAY_MS = 200
+
+# Служебные iid: заглушка "есть дети" и узел "ещё N"
+_DUMMY = "@@dummy:"
+_MORE = "@@more:"
+
+
+def open_hierarchy_preview(master, title: str, roots, children, labels):
+    """
+    roots    – id корней в порядке обхода;
+    children – {id: [id детей]} (как из build_children_map);
+    labels   – {id: текст узла}.
+    """
+    win = ctk.CTkToplevel(master)
+    win.title(title)
+    win.geometry("800x600")
+
+    search_var = tk.StringVar()
+
+    top = ctk.CTkFrame(win, fg_color="transparent")
+    top.pack(fill="x", padx=10, pady=(10, 5))
+
+    entry = ctk.CTkEntry(top, textvariable=search_var, placeholder_text="Поиск по коду или названию")
+    entry.pack(side="left", fill="x", expand=True)
+
+    status = ctk.CTkLabel(top, text=f"Элементов: {len(labels)}", width=180, anchor="e")
+    status.pack(side="right", padx=(10, 0))
+
+    body = tk.Frame(win)
+    body.pack(fill="both", expand=True, padx=10, pady=(0, 10))
+
+    style = ttk.Style(win)
+    style.configure("Preview.Treeview", font=("Segoe UI", 11), rowheight=22)
+
+    tree = ttk.Treeview(body, show="tree", selectmode="browse", style="Preview.Treeview")
+    scroll = ttk.Scrollbar(body, orient="vertical", command=tree.yview)
+    tree.configure(yscrollcommand=scroll.set)
+    scroll.pack(side="right", fill="y")
+    tree.pack(side="left", fill="both", expand=True)
+
+    loaded = {}  # id родителя ("" — корень) -> сколько детей уже вставлено
+
+    def kids_of(node):
+        return roots if node == "" else children.get(node, [])
+
+    def load_page(node):
+        kids = kids_of(node)
+        start = loaded.get(node, 0)
+        end = min(start + PAGE_SIZE, len(kids))
+
+        more_iid = _MORE + node
+        if tree.exists(more_iid):
+            tree.delete(more_iid)
+
+        for kid in kids[start:end]:
+            tree.insert(node, "end", iid=kid, text=labels.get(kid, kid))
+            if children.get(kid):
+                tree.insert(kid, "end", iid=_DUMMY + kid, text="")
+
+        loaded[node] = end
+        if end < len(kids):
+            tree.insert(node, "end", iid=more_iid, text=f"… ещё {len(kids) - end}")
+
+    def expand(node):
+        dummy = _DUMMY + node
+        if tree.exists(dummy):
+            tree.delete(dummy)
+            load_page(node)
+        tree.item(node, open=True)
+
+    def on_open(_event):
+        node = tree.focus()
+        if node and not node.startswith(_MORE):
+            expand(node)
+
+    def on_select(_event):
+        sel = tree.selection()
+        if sel and sel[0].startswith(_MORE):
+            load_page(sel[0][len(_MORE):])
+
+    tree.bind("<<TreeviewOpen>>", on_open)
+    tree.bind("<<TreeviewSelect>>", on_select)
+
+    # ---- поиск ----
+
+    parent_of = {kid: node for node, kids in children.items() for kid in kids}
+    search_ids = list(labels)
+    search_text = [labels[i].lower() for i in search_ids]
+
+    state = {"matches": [], "pos": 0, "after": None}
+
+    def reveal(node):
+        path = []
+        seen = set()
+        cur = node
+        while cur is not None and cur not in seen:
+            seen.add(cur)
+            path.append(cur)
+            cur = parent_of.get(cur)
+        path.reverse()
+
+        parent = ""
+        for cur in path:
+            kids = kids_of(parent)
+            while not tree.exists(cur) and loaded.get(parent, 0) < len(kids):
+                load_page(parent)
+            if not tree.exists(cur):
+                return  # недостижим из корней (например, висит под циклом)
+            if cur != node:
+                expand(cur)
+            parent = cur
+
+        tree.selection_set(node)
+        tree.focus(node)
+        tree.see(node)
+
+    def show_match():
+        matches = state["matches"]
+        if not matches:
+            status.configure(text="Не найдено")
+            return
+        pos = state["pos"] % len(matches)
+        status.configure(text=f"Найдено: {len(matches)} ({pos + 1})")
+        reveal(matches[pos])
+
+    def run_search():
+        state["after"] = None
+        query = search_var.get().strip().lower()
+        if not query:
+            state["matches"] = []
+            status.configure(text=f"Элементов: {len(labels)}")
+            return
+        state["matches"] = [
+            search_ids[k] for k, text in enumerate(search_text) if query in text
+        ]
+        state["pos"] = 0
+        show_match()
+
+    def on_key(event):
+        if event.keysym == "Return":
+            return
+        if state["after"] is not None:
+            win.after_cancel(state["after"])
+        state["after"] = win.after(SEARCH_DELAY_MS, run_search)
+
+    def on_enter(_event):
+        if state["after"] is not None:
+            win.after_cancel(state["after"])
+            run_search()
+            return
+        state["pos"] += 1
+        show_match()
+
+    entry.bind("<Return>", on_enter)
+    entry.bind("<KeyRelease>", on_key)
+
+    load_page("")
+    entry.focus_set()
+    # CTkToplevel на Windows иногда открывается под главным окном
+    win.after(100, win.lift)
+    return win
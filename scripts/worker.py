@@ -0,0 +1,141 @@
+# worker.py
+"""
+Резидентный процесс для GUI (общий для обоих разделов):
+
+    python worker.py <папка раздела>
+
+Один раз загружает тяжёлые библиотеки (pandas, openpyxl, PyMuPDF, python-docx),
+затем читает задания из stdin — по одному JSON в строке:
+
+    {"script": "parse_functions.py", "args": ["file.pdf", "--fi", "ТЕСТ"]}
+
+Скрипт выполняется так же, как "python script args" (как __main__, с тем же
+sys.argv и рабочей папкой), но без повторного старта интерпретатора и импортов.
+Вывод скрипта идёт в stdout, после него печатается строка "@@done <код выхода>".
+
+Задание может вызвать и функцию модуля раздела:
+
+    {"call": "tuning.load", "kwargs": {"path": "file.pdf"}}
+
+Функция получает первым аргументом словарь STATE, который живёт между
+заданиями (так кэш подбора фильтров остаётся в этом процессе, а не в окне),
+её результат печатается строкой "@@result <JSON>" перед "@@done".
+"""
+import contextlib
+import importlib
+import io
+import json
+import os
+import runpy
+import sys
+import traceback
+
+# Общие модули разделов (core.py, progress.py, ...) — рядом с worker.py
+SHARED_DIR = os.path.abspath(os.path.dirname(__file__))
+
+# Папка раздела со скриптами заданий (functions или structure)
+SCRIPT_DIR = os.path.abspath(sys.argv[1]) if len(sys.argv) > 1 else os.getcwd()
+
+DONE_PREFIX = "@@done "
+RESULT_PREFIX = "@@result "
+
+# Данные, которые задания "call" оставляют между запусками
+STATE: dict = {}
+
+PRELOAD_MODULES = ("pandas", "openpyxl", "fitz", "docx")
+
+
+def preload():
+    """Импортирует тяжёлые библиотеки заранее; отсутствующие пропускаются."""
+    # предупреждения при импорте не должны попасть в лог первого задания
+    with contextlib.redirect_stdout(io.StringIO()), contextlib.redirect_stderr(io.StringIO()):
+        for name in PRELOAD_MODULES:
+            try:
+                __import__(name)
+            except Exception:
+                pass
+
+
+def _forget_local_modules():
+    """
+    Выгружает модули скриптов и общие модули (progress, graph_check, ...),
+    чтобы их состояние не переходило из одного задания в другое.
+    """
+    for name, module in list(sys.modules.items()):
+        path = getattr(module, "__file__", None)
+        if name == "__main__":
+            continue  # сам worker.py
+        if path and os.path.dirname(os.path.abspath(path)) in (SCRIPT_DIR, SHARED_DIR):
+            del sys.modules[name]
+
+
+def _exit_code(e: SystemExit) -> int:
+    if e.code is None:
+        return 0
+    if isinstance(e.code, int):
+        return e.code
+    print(e.code)
+    return 1
+
+
+def run_job(job: dict) -> int:
+    """Выполняет скрипт задания как __main__ и возвращает код выхода."""
+    script = os.path.join(SCRIPT_DIR, os.path.basename(job["script"]))
+    sys.argv = [script] + [str(a) for a in job.get("args", [])]
+    _forget_local_modules()
+
+    try:
+        runpy.run_path(script, run_name="__main__")
+    except SystemExit as e:
+        return _exit_code(e)
+    except Exception:
+        traceback.print_exc(file=sys.stdout)
+        return 1
+    return 0
+
+
+def run_call(job: dict) -> int:
+    """Вызывает функцию задания "модуль.функция"(STATE, **kwargs) и печатает результат."""
+    module_name, _, func_name = job["call"].rpartition(".")
+    _forget_local_modules()
+
+    try:
+        func = getattr(importlib.import_module(module_name), func_name)
+        result = func(STATE, **job.get("kwargs", {}))
+    except SystemExit as e:
+        return _exit_code(e)
+    except Exception:
+        traceback.print_exc(file=sys.stdout)
+        return 1
+
+    sys.stdout.write(RESULT_PREFIX + json.dumps(result, ensure_ascii=False) + "\n")
+    return 0
+
+
+def main():
+    os.chdir(SCRIPT_DIR)
+    for path in (SHARED_DIR, SCRIPT_DIR):
+        if path not in sys.path:
+            sys.path.insert(0, path)
+
+    preload()
+
+    for line in sys.stdin:
+        line = line.strip()
+        if not line:
+            continue
+
+        try:
+            job = json.loads(line)
+        except ValueError:
+            print(f"Некорректное задание: {line}")
+            code = 1
+        else:
+            code = run_call(job) if "call" in job else run_job(job)
+
+        sys.stdout.write(f"{DONE_PREFIX}{code}\n")
+        sys.stdout.flush()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,14 @@
+# conftest.py
+"""
+Скрипты импортируют соседей плоско (from core import ..., import progress):
+кладём папки в sys.path так же, как python -m scripts (см. scripts/__main__.py).
+"""
+import os
+import sys
+
+SCRIPTS_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "scripts")
+
+for _folder in ("structure", "functions", ""):
+    _path = os.path.join(SCRIPTS_DIR, _folder) if _folder else SCRIPTS_DIR
+    if _path not in sys.path:
+        sys.path.insert(0, _path)
@@ -0,0 +1,126 @@
+# test_archive.py
+from datetime import datetime
+
+import openpyxl
+
+import archive
+
+
+def _write_workbook(path, rows, modified):
+    wb = openpyxl.Workbook()
+    ws = wb.active
+    ws.title = "Функции"
+    for row in rows:
+        ws.append(row)
+    wb.properties.created = modified
+    wb.properties.modified = modified
+    wb.save(path)
+
+
+def test_same_workbook_saved_twice_is_one_version(tmp_path):
+    path = tmp_path / "Functions.xlsx"
+    rows = [["Func_LCN", "Name"], ["Ф1", "Насос"]]
+    root = archive.archive_dir(str(tmp_path))
+
+    _write_workbook(path, rows, datetime(2025, 1, 1, 10, 0, 0))
+    first = archive.store(str(path), "20250101_100000")
+    # те же данные, другие даты в docProps/core.xml -> другой хеш файла
+    _write_workbook(path, rows, datetime(2025, 1, 2, 11, 30, 0))
+    second = archive.store(str(path), "20250102_113000")
+
+    assert first is not None
+    assert second is None
+    assert len(archive.read_index(root)) == 1
+    assert not path.exists()
+
+    _write_workbook(path, rows + [["Ф2", "Клапан"]], datetime(2025, 1, 3))
+    third = archive.store(str(path), "20250103_000000")
+    assert third is not None
+    assert [v.stamp for v in archive.read_index(root)] == ["20250101_100000", "20250103_000000"]
+
+
+def test_identical_text_files_are_stored_once(tmp_path):
+    path = tmp_path / "functions_output.xml"
+    root = archive.archive_dir(str(tmp_path))
+    for stamp in ("20250101_000000", "20250101_000001"):
+        path.write_text("<Dataset/>", encoding="utf-8")
+        archive.store(str(path), stamp)
+
+    versions = archive.read_index(root)
+    assert len(versions) == 1
+    assert versions[0].content == versions[0].digest
+
+
+def test_restore_returns_archived_bytes(tmp_path):
+    path = tmp_path / "functions_output.xml"
+    path.write_bytes(b"<Dataset>1</Dataset>")
+    version = archive.store(str(path), "20250101_000000")
+
+    out = tmp_path / "restored.xml"
+    archive.restore(archive.archive_dir(str(tmp_path)), version, str(out))
+    assert out.read_bytes() == b"<Dataset>1</Dataset>"
+
+
+def test_old_index_lines_use_file_hash_as_content(tmp_path):
+    root = tmp_path / "Архив"
+    root.mkdir()
+    (root / "index.tsv").write_text("20250101_000000\tA.xml\tabc\t10\n", encoding="utf-8")
+    (version,) = archive.read_index(str(root))
+    assert version.content == "abc"
+
+
+def _version(stamp, name="A.xml"):
+    return archive.Version(stamp, name, stamp, 1, stamp)
+
+
+def test_select_kept_last_and_daily():
+    versions = [
+        _version("20250101_090000"),
+        _version("20250101_180000"),
+        _version("20250105_120000"),
+        _version("20250110_080000"),
+        _version("20250110_090000"),
+    ]
+    kept = archive.select_kept(versions, keep_last=1, keep_days=7,
+                               today=datetime(2025, 1, 10, 12, 0))
+    # последняя версия + последняя версия каждого дня с 04.01 по 10.01
+    assert [v.stamp for v in kept] == ["20250105_120000", "20250110_090000"]
+
+
+def test_prune_removes_unreferenced_objects(tmp_path):
+    path = tmp_path / "a.xml"
+    root = archive.archive_dir(str(tmp_path))
+    for i in range(4):
+        path.write_text(f"<v>{i}</v>", encoding="utf-8")
+        archive.store(str(path), f"2025010{i + 1}_000000")
+
+    dropped = archive.prune(root, keep_last=2, keep_days=0)
+
+    versions = archive.read_index(root)
+    assert dropped == 2
+    assert [v.stamp for v in versions] == ["20250103_000000", "20250104_000000"]
+    objects = sorted(p.name[:-3] for p in (tmp_path / "Архив" / "objects").rglob("*.gz"))
+    assert objects == sorted(v.digest for v in versions)
+
+
+def test_prune_policy_is_kept_for_later_archiving(tmp_path, monkeypatch):
+    folder = str(tmp_path)
+    root = archive.archive_dir(folder)
+    monkeypatch.setattr(archive, "ARCHIVE_KEEP_LAST", 2)
+    monkeypatch.setattr(archive, "ARCHIVE_KEEP_DAYS", 0)
+    assert archive.main(["--dir", folder, "prune", "--keep-last", "5"], []) == 0
+    assert archive.read_policy(root) == (5, 0)
+
+    path = tmp_path / "a.xml"
+    for i in range(6):
+        path.write_text(f"<v>{i}</v>", encoding="utf-8")
+        archive.archive_file(str(path))
+
+    # archive_file берёт запомненную политику, а не значения по умолчанию
+    assert len(archive.read_index(root)) == 5
+    assert archive.main(["--dir", folder, "prune", "--keep-days", "3"], []) == 0
+    assert archive.read_policy(root) == (5, 3)
+
+
+def test_policy_defaults_without_file(tmp_path):
+    assert archive.read_policy(str(tmp_path)) == (archive.ARCHIVE_KEEP_LAST, archive.ARCHIVE_KEEP_DAYS)
@@ -0,0 +1,58 @@
+# test_catalog.py
+import catalog
+
+
+def _codes(db, fi="ТЕСТ"):
+    conn = catalog.connect(db)
+    try:
+        return sorted(row[2] for row in catalog.lookup_code(conn, "*", fi=fi))
+    finally:
+        conn.close()
+
+
+def test_reimport_replaces_rows_of_the_same_source(tmp_path):
+    db = str(tmp_path / "Каталог.sqlite")
+    src = tmp_path / "doc.txt"
+    src.write_text("документ", encoding="utf-8")
+
+    catalog.record_import([("F1", "", "Насос", ""), ("F2", "", "Клапан", "")],
+                          "functions", "ТЕСТ", [str(src)], db)
+    catalog.record_import([("F1", "", "Насос подачи", "")],
+                          "functions", "ТЕСТ", [str(src)], db)
+
+    assert _codes(db) == ["F1"]
+    conn = catalog.connect(db)
+    try:
+        assert [row[4] for row in catalog.search_text(conn, "подачи")] == ["Насос подачи"]
+        assert catalog.search_text(conn, "Клапан") == []
+    finally:
+        conn.close()
+
+
+def test_other_sources_and_fi_are_kept(tmp_path):
+    db = str(tmp_path / "Каталог.sqlite")
+    first = tmp_path / "a.txt"
+    second = tmp_path / "b.txt"
+    first.write_text("первый", encoding="utf-8")
+    second.write_text("второй", encoding="utf-8")
+
+    catalog.record_import([("F1", "", "Насос", "")], "functions", "ТЕСТ", [str(first)], db)
+    catalog.record_import([("F9", "", "Сброс", "")], "functions", "ДРУГОЙ", [str(first)], db)
+    catalog.record_import([("F2", "", "Клапан", "")], "functions", "ТЕСТ", [str(second)], db)
+
+    assert _codes(db) == ["F1", "F2"]
+    assert _codes(db, "ДРУГОЙ") == ["F9"]
+
+
+def test_unfinished_stream_leaves_catalog_unchanged(tmp_path):
+    db = str(tmp_path / "Каталог.sqlite")
+    src = tmp_path / "doc.txt"
+    src.write_text("документ", encoding="utf-8")
+    catalog.record_import([("F1", "", "Насос", ""), ("F2", "", "Клапан", "")],
+                          "functions", "ТЕСТ", [str(src)], db)
+
+    rows = catalog.recording(iter([("F3", "", "Сброс", "")]), "functions", "ТЕСТ", [str(src)], db)
+    next(rows)
+    rows.close()  # запись Excel оборвалась
+
+    assert _codes(db) == ["F1", "F2"]
@@ -0,0 +1,71 @@
+# test_consolidation.py
+import random
+
+import pandas as pd
+import pytest
+
+import parse_functions as pf
+
+
+def _random_candidates(seed, rows=400):
+    """Коды с повторами, кириллической и латинской Ф, пропущенными родителями."""
+    rng = random.Random(seed)
+    codes, names = [], []
+    for _ in range(rows):
+        letter = rng.choice(["F", "Ф"])
+        depth = rng.randint(1, 4)
+        code = letter + ".".join(str(rng.randint(1, 4)) for _ in range(depth))
+        codes.append(code)
+        names.append(rng.choice(["Насос", "Клапан", "Подача", " Контроль ", "Сброс", ""]) or "Насос")
+    return pf.make_candidates(codes, names)
+
+
+def _in_memory(candidates, mode):
+    functions = pf.filter_candidates(candidates, max_depth=0, mode=mode)
+    return pf.consolidate_functions(pf.infer_hierarchy(functions, mode=mode))
+
+
+def _external(candidates, mode, batch_rows, tmp_path):
+    batches = [
+        pf.filter_candidates(candidates.iloc[i:i + batch_rows].reset_index(drop=True),
+                             max_depth=0, mode=mode)
+        for i in range(0, len(candidates), batch_rows)
+    ]
+    rows = pf.consolidate_external(batches, mode, 1, str(tmp_path))
+    return pd.DataFrame(list(rows), columns=["Func_LCN", "Parent_LCN", "Name", "Description"])
+
+
+@pytest.mark.parametrize("mode", ["fi", "fs"])
+@pytest.mark.parametrize("seed", [1, 2, 3])
+def test_external_matches_in_memory(tmp_path, monkeypatch, mode, seed):
+    # каждая порция уходит на диск, а слияние идёт в несколько проходов
+    monkeypatch.setattr(pf, "_estimate_bytes", lambda batch: 1 << 30)
+    monkeypatch.setattr(pf, "MERGE_FAN_IN", 3)
+    candidates = _random_candidates(seed)
+
+    expected = _in_memory(candidates, mode)
+    actual = _external(candidates, mode, 37, tmp_path)
+
+    pd.testing.assert_frame_equal(actual, expected, check_dtype=False)
+    assert list(tmp_path.iterdir()) == []
+
+
+def test_external_single_run_matches_in_memory(tmp_path):
+    candidates = _random_candidates(7)
+    expected = _in_memory(candidates, "fi")
+    actual = _external(candidates, "fi", 50, tmp_path)
+    pd.testing.assert_frame_equal(actual, expected, check_dtype=False)
+
+
+def test_external_streamed_export_keeps_old_workbook_on_error(tmp_path, monkeypatch):
+    out = tmp_path / "Functions.xlsx"
+    pf.export_rows_to_excel([("F1", "", "Насос", "")], "ФИ", str(out))
+    before = out.read_bytes()
+
+    monkeypatch.setattr(pf, "EXCEL_MAX_ROWS", 1)
+    with pytest.raises(ValueError):
+        pf.export_rows_to_excel([("F1", "", "Насос", ""), ("F2", "", "Клапан", "")], "ФИ", str(out))
+
+    assert out.read_bytes() == before
+    assert not (tmp_path / "Архив").exists()
+    assert sorted(p.name for p in tmp_path.iterdir()) == ["Functions.xlsx"]
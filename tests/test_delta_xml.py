@@ -0,0 +1,98 @@
+# test_delta_xml.py
+import sys
+import xml.etree.ElementTree as ET
+
+import pandas as pd
+import pytest
+
+import core
+import excel_to_xml_functions as converter
+import parse_functions as pf
+
+
+def _functions(rows):
+    return pd.DataFrame(rows, columns=["Func_LCN", "Parent_LCN", "Name", "Description"])
+
+
+@pytest.fixture
+def section(tmp_path, monkeypatch):
+    excel = tmp_path / "Результаты_EXCEL"
+    xml = tmp_path / "Результаты_XML"
+    excel.mkdir()
+    monkeypatch.setattr(converter, "INPUT_FILE", str(excel / "Functions.xlsx"))
+    monkeypatch.setattr(converter, "XML_DIR", str(xml))
+    monkeypatch.setattr(converter, "OUTPUT_FILE", str(xml / "functions_output.xml"))
+
+    def run(rows, *flags):
+        if rows is not None:
+            pf.export_to_excel(_functions(rows), "ТЕСТ", converter.INPUT_FILE)
+        monkeypatch.setattr(sys, "argv", ["excel_to_xml_functions.py", *flags])
+        converter.main()
+
+    return run, xml
+
+
+def _lcns(path, tag="Function"):
+    return [el.get("lcn") for el in ET.parse(path).getroot().iter(tag)]
+
+
+def test_diff_snapshot_reports_added_changed_removed():
+    old = {"F1": "a", "F1.1": "b", "F2": "c"}
+    new = {"F1": "a", "F1.1": "x", "F3": "d"}
+    assert core.diff_snapshot(old, new) == (["F3"], ["F1.1"], ["F2"])
+
+
+def test_snapshot_round_trip(tmp_path):
+    path = str(tmp_path / "out.snapshot.tsv")
+    prints = {"F1": core.fingerprint(["F1", "Насос"]), "F1.1": core.fingerprint(["F1.1", ""])}
+    core.save_snapshot(path, "ТЕСТ", prints)
+    assert core.load_snapshot(path) == ("ТЕСТ", prints)
+    assert core.load_snapshot(str(tmp_path / "missing.tsv")) is None
+
+
+def test_delta_written_beside_full_xml(section):
+    run, xml = section
+    full = xml / "functions_output.xml"
+    delta = xml / "functions_output.delta.xml"
+
+    run([("F1", "", "Насос", ""), ("F1.1", "F1", "Подача", ""), ("F2", "", "Клапан", "")])
+    assert _lcns(full) == ["F1", "F1.1", "F2"]
+    assert not delta.exists()
+
+    run([("F1", "", "Насос", ""), ("F1.1", "F1", "Подача воды", ""), ("F3", "", "Сброс", "")])
+    # полный XML не подменяется изменениями
+    assert ET.parse(full).getroot().get("mode") is None
+    assert _lcns(full) == ["F1", "F1.1", "F3"]
+
+    root = ET.parse(delta).getroot()
+    assert root.get("mode") == "delta"
+    assert [el.get("lcn") for el in root.findall("Function")] == ["F1.1", "F3"]
+    assert [el.get("lcn") for el in root.find("Removed")] == ["F2"]
+
+
+def test_full_flag_drops_stale_delta(section):
+    run, xml = section
+    delta = xml / "functions_output.delta.xml"
+
+    run([("F1", "", "Насос", "")])
+    run([("F1", "", "Насос", ""), ("F2", "", "Клапан", "")])
+    assert delta.exists()
+
+    run(None, "--full")
+    assert not delta.exists()
+    assert _lcns(xml / "functions_output.xml") == ["F1", "F2"]
+
+
+def test_unchanged_workbook_skips_conversion(section, capsys):
+    run, xml = section
+    run([("F1", "", "Насос", "")])
+    full = xml / "functions_output.xml"
+    mtime = full.stat().st_mtime_ns
+    capsys.readouterr()
+
+    run(None)
+    assert "не менялся" in capsys.readouterr().out
+    assert full.stat().st_mtime_ns == mtime
+
+    run(None, "--force")
+    assert "не менялся" not in capsys.readouterr().out
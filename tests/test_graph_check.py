@@ -0,0 +1,28 @@
+# test_graph_check.py
+import graph_check
+
+
+def test_graph_check_tree():
+    report = graph_check.check_graph({"A": "", "A.1": "A", "A.1.1": "A.1", "B": "", "C": "X"})
+    assert report["roots"] == ["A", "B"]
+    assert report["orphans"] == ["C"]
+    assert report["depth_counts"] == {1: 3, 2: 1, 3: 1}
+    assert report["max_depth"] == 3
+    assert not graph_check.has_errors(report)
+
+
+def test_graph_check_cycles_and_unreachable():
+    parents = {"R": "", "A": "B", "B": "A", "S": "S", "D": "A", "E": "D"}
+    report = graph_check.check_graph(parents)
+    assert report["roots"] == ["R"]
+    assert [sorted(loop) for loop in report["cycles"]] == [["A", "B"]]
+    assert report["self_parents"] == ["S"]
+    assert sorted(report["unreachable"]) == ["D", "E"]
+    assert graph_check.has_errors(report)
+
+
+def test_graph_check_deep_chain_is_iterative():
+    n = 50000
+    parents = {str(i): (str(i - 1) if i else "") for i in range(n)}
+    report = graph_check.check_graph(parents)
+    assert report["max_depth"] == n
@@ -0,0 +1,63 @@
+# test_hierarchy.py
+import hierarchy
+import parse_structure as ps
+
+
+def test_natural_code_order():
+    codes = ["100.10", "21.10", "21.9", "21.00", "21.10.05", "21.A"]
+    assert sorted(codes, key=hierarchy.code_sort_key) == [
+        "21.00", "21.9", "21.10", "21.10.05", "21.A", "100.10",
+    ]
+
+
+def test_split_and_join_codes():
+    assert hierarchy.split_code(" 21-10_05 ") == ["21", "10", "05"]
+    assert hierarchy.join_code("21", "10-05") == "21.10.05"
+
+
+def test_parent_is_the_longest_existing_prefix():
+    ids = ["21.00", "21.10", "21.10.05", "21.10.05.02", "21.20.07", "22.10"]
+    index = hierarchy.build_prefix_index(ids)
+    parents = {item_id: hierarchy.resolve_parent(item_id, index) for item_id in ids}
+    assert parents == {
+        "21.00": "",
+        "21.10": "21.00",
+        "21.10.05": "21.10",
+        "21.10.05.02": "21.10.05",
+        # промежуточного 21.20 нет — поднимаемся до системы
+        "21.20.07": "21.00",
+        "22.10": "",
+    }
+
+
+def test_zero_tail_is_the_node_of_its_level():
+    assert hierarchy.significant_prefix("21.10.00") == hierarchy.significant_prefix("21.10")
+    index = hierarchy.build_prefix_index(["21.00", "21.10.00", "21.10.05"])
+    assert hierarchy.resolve_parent("21.10.05", index) == "21.10.00"
+
+
+def test_build_items_from_rows_levels_and_order(capsys):
+    rows = [
+        ("100", "10", "Шасси"),
+        ("21", "10-05", "Вентилятор"),
+        ("21", "00", "Кондиционирование"),
+        ("21", "10", "Распределение"),
+        ("21", "10", "Распределение воздуха"),
+        ("100", "00", "Опоры"),
+    ]
+    df = ps.build_items_from_rows(rows)
+    assert df["Item_ID"].tolist() == ["21.00", "21.10", "21.10.05", "100.00", "100.10"]
+    assert df["Parent_ID"].tolist() == ["", "21.00", "21.10", "", "100.00"]
+    assert "Альтернативное название: Распределение воздуха" in df["Description"].tolist()
+    assert "повторяющийся код" in capsys.readouterr().out
+
+
+def test_zero_padded_siblings_stay_distinct():
+    ids = ["21.00", "21.05", "21.5", "21.05.01", "21.5.01", "1.05", "1.5"]
+    index = hierarchy.build_prefix_index(ids)
+    assert len(index) == len(ids)
+    assert hierarchy.resolve_parent("21.05.01", index) == "21.05"
+    assert hierarchy.resolve_parent("21.5.01", index) == "21.5"
+    assert hierarchy.resolve_parent("21.5", index) == "21.00"
+    # числами группы сравниваются только при сортировке
+    assert hierarchy.code_sort_key("21.05") == hierarchy.code_sort_key("21.5")
@@ -0,0 +1,89 @@
+# test_manifest.py
+import os
+import sys
+
+import pytest
+
+import core
+import excel_to_xml_structure as converter
+import parse_structure as ps
+
+ROWS = [("21", "00", "Кондиционирование"), ("21", "10", "Распределение")]
+
+
+@pytest.fixture
+def section(tmp_path, monkeypatch):
+    excel = tmp_path / "Результаты_EXCEL"
+    xml = tmp_path / "Результаты_XML"
+    excel.mkdir()
+    monkeypatch.setattr(converter, "INPUT_FILE", str(excel / "Structure.xlsx"))
+    monkeypatch.setattr(converter, "XML_DIR", str(xml))
+    monkeypatch.setattr(converter, "OUTPUT_FILE", str(xml / "structure_output.xml"))
+
+    def run(*flags):
+        monkeypatch.setattr(sys, "argv", ["excel_to_xml_structure.py", *flags])
+        converter.main()
+
+    return run, excel, xml
+
+
+def test_output_is_current_checks_fields_and_output_hash(tmp_path):
+    out = tmp_path / "out.xml"
+    out.write_text("<Dataset/>", encoding="utf-8")
+    expected = {"input_hash": "abc", "converter": "2"}
+    core.write_manifest(core.manifest_path(str(out)),
+                        dict(expected, output_hash=core.file_digest(str(out))))
+
+    assert core.output_is_current(str(out), expected)
+    assert not core.output_is_current(str(out), dict(expected, converter="3"))
+    out.write_text("<Dataset>правка</Dataset>", encoding="utf-8")
+    assert not core.output_is_current(str(out), expected)
+
+
+def test_unchanged_workbook_is_skipped_without_archiving(section, capsys):
+    run, excel, xml = section
+    ps.export_structure_excel(ps.build_items_from_rows(ROWS), converter.INPUT_FILE)
+    run()
+    out = xml / "structure_output.xml"
+    mtime = out.stat().st_mtime_ns
+    capsys.readouterr()
+
+    # книгу пересохранили с теми же данными — дата сохранения не в счёт
+    ps.export_structure_excel(ps.build_items_from_rows(ROWS), converter.INPUT_FILE)
+    run()
+    assert "не менялся" in capsys.readouterr().out
+    assert out.stat().st_mtime_ns == mtime
+    assert not (xml / "Архив").exists()
+
+
+def test_changed_workbook_or_edited_xml_regenerates(section, capsys):
+    run, excel, xml = section
+    ps.export_structure_excel(ps.build_items_from_rows(ROWS), converter.INPUT_FILE)
+    run()
+    out = xml / "structure_output.xml"
+
+    out.write_text("испорчен", encoding="utf-8")
+    capsys.readouterr()
+    run()
+    assert "не менялся" not in capsys.readouterr().out
+    assert out.read_text(encoding="utf-8").startswith("<?xml")
+
+    ps.export_structure_excel(ps.build_items_from_rows(ROWS + [("21", "20", "Подача")]),
+                              converter.INPUT_FILE)
+    run()
+    assert "не менялся" not in capsys.readouterr().out
+    assert os.path.isfile(core.delta_path(str(out)))
+
+
+def test_force_and_converter_version_bypass_the_manifest(section, capsys, monkeypatch):
+    run, excel, xml = section
+    ps.export_structure_excel(ps.build_items_from_rows(ROWS), converter.INPUT_FILE)
+    run()
+    capsys.readouterr()
+
+    run("--force")
+    assert "не менялся" not in capsys.readouterr().out
+
+    monkeypatch.setattr(converter, "CONVERTER_VERSION", "999")
+    run()
+    assert "не менялся" not in capsys.readouterr().out
@@ -0,0 +1,64 @@
+# test_preview_sample.py
+import openpyxl
+import pandas as pd
+from docx import Document
+
+import parse_functions as pf
+
+BLOCK = pf.PREVIEW_BLOCK_ROWS
+
+
+def _codes(candidates):
+    return candidates["Func_LCN"].astype(str).tolist()
+
+
+def _write_book(path, blocks):
+    wb = openpyxl.Workbook()
+    ws = wb.active
+    ws.title = "Функции"
+    for i in range(blocks * BLOCK):
+        ws.append([f"F{i + 1}", f"Функция {i + 1}"])
+    wb.save(path)
+
+
+def test_xlsx_sample_reads_only_chosen_rows(tmp_path):
+    path = str(tmp_path / "Функции.xlsx")
+    _write_book(path, 5)
+
+    candidates, sampled, total, _ = pf.read_sample(path, 2, "head")
+    assert (sampled, total) == (2, 5)
+    assert _codes(candidates) == [f"F{i + 1}" for i in range(2 * BLOCK)]
+
+
+def test_xlsx_random_sample_matches_full_read(tmp_path):
+    path = str(tmp_path / "Функции.xlsx")
+    _write_book(path, 5)
+
+    candidates, sampled, total, _ = pf.read_sample(path, 2, "random", seed=7)
+    chosen = pf._choose_sample(total, 2, "random", 7)
+    full = _codes(pf.read_candidates(path))
+    assert sampled == 2
+    assert _codes(candidates) == [c for i, c in enumerate(full) if i // BLOCK in chosen]
+
+
+def test_docx_sample_takes_paragraph_and_table_blocks(tmp_path):
+    path = str(tmp_path / "Функции.docx")
+    doc = Document()
+    for i in range(BLOCK):
+        doc.add_paragraph(f"Ф{i + 1} Абзац {i + 1}")
+    table = doc.add_table(rows=0, cols=2)
+    for i in range(2 * BLOCK):
+        cells = table.add_row().cells
+        cells[0].text = f"F{100 + i}"
+        cells[1].text = f"Строка {i}"
+    doc.save(path)
+
+    full, sampled, total, _ = pf.read_sample(path, 0, "head")
+    assert (sampled, total) == (3, 3)
+    pd.testing.assert_series_equal(
+        full["Func_LCN"].astype(str), pf.read_candidates(path)["Func_LCN"].astype(str)
+    )
+
+    head, sampled, _, _ = pf.read_sample(path, 2, "head")
+    assert sampled == 2
+    assert _codes(head) == _codes(full)[:2 * BLOCK]
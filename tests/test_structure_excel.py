@@ -0,0 +1,55 @@
+# test_structure_excel.py
+import openpyxl
+import pytest
+
+import excel_reader
+import parse_structure as ps
+
+EXPECTED = [("21", "21.10", "Насос"), ("21", "21.20", "Клапан"), ("22", "22.10", "Сброс")]
+
+
+def _write_book(path, header_row):
+    wb = openpyxl.Workbook()
+    ws = wb.active
+    ws.title = "Обложка"
+    ws.append(["Руководство"])
+    table = wb.create_sheet("Таблица")
+    for i in range(header_row):
+        table.append([f"вводный текст {i}"])
+    table.append(["", "Система", "Подсистема", "Наименование"])
+    table.append(["", 21, "21.10", "Насос"])
+    table.append(["", None, "21.20", "Клапан"])
+    table.append(["", 22, "22.10", "Сброс"])
+    wb.save(path)
+
+
+@pytest.mark.parametrize("header_row", [3, ps.HEADER_SCAN_ROWS + 50, ps.HEADER_SCAN_BLOCK + 20])
+def test_streaming_and_frame_paths_find_the_table(tmp_path, capsys, header_row):
+    path = str(tmp_path / "Структура.xlsx")
+    _write_book(path, header_row)
+
+    assert ps._extract_system_rows_from_xlsx_streaming(path) == EXPECTED
+    assert ps.rows_from_sheets(excel_reader.read_sheets(path)) == EXPECTED
+
+    out = capsys.readouterr().out
+    assert "'Обложка'" in out
+    assert "'Таблица'" not in out
+
+
+def test_deep_sheet_is_read_when_another_sheet_matches_early(tmp_path, capsys):
+    path = str(tmp_path / "Структура.xlsx")
+    _write_book(path, 3)
+    wb = openpyxl.load_workbook(path)
+    deep = wb.create_sheet("Приложение")
+    for i in range(ps.HEADER_SCAN_ROWS + 10):
+        deep.append([f"строка {i}"])
+    deep.append(["Система", "Подсистема", "Наименование"])
+    deep.append([30, "30.10", "Лишнее"])
+    wb.save(path)
+
+    expected = EXPECTED + [("30", "30.10", "Лишнее")]
+    assert ps._extract_system_rows_from_xlsx_streaming(path) == expected
+    assert ps.rows_from_sheets(excel_reader.read_sheets(path)) == expected
+    out = capsys.readouterr().out
+    assert "'Приложение'" not in out
+    assert "'Обложка'" in out
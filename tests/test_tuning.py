@@ -0,0 +1,52 @@
+# test_tuning.py
+import os
+
+import openpyxl
+import pytest
+
+import catalog
+import tuning
+
+TEXT = "Ф1 Подача\nФ1.1 Насос\nФ1.2 Клапан\nФ2 Сброс\nФ2 Сброс давления\n"
+
+
+@pytest.fixture
+def doc(tmp_path, monkeypatch):
+    monkeypatch.setattr(catalog, "CATALOG_PATH", str(tmp_path / "Каталог.sqlite"))
+    path = tmp_path / "doc.txt"
+    path.write_text(TEXT, encoding="utf-8")
+    return str(path)
+
+
+def test_summary_uses_cache_until_file_changes(doc):
+    state = {}
+    assert tuning.load(state, doc)["rows"] == 5
+
+    result = tuning.summary(state, doc, 1, "fi", "", "", 2)
+    assert (result["rows"], result["passed"], result["functions"]) == (5, 3, 2)
+    assert result["sample"] == [["Ф1", "Подача"], ["Ф2", "Сброс"]]
+
+    with open(doc, "a", encoding="utf-8") as f:
+        f.write("Ф3 Новая\n")
+    assert tuning.summary(state, doc, 0, "fi", "", "", 2) == {"stale": True}
+
+
+def test_export_survives_catalog_failure(doc, tmp_path, monkeypatch, capsys):
+    def broken(*args, **kwargs):
+        raise RuntimeError("диск занят")
+
+    monkeypatch.setattr(catalog, "record_import", broken)
+    out = str(tmp_path / "Functions.xlsx")
+
+    # кэша нет — документ читается заново
+    assert tuning.export({}, doc, "ТЕСТ", out, 0, "fi", "", "") == {"functions": 4}
+    assert os.path.isfile(out)
+    assert "Каталог не обновлён: диск занят" in capsys.readouterr().out
+
+    rows = list(openpyxl.load_workbook(out).active.iter_rows(min_row=2, values_only=True))
+    assert [r[1] for r in rows] == ["Ф1", "Ф1.1", "Ф1.2", "Ф2"]
+
+
+def test_export_without_functions_exits(doc, tmp_path):
+    with pytest.raises(SystemExit):
+        tuning.export({}, doc, "ТЕСТ", str(tmp_path / "F.xlsx"), 0, "fi", "Z", "")
@@ -0,0 +1,133 @@
+# test_txt_chunks.py
+import random
+
+import pandas as pd
+import pytest
+
+import parse_functions as pf
+
+
+def _document(seed, lines=3000):
+    """Текст с кодами функций, висящими кодами и пустыми строками вперемешку."""
+    rng = random.Random(seed)
+    out = []
+    for i in range(lines):
+        kind = rng.random()
+        code = "Ф" + ".".join(str(rng.randint(1, 9)) for _ in range(rng.randint(1, 4)))
+        if kind < 0.5:
+            out.append(f"{code} Подача топлива в двигатель {i}")
+        elif kind < 0.6:
+            # код без названия: название на следующей строке
+            out.append(code)
+            out.append(f"Контроль давления {i}")
+        elif kind < 0.7:
+            out.append("")
+        else:
+            out.append(f"Обычный текст раздела {i}, без кода.")
+    return "\n".join(out) + "\n"
+
+
+def _frame(candidates):
+    return pd.DataFrame({
+        "Func_LCN": candidates["Func_LCN"].astype(str).to_numpy(),
+        "Name": candidates["Name"].to_numpy(dtype=object),
+    })
+
+
+@pytest.mark.parametrize("seed", [1, 2])
+@pytest.mark.parametrize("chunk_bytes", [64, 1000, 4096])
+def test_chunked_scan_matches_whole_text(tmp_path, seed, chunk_bytes):
+    text = _document(seed)
+    path = tmp_path / "doc.txt"
+    path.write_text(text, encoding="utf-8")
+
+    whole = pf.extract_candidates(text, report_progress=False)
+    chunks = list(pf.iter_txt_chunks(str(path), chunk_bytes=chunk_bytes))
+    chunked = pf.concat_candidates([pf.extract_candidates(c, report_progress=False) for c in chunks])
+
+    assert len(chunks) > 1
+    assert "".join(chunks) == text
+    pd.testing.assert_frame_equal(_frame(chunked), _frame(whole))
+
+
+def test_cp1251_file_and_bom(tmp_path):
+    cp = tmp_path / "cp.txt"
+    cp.write_bytes("Ф1 Насос\nФ1.1 Подача\n".encode("cp1251"))
+    bom = tmp_path / "bom.txt"
+    bom.write_bytes(b"\xef\xbb\xbf" + "Ф1 Насос\n".encode("utf-8"))
+
+    assert pf.detect_text_encoding(str(cp)) == "cp1251"
+    assert "".join(pf.iter_txt_chunks(str(cp))) == "Ф1 Насос\nФ1.1 Подача\n"
+    assert "".join(pf.iter_txt_chunks(str(bom))) == "Ф1 Насос\n"
+
+
+def test_chunk_in_other_encoding_is_not_dropped(tmp_path, monkeypatch):
+    # начало файла в UTF-8, дальше приклеена выгрузка в cp1251
+    head = "Ф1 Насос\n" * 50
+    tail = "Ф2 Клапан сброса\n"
+    path = tmp_path / "mixed.txt"
+    path.write_bytes(head.encode("utf-8") + tail.encode("cp1251"))
+    monkeypatch.setattr(pf, "ENCODING_SAMPLE_BYTES", 64)
+
+    assert pf.detect_text_encoding(str(path)) == "utf-8"
+    text = "".join(pf.iter_txt_chunks(str(path), chunk_bytes=128))
+    assert text == head + tail
+
+
+def test_blocks_cover_the_file_exactly(tmp_path):
+    text = _document(3, lines=500)
+    path = tmp_path / "doc.txt"
+    path.write_bytes(b"\xef\xbb\xbf" + text.encode("utf-8"))
+
+    total = pf.txt_block_count(str(path), block_bytes=700)
+    blocks = list(pf.iter_txt_blocks(str(path), list(range(total)), block_bytes=700))
+    assert "".join(blocks) == text
+    assert all(block.endswith("\n") for block in blocks)
+
+
+def test_preview_head_reads_only_first_blocks(tmp_path, monkeypatch):
+    text = _document(4, lines=30000)
+    path = tmp_path / "doc.txt"
+    path.write_text(text, encoding="utf-8")
+    total = pf.txt_block_count(str(path))
+    assert total >= 3
+
+    read = []
+    original = pf._decode_chunk
+    monkeypatch.setattr(pf, "_decode_chunk", lambda raw, *a: read.append(len(raw)) or original(raw, *a))
+
+    candidates, sampled, blocks, _ = pf.read_sample(str(path), 1, "head")
+    assert (sampled, blocks) == (1, total)
+    assert sum(read) <= pf.PREVIEW_TXT_BLOCK_BYTES + 200
+    assert len(candidates) > 0
+
+
+def test_full_preview_matches_import(tmp_path):
+    text = _document(5)
+    path = tmp_path / "doc.txt"
+    path.write_text(text, encoding="utf-8")
+
+    candidates, sampled, total, _ = pf.read_sample(str(path), 0, "head")
+    assert sampled == total
+    pd.testing.assert_frame_equal(_frame(candidates), _frame(pf.read_candidates(str(path))))
+
+
+def test_large_txt_goes_through_external_consolidation(tmp_path, monkeypatch):
+    path = tmp_path / "doc.txt"
+    path.write_text(_document(3), encoding="utf-8")
+    out = tmp_path / "Functions.xlsx"
+    monkeypatch.setattr(pf, "TXT_EXTERNAL_BYTES", 1024)
+
+    with pytest.raises(ValueError):
+        pf.read_candidates(str(path))
+
+    used = []
+    original = pf.consolidate_external
+    monkeypatch.setattr(pf, "consolidate_external", lambda *a: used.append(a[2]) or original(*a))
+    monkeypatch.setattr("sys.argv", [
+        "parse_functions.py", str(path), "--fi", "ТЕСТ", "--out", str(out), "--no-catalog",
+    ])
+    pf.main()
+
+    assert used == [pf.TXT_MEMORY_BUDGET_MB]
+    assert out.exists()